@@ -5,22 +5,30 @@ Agents 模块 - 多 Agent 协作系统
 - research_agent: 研究 Agent，专注于信息收集
 - analysis_agent: 分析 Agent，专注于数据分析
 - multi_agent_system: 多 Agent 协作系统
+- mcp_server: MCP Server（财经工具）
+
+导出的函数在第一次访问时才导入对应子模块，
+导入 agents.mcp_server 时不会加载 LangChain 和各个 Agent。
 """
 
-from .research_agent import create_research_agent, run_research
-from .analysis_agent import create_analysis_agent, run_analysis
-from .multi_agent_system import (
-    create_multi_agent_system,
-    run_multi_agent,
-    stream_multi_agent,
-)
+from importlib import import_module
+
+_EXPORTS = {
+    "create_research_agent": "research_agent",
+    "run_research": "research_agent",
+    "create_analysis_agent": "analysis_agent",
+    "run_analysis": "analysis_agent",
+    "create_multi_agent_system": "multi_agent_system",
+    "run_multi_agent": "multi_agent_system",
+    "stream_multi_agent": "multi_agent_system",
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    "create_research_agent",
-    "run_research",
-    "create_analysis_agent",
-    "run_analysis",
-    "create_multi_agent_system",
-    "run_multi_agent",
-    "stream_multi_agent",
-]
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
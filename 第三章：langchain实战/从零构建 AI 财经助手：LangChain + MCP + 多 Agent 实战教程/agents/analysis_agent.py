@@ -7,44 +7,15 @@ from langchain_openai import ChatOpenAI
 from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage
 from langchain.agents import create_agent
-import yfinance as yf
-import json
+
+from core import batch, indicators, market_data, statements
+from core.encoding import encode_result
 
 # ============================================================
 # 分析专用工具
 # ============================================================
 
 
-def _format_number(value):
-    """格式化数字为可读形式"""
-    if value is None:
-        return "N/A"
-    abs_val = abs(value)
-    sign = "-" if value < 0 else ""
-    if abs_val >= 1e12:
-        return f"{sign}{abs_val / 1e12:.2f}万亿"
-    elif abs_val >= 1e8:
-        return f"{sign}{abs_val / 1e8:.2f}亿"
-    elif abs_val >= 1e4:
-        return f"{sign}{abs_val / 1e4:.2f}万"
-    else:
-        return f"{sign}{abs_val:.2f}"
-
-
-def _round(value, n=2):
-    """保留小数位"""
-    if value is None:
-        return "N/A"
-    return round(value, n)
-
-
-def _format_pct(value):
-    """格式化百分比"""
-    if value is None:
-        return "N/A"
-    return f"{value * 100:.2f}%"
-
-
 @tool
 def get_stock_info(ticker: str) -> str:
     """获取股票的基本信息和关键财务指标。
@@ -58,8 +29,7 @@ def get_stock_info(ticker: str) -> str:
         ticker: 股票代码，如 AAPL, MSFT, 600519.SS
     """
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = market_data.get_info(ticker)
 
         # 提取核心分析指标
         result = {
@@ -74,7 +44,7 @@ def get_stock_info(ticker: str) -> str:
                 "货币": info.get("currency", "N/A"),
                 "52周最高": info.get("fiftyTwoWeekHigh", "N/A"),
                 "52周最低": info.get("fiftyTwoWeekLow", "N/A"),
-                "52周涨跌幅": _format_pct(
+                "52周涨跌幅": market_data.format_pct(
                     (info.get("currentPrice", 0) - info.get("fiftyTwoWeekLow", 0)) /
                     info.get("fiftyTwoWeekLow", 1)
                     if info.get("currentPrice") and info.get("fiftyTwoWeekLow")
@@ -82,33 +52,38 @@ def get_stock_info(ticker: str) -> str:
                 ),
             },
             "估值指标": {
-                "市值": _format_number(info.get("marketCap")),
-                "市盈率(TTM)": _round(info.get("trailingPE")),
-                "市盈率(前瞻)": _round(info.get("forwardPE")),
-                "市净率": _round(info.get("priceToBook")),
-                "每股收益(TTM)": _round(info.get("trailingEps")),
-                "股息率": _format_pct(info.get("dividendYield")),
+                "市值": market_data.format_number(info.get("marketCap")),
+                "市盈率(TTM)": market_data.round_or_na(info.get("trailingPE")),
+                "市盈率(前瞻)": market_data.round_or_na(info.get("forwardPE")),
+                "市净率": market_data.round_or_na(info.get("priceToBook")),
+                "每股收益(TTM)": market_data.round_or_na(info.get("trailingEps")),
+                "股息率": market_data.format_pct(info.get("dividendYield")),
             },
             "财务指标": {
-                "总营收": _format_number(info.get("totalRevenue")),
-                "营收增长": _format_pct(info.get("revenueGrowth")),
-                "利润率": _format_pct(info.get("profitMargins")),
-                "ROE": _format_pct(info.get("returnOnEquity")),
-                "ROA": _format_pct(info.get("returnOnAssets")),
+                "总营收": market_data.format_number(info.get("totalRevenue")),
+                "营收增长": market_data.format_pct(info.get("revenueGrowth")),
+                "利润率": market_data.format_pct(info.get("profitMargins")),
+                "ROE": market_data.format_pct(info.get("returnOnEquity")),
+                "ROA": market_data.format_pct(info.get("returnOnAssets")),
             },
             "风险指标": {
-                "Beta": _round(info.get("beta")),
-                "负债率": _format_pct(info.get("debtToEquity")),
+                "Beta": market_data.round_or_na(info.get("beta")),
+                "负债率": market_data.format_pct(info.get("debtToEquity")),
             },
         }
 
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        return encode_result(result)
     except Exception as e:
         return f"获取 {ticker} 信息时出错: {str(e)}"
 
 
 @tool
-def get_financial_statement(ticker: str, statement_type: str = "income") -> str:
+def get_financial_statement(
+    ticker: str,
+    statement_type: str = "income",
+    quarterly: bool = False,
+    periods: int = 2,
+) -> str:
     """获取并分析公司财务报表。
 
     专门用于：
@@ -122,36 +97,27 @@ def get_financial_statement(ticker: str, statement_type: str = "income") -> str:
             - income: 利润表（收入、利润、费用）
             - balance: 资产负债表（资产、负债、权益）
             - cashflow: 现金流量表（经营、投资、融资）
+        quarterly: 是否获取季度报表（趋势分析建议使用季度）
+        periods: 返回最近几期数据，默认 2 期
     """
     try:
-        stock = yf.Ticker(ticker)
-
-        if statement_type == "income":
-            df = stock.financials
-            title = "利润表"
-        elif statement_type == "balance":
-            df = stock.balance_sheet
-            title = "资产负债表"
-        elif statement_type == "cashflow":
-            df = stock.cashflow
-            title = "现金流量表"
-        else:
+        title = statements.STATEMENT_TITLES.get(statement_type)
+        if title is None:
             return f"不支持的报表类型: {statement_type}"
 
+        df = market_data.get_statement(ticker, statement_type, quarterly)
         if df is None or df.empty:
             return f"未找到 {ticker} 的{title}数据"
 
-        # 取最近2期数据
-        result = {"股票代码": ticker.upper(), "报表类型": title, "数据": {}}
-        for col in df.columns[:2]:
-            period_data = {}
-            for idx in df.index:
-                val = df.loc[idx, col]
-                if val is not None and str(val) != "nan":
-                    period_data[str(idx)] = _format_number(float(val))
-            result["数据"][str(col.date())] = period_data
-
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        # 取最近几期数据
+        result = {
+            "股票代码": ticker.upper(),
+            "报表类型": title,
+            "报告频率": "季度" if quarterly else "年度",
+            "数据": statements.statement_periods(df, periods),
+        }
+
+        return encode_result(result)
     except Exception as e:
         return f"获取 {ticker} 财务报表时出错: {str(e)}"
 
@@ -169,32 +135,18 @@ def compare_stocks(tickers: str) -> str:
         tickers: 逗号分隔的股票代码，如 "AAPL,MSFT,GOOGL"
     """
     try:
-        ticker_list = [t.strip() for t in tickers.split(",")]
-        comparison = []
-
-        for ticker in ticker_list:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            comparison.append({
-                "股票代码": ticker.upper(),
-                "名称": info.get("shortName", "N/A"),
-                "当前价格": info.get("currentPrice") or info.get("regularMarketPrice", "N/A"),
-                "市值": _format_number(info.get("marketCap")),
-                "市盈率(TTM)": _round(info.get("trailingPE")),
-                "市净率": _round(info.get("priceToBook")),
-                "股息率": _format_pct(info.get("dividendYield")),
-                "营收增长": _format_pct(info.get("revenueGrowth")),
-                "利润率": _format_pct(info.get("profitMargins")),
-                "ROE": _format_pct(info.get("returnOnEquity")),
-                "Beta": _round(info.get("beta")),
-                "52周涨幅": _format_pct(
-                    (info.get("currentPrice", 0) / info.get("fiftyTwoWeekLow", 1) - 1)
-                    if info.get("currentPrice") and info.get("fiftyTwoWeekLow")
-                    else None
-                ),
-            })
-
-        return json.dumps(comparison, ensure_ascii=False, indent=2)
+        ticker_list = tickers.split(",")
+
+        # 并发获取，单只失败只记录在对应行
+        rows = {}
+        for symbol, info, error in batch.iter_infos(ticker_list):
+            if error is not None:
+                rows[symbol] = {"股票代码": symbol, "错误": str(error)}
+            else:
+                rows[symbol] = market_data.compare_row(symbol, info)
+
+        comparison = [rows[symbol] for symbol in batch.unique_symbols(ticker_list)]
+        return encode_result(comparison)
     except Exception as e:
         return f"对比股票时出错: {str(e)}"
 
@@ -213,8 +165,7 @@ def get_stock_history(ticker: str, period: str = "3mo") -> str:
         period: 时间范围 (1mo, 3mo, 6mo, 1y, 2y)
     """
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period=period)
+        hist = market_data.get_history(ticker, period)
 
         if hist.empty:
             return f"未找到 {ticker} 的历史数据"
@@ -235,11 +186,32 @@ def get_stock_history(ticker: str, period: str = "3mo") -> str:
             "平均成交量": int(hist['Volume'].mean()),
         }
 
-        return json.dumps(summary, ensure_ascii=False, indent=2)
+        return encode_result(summary)
     except Exception as e:
         return f"获取 {ticker} 历史数据时出错: {str(e)}"
 
 
+@tool
+def get_technical_indicators(tickers: str, period: str = "6mo", benchmark: str = "^GSPC") -> str:
+    """计算股票的技术与风险指标。
+
+    专门用于：
+    - 波动率与最大回撤等风险度量
+    - 均线、RSI、ATR 等技术面判断
+    - 相对基准指数的 Beta
+
+    Args:
+        tickers: 逗号分隔的股票代码，如 "AAPL,MSFT"，单只股票也可以
+        period: 时间范围 (1mo, 3mo, 6mo, 1y, 2y, 5y)
+        benchmark: 基准指数，如 ^GSPC (标普500)、000300.SS (沪深300)
+    """
+    try:
+        result = indicators.technical_summary(tickers.split(","), period, benchmark or None)
+        return encode_result(result)
+    except Exception as e:
+        return f"计算技术指标时出错: {str(e)}"
+
+
 # ============================================================
 # 创建分析 Agent
 # ============================================================
@@ -259,6 +231,7 @@ ANALYSIS_SYSTEM_PROMPT = """你是一位专业的财务分析师，专注于数
 - 使用 get_financial_statement 深度分析财报
 - 使用 compare_stocks 进行横向对比
 - 使用 get_stock_history 分析价格趋势
+- 使用 get_technical_indicators 计算波动率、最大回撤、RSI、Beta 等风险指标，不要自行估算
 - 注重数据的准确性和分析的逻辑性
 
 **分析框架：**
@@ -295,6 +268,7 @@ def create_analysis_agent(llm: ChatOpenAI):
         get_financial_statement,
         compare_stocks,
         get_stock_history,
+        get_technical_indicators,
     ]
 
     return create_agent(
@@ -6,13 +6,17 @@ MCP Server for Finance Agent
 
 import asyncio
 import json
+import os
 import sys
-from typing import Any
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from pathlib import Path
+from typing import Any, Callable
 from functools import partial
 
 from mcp.server import Server
+from mcp.server.lowlevel.helper_types import ReadResourceContents
 from mcp.types import (
+    Resource,
     Tool,
     TextContent,
     ImageContent,
@@ -20,12 +24,27 @@ from mcp.types import (
 )
 from mcp.server.stdio import stdio_server
 
-# 导入财经工具
-import yfinance as yf
-from duckduckgo_search import DDGS
-
-# 线程池，用于运行同步的 yfinance 调用，避免阻塞事件循环
-_executor = ThreadPoolExecutor(max_workers=4)
+# 以脚本方式启动时，保证可以导入项目根目录下的模块
+sys.path.append(str(Path(__file__).parent.parent))
+from core import deadline
+from core.cache import market_cache
+from core.encoding import encode_result
+from core.executor import ToolRejected, ToolTimeout, scheduler_from_env
+from core.lazy import lazy_import, preload
+from core.shared_store import shared_store_from_env
+from core.singleflight import PrivateResult, SingleFlight
+
+# 取数与计算模块依赖 pandas / yfinance，第一次使用时才导入：
+# 启动后马上就能响应 initialize 和 list_tools，随后由 warm_up() 在后台预热
+DATA_MODULES = ("core.batch", "core.indicators", "core.market_data", "core.statements", "core.provider")
+batch = lazy_import("core.batch")
+indicators = lazy_import("core.indicators")
+market_data = lazy_import("core.market_data")
+statements = lazy_import("core.statements")
+provider = lazy_import("core.provider")
+
+# 逐行推送部分结果的回调：(刚完成的一行, 总行数)
+RowCallback = Callable[[dict[str, Any], int], None]
 
 
 # ============================================================
@@ -36,8 +55,7 @@ _executor = ThreadPoolExecutor(max_workers=4)
 def get_stock_info_impl(ticker: str) -> dict[str, Any]:
     """获取股票基本信息"""
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = market_data.get_info(ticker)
 
         result = {
             "股票名称": info.get("longName") or info.get("shortName", "N/A"),
@@ -50,19 +68,21 @@ def get_stock_info_impl(ticker: str) -> dict[str, Any]:
             "日最低价": info.get("dayLow", "N/A"),
             "52周最高": info.get("fiftyTwoWeekHigh", "N/A"),
             "52周最低": info.get("fiftyTwoWeekLow", "N/A"),
-            "市值": _format_number(info.get("marketCap")),
-            "市盈率(TTM)": _round(info.get("trailingPE")),
-            "市盈率(前瞻)": _round(info.get("forwardPE")),
-            "每股收益(TTM)": _round(info.get("trailingEps")),
-            "股息率": _format_pct(info.get("dividendYield")),
-            "Beta": _round(info.get("beta")),
-            "总营收": _format_number(info.get("totalRevenue")),
-            "利润率": _format_pct(info.get("profitMargins")),
+            "市值": market_data.format_number(info.get("marketCap")),
+            "市盈率(TTM)": market_data.round_or_na(info.get("trailingPE")),
+            "市盈率(前瞻)": market_data.round_or_na(info.get("forwardPE")),
+            "每股收益(TTM)": market_data.round_or_na(info.get("trailingEps")),
+            "股息率": market_data.format_pct(info.get("dividendYield")),
+            "Beta": market_data.round_or_na(info.get("beta")),
+            "总营收": market_data.format_number(info.get("totalRevenue")),
+            "利润率": market_data.format_pct(info.get("profitMargins")),
             "行业": info.get("industry", "N/A"),
             "板块": info.get("sector", "N/A"),
             "公司简介": (info.get("longBusinessSummary") or "N/A")[:200],
         }
         return {"success": True, "data": result}
+    except deadline.Cancelled:
+        raise
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -70,8 +90,7 @@ def get_stock_info_impl(ticker: str) -> dict[str, Any]:
 def get_stock_history_impl(ticker: str, period: str = "1mo") -> dict[str, Any]:
     """获取股票历史价格数据"""
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period=period)
+        hist = market_data.get_history(ticker, period)
 
         if hist.empty:
             return {"success": False, "error": f"未找到 {ticker} 的历史数据"}
@@ -89,31 +108,23 @@ def get_stock_history_impl(ticker: str, period: str = "1mo") -> dict[str, Any]:
             "平均成交量": int(hist['Volume'].mean()),
         }
 
-        recent = hist.tail(5)
-        recent_data = []
-        for date, row in recent.iterrows():
-            recent_data.append({
-                "日期": str(date.date()),
-                "收盘价": round(row['Close'], 2),
-                "最高价": round(row['High'], 2),
-                "最低价": round(row['Low'], 2),
-                "成交量": int(row['Volume']),
-            })
+        recent_data = market_data.recent_bars(hist)
 
         result = {
             "汇总": summary,
             "近期交易数据": recent_data,
         }
         return {"success": True, "data": result}
+    except deadline.Cancelled:
+        raise
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
 def search_financial_news_impl(query: str, max_results: int = 6) -> dict[str, Any]:
-    """搜索财经新闻"""
+    """搜索财经新闻（DuckDuckGo 一次返回全部结果，不逐条推送）"""
     try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=max_results))
+        results = provider.data_provider.search_text(query, max_results=max_results)
 
         if not results:
             return {"success": False, "error": f"未找到关于 '{query}' 的搜索结果"}
@@ -127,6 +138,8 @@ def search_financial_news_impl(query: str, max_results: int = 6) -> dict[str, An
             })
 
         return {"success": True, "data": news_list}
+    except deadline.Cancelled:
+        raise
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -134,8 +147,7 @@ def search_financial_news_impl(query: str, max_results: int = 6) -> dict[str, An
 def get_stock_news_impl(ticker: str) -> dict[str, Any]:
     """获取股票相关新闻"""
     try:
-        stock = yf.Ticker(ticker)
-        news = stock.news
+        news = market_data.get_news(ticker)
 
         if not news:
             return {"success": False, "error": f"未找到 {ticker} 的相关新闻"}
@@ -151,34 +163,32 @@ def get_stock_news_impl(ticker: str) -> dict[str, Any]:
             })
 
         return {"success": True, "data": news_list}
+    except deadline.Cancelled:
+        raise
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-def compare_stocks_impl(tickers: str) -> dict[str, Any]:
-    """对比多只股票"""
+def compare_stocks_impl(tickers: str, on_row: RowCallback | None = None) -> dict[str, Any]:
+    """对比多只股票，传入 on_row 时每完成一只股票就回调一次（按完成顺序）"""
     try:
-        ticker_list = [t.strip() for t in tickers.split(",")]
-        comparison = []
-
-        for ticker in ticker_list:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            comparison.append({
-                "股票代码": ticker.upper(),
-                "名称": info.get("shortName", "N/A"),
-                "当前价格": info.get("currentPrice") or info.get("regularMarketPrice", "N/A"),
-                "市值": _format_number(info.get("marketCap")),
-                "市盈率(TTM)": _round(info.get("trailingPE")),
-                "市盈率(前瞻)": _round(info.get("forwardPE")),
-                "每股收益": _round(info.get("trailingEps")),
-                "股息率": _format_pct(info.get("dividendYield")),
-                "营收增长": _format_pct(info.get("revenueGrowth")),
-                "利润率": _format_pct(info.get("profitMargins")),
-                "Beta": _round(info.get("beta")),
-            })
-
+        ticker_list = tickers.split(",")
+        symbols = batch.unique_symbols(ticker_list)
+
+        # 并发获取，单只失败只记录在对应行
+        rows = {}
+        for symbol, info, error in batch.iter_infos(ticker_list):
+            if error is not None:
+                rows[symbol] = {"股票代码": symbol, "错误": str(error)}
+            else:
+                rows[symbol] = market_data.compare_row(symbol, info)
+            if on_row:
+                on_row(rows[symbol], len(symbols))
+
+        comparison = [rows[symbol] for symbol in symbols]
         return {"success": True, "data": comparison}
+    except deadline.Cancelled:
+        raise
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -186,10 +196,8 @@ def compare_stocks_impl(tickers: str) -> dict[str, Any]:
 def get_recommendations_impl(ticker: str) -> dict[str, Any]:
     """获取分析师推荐"""
     try:
-        stock = yf.Ticker(ticker)
-
         # 获取推荐摘要
-        info = stock.info
+        info = market_data.get_info(ticker)
         rec_summary = {
             "推荐评级": info.get("recommendationKey", "N/A"),
             "目标均价": info.get("targetMeanPrice", "N/A"),
@@ -199,7 +207,7 @@ def get_recommendations_impl(ticker: str) -> dict[str, Any]:
         }
 
         # 获取推荐记录
-        rec = stock.recommendations
+        rec = market_data.get_recommendations(ticker)
         rec_data = []
         if rec is not None and not rec.empty:
             recent_rec = rec.tail(10)
@@ -216,40 +224,513 @@ def get_recommendations_impl(ticker: str) -> dict[str, Any]:
             "最近推荐记录": rec_data if rec_data else "暂无分析师推荐数据",
         }
         return {"success": True, "data": result}
+    except deadline.Cancelled:
+        raise
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def get_financial_statement_impl(
+    ticker: str,
+    statement_type: str = "income",
+    quarterly: bool = False,
+    periods: int = 2,
+) -> dict[str, Any]:
+    """获取财务报表"""
+    try:
+        title = statements.STATEMENT_TITLES.get(statement_type)
+        if title is None:
+            return {"success": False, "error": f"不支持的报表类型: {statement_type}，请使用 income/balance/cashflow"}
+
+        df = market_data.get_statement(ticker, statement_type, quarterly)
+        if df is None or df.empty:
+            return {"success": False, "error": f"未找到 {ticker} 的{title}数据"}
+
+        result = {
+            "股票代码": ticker.upper(),
+            "报表类型": title,
+            "报告频率": "季度" if quarterly else "年度",
+            "数据": statements.statement_periods(df, periods),
+        }
+        return {"success": True, "data": result}
+    except deadline.Cancelled:
+        raise
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def get_technical_indicators_impl(
+    tickers: str, period: str = "6mo", benchmark: str = "^GSPC"
+) -> dict[str, Any]:
+    """计算技术与风险指标"""
+    try:
+        result = indicators.technical_summary(tickers.split(","), period, benchmark or None)
+        return {"success": True, "data": result}
+    except deadline.Cancelled:
+        raise
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
 # ============================================================
-# 辅助函数
+# 批量工具实现（一次调用获取多只股票，按输入顺序汇总）
 # ============================================================
 
 
-def _format_number(value):
-    if value is None:
-        return "N/A"
-    abs_val = abs(value)
-    sign = "-" if value < 0 else ""
-    if abs_val >= 1e12:
-        return f"{sign}{abs_val / 1e12:.2f}万亿"
-    elif abs_val >= 1e8:
-        return f"{sign}{abs_val / 1e8:.2f}亿"
-    elif abs_val >= 1e4:
-        return f"{sign}{abs_val / 1e4:.2f}万"
-    else:
-        return f"{sign}{abs_val:.2f}"
+def get_stock_info_batch_impl(tickers: str, on_row: RowCallback | None = None) -> dict[str, Any]:
+    """批量获取股票基本信息"""
+    return _batch_impl(tickers, get_stock_info_impl, on_row)
+
+
+def get_stock_history_batch_impl(
+    tickers: str, period: str = "1mo", on_row: RowCallback | None = None
+) -> dict[str, Any]:
+    """批量获取历史价格数据：先用一次 yf.download 把未缓存的股票下载到本地行情库，再逐只汇总"""
+    try:
+        batch.get_histories(tickers.split(","), period)
+    except deadline.Cancelled:
+        raise
+    except Exception as e:
+        # 批量下载失败时退回逐只获取，错误记录在对应行；上游调用次数会翻倍，记录下来便于排查限流等问题
+        print(f"⚠️ 批量下载历史价格失败（{tickers}），改为逐只获取: {e!r}", file=sys.stderr)
+    return _batch_impl(tickers, partial(get_stock_history_impl, period=period), on_row)
+
+
+def get_stock_news_batch_impl(tickers: str, on_row: RowCallback | None = None) -> dict[str, Any]:
+    """批量获取股票相关新闻"""
+    return _batch_impl(tickers, get_stock_news_impl, on_row)
+
+
+def get_recommendations_batch_impl(tickers: str, on_row: RowCallback | None = None) -> dict[str, Any]:
+    """批量获取分析师推荐"""
+    return _batch_impl(tickers, get_recommendations_impl, on_row)
+
+
+def _batch_impl(
+    tickers: str,
+    fetch: Callable[[str], dict[str, Any]],
+    on_row: RowCallback | None = None,
+) -> dict[str, Any]:
+    """对每只股票并发执行单只股票的工具实现，结果按输入顺序合并为一个列表
+
+    每行以股票代码开头，单只失败只在对应行记录错误；
+    传入 on_row 时每完成一只股票就回调一次（按完成顺序）。
+    """
+    try:
+        symbols = batch.unique_symbols(tickers.split(","))
+        if not symbols:
+            return {"success": False, "error": "请至少提供一个股票代码"}
+
+        rows = {}
+        for symbol, result, error in batch.iter_fetch(symbols, fetch):
+            if error is None and not result.get("success"):
+                error = result.get("error", "未知错误")
+            rows[symbol] = {"股票代码": symbol, "错误": str(error)} if error is not None else _batch_row(symbol, result["data"])
+            if on_row:
+                on_row(rows[symbol], len(symbols))
+
+        return {"success": True, "data": [rows[symbol] for symbol in symbols]}
+    except deadline.Cancelled:
+        raise
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+def _batch_row(symbol: str, data: Any) -> dict[str, Any]:
+    """单只股票的结果转为批量结果中的一行"""
+    if isinstance(data, dict):
+        return {"股票代码": symbol, **data}
+    return {"股票代码": symbol, "数据": data}
+
+
+# ============================================================
+# 工具定义
+# ============================================================
+
+TOOLS = [
+    Tool(
+        name="get_stock_info",
+        description="获取股票的基本信息，包括当前价格、市值、市盈率等关键指标",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ticker": {
+                    "type": "string",
+                    "description": "股票代码，如 AAPL, MSFT, 600519.SS (贵州茅台), 000001.SZ (平安银行)",
+                }
+            },
+            "required": ["ticker"],
+        },
+    ),
+    Tool(
+        name="get_stock_history",
+        description="获取股票的历史价格数据，包括汇总统计和近期交易数据",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ticker": {
+                    "type": "string",
+                    "description": "股票代码",
+                },
+                "period": {
+                    "type": "string",
+                    "description": "时间范围，可选值: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, ytd, max",
+                    "default": "1mo",
+                },
+            },
+            "required": ["ticker"],
+        },
+    ),
+    Tool(
+        name="search_financial_news",
+        description="搜索财经新闻和信息，返回相关新闻列表",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "搜索关键词，如'苹果公司财报'、'A股市场行情'",
+                },
+                "max_results": {
+                    "type": "integer",
+                    "description": "返回结果数量",
+                    "default": 6,
+                },
+            },
+            "required": ["query"],
+        },
+    ),
+    Tool(
+        name="get_stock_news",
+        description="获取与特定股票相关的最新新闻",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ticker": {
+                    "type": "string",
+                    "description": "股票代码",
+                }
+            },
+            "required": ["ticker"],
+        },
+    ),
+    Tool(
+        name="compare_stocks",
+        description="对比多只股票的关键指标，帮助分析投资价值",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "tickers": {
+                    "type": "string",
+                    "description": "逗号分隔的股票代码列表，如 'AAPL,MSFT,GOOGL'",
+                }
+            },
+            "required": ["tickers"],
+        },
+    ),
+    Tool(
+        name="get_recommendations",
+        description="获取分析师对股票的评级和推荐",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ticker": {
+                    "type": "string",
+                    "description": "股票代码",
+                }
+            },
+            "required": ["ticker"],
+        },
+    ),
+    Tool(
+        name="get_financial_statement",
+        description="获取公司财务报表（利润表、资产负债表、现金流量表），支持年度和季度",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "ticker": {
+                    "type": "string",
+                    "description": "股票代码",
+                },
+                "statement_type": {
+                    "type": "string",
+                    "description": "报表类型: income（利润表）, balance（资产负债表）, cashflow（现金流量表）",
+                    "default": "income",
+                },
+                "quarterly": {
+                    "type": "boolean",
+                    "description": "是否获取季度报表，默认为年度报表",
+                    "default": False,
+                },
+                "periods": {
+                    "type": "integer",
+                    "description": "返回最近几期数据",
+                    "default": 2,
+                },
+            },
+            "required": ["ticker"],
+        },
+    ),
+    Tool(
+        name="get_technical_indicators",
+        description="计算股票的技术与风险指标：收益率、波动率、最大回撤、均线、RSI、ATR 和相对基准的 Beta，支持多只股票",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "tickers": {
+                    "type": "string",
+                    "description": "逗号分隔的股票代码列表，如 'AAPL,MSFT'，单只股票也可以",
+                },
+                "period": {
+                    "type": "string",
+                    "description": "时间范围，可选值: 1mo, 3mo, 6mo, 1y, 2y, 5y, ytd, max",
+                    "default": "6mo",
+                },
+                "benchmark": {
+                    "type": "string",
+                    "description": "计算 Beta 的基准指数，如 ^GSPC (标普500)、000300.SS (沪深300)",
+                    "default": "^GSPC",
+                },
+            },
+            "required": ["tickers"],
+        },
+    ),
+    # 批量版本：涉及多只股票时一次调用即可，省去逐只调用的 Agent 步骤和往返
+    Tool(
+        name="get_stock_info_batch",
+        description="批量获取多只股票的基本信息（字段同 get_stock_info），并发取数、一次返回。涉及两只及以上股票时优先使用，不要逐只调用 get_stock_info",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "tickers": {
+                    "type": "string",
+                    "description": "逗号分隔的股票代码列表，如 'AAPL,MSFT,GOOGL'",
+                }
+            },
+            "required": ["tickers"],
+        },
+    ),
+    Tool(
+        name="get_stock_history_batch",
+        description="批量获取多只股票的历史价格数据（字段同 get_stock_history），一次返回。涉及两只及以上股票时优先使用",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "tickers": {
+                    "type": "string",
+                    "description": "逗号分隔的股票代码列表，如 'AAPL,MSFT,GOOGL'",
+                },
+                "period": {
+                    "type": "string",
+                    "description": "时间范围，可选值: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, ytd, max",
+                    "default": "1mo",
+                },
+            },
+            "required": ["tickers"],
+        },
+    ),
+    Tool(
+        name="get_stock_news_batch",
+        description="批量获取多只股票的相关新闻（字段同 get_stock_news），一次返回。涉及两只及以上股票时优先使用",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "tickers": {
+                    "type": "string",
+                    "description": "逗号分隔的股票代码列表，如 'AAPL,MSFT,GOOGL'",
+                }
+            },
+            "required": ["tickers"],
+        },
+    ),
+    Tool(
+        name="get_recommendations_batch",
+        description="批量获取分析师对多只股票的评级和推荐（字段同 get_recommendations），一次返回。涉及两只及以上股票时优先使用",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "tickers": {
+                    "type": "string",
+                    "description": "逗号分隔的股票代码列表，如 'AAPL,MSFT,GOOGL'",
+                }
+            },
+            "required": ["tickers"],
+        },
+    ),
+]
+
+
+# ============================================================
+# 工具调度
+# ============================================================
+
+# 默认的按工具并发上限：新闻搜索容易被限流，技术指标一次拉取多只股票的长周期数据
+TOOL_CONCURRENCY = {
+    "search_financial_news": 2,
+    "get_technical_indicators": 2,
+}
+
+# 在线程池中运行同步的 yfinance 调用，避免阻塞事件循环（配置见 core.executor.scheduler_from_env）
+_scheduler = scheduler_from_env(TOOL_CONCURRENCY)
+
+# 相同工具 + 相同参数的并发调用只执行一次，成功结果短暂缓存（秒）
+# 设置了 SHARED_CACHE_PATH 时结果同时写入跨进程共享缓存（多个进程内模式的 worker 之间共享）
+MCP_RESULT_TTL = float(os.getenv("MCP_RESULT_TTL", "10"))
+_single_flight = SingleFlight(ttl=MCP_RESULT_TTL, store=shared_store_from_env(), namespace="tool_result")
+
+_TOOL_SCHEMAS = {tool.name: tool.inputSchema for tool in TOOLS}
+
+# 支持逐行推送部分结果的工具（实现函数接受 on_row 参数）
+PROGRESSIVE_TOOLS = {
+    "compare_stocks",
+    "get_stock_info_batch",
+    "get_stock_history_batch",
+    "get_stock_news_batch",
+    "get_recommendations_batch",
+}
+
+
+def normalize_arguments(name: str, arguments: dict | None) -> dict[str, Any]:
+    """补齐默认值并统一参数格式，等价的调用得到相同的参数（也是请求合并的键）"""
+    schema = _TOOL_SCHEMAS.get(name, {})
+    normalized = {
+        key: prop["default"]
+        for key, prop in schema.get("properties", {}).items()
+        if "default" in prop
+    }
+    normalized.update(arguments or {})
+
+    if isinstance(normalized.get("ticker"), str):
+        normalized["ticker"] = market_data.normalize_ticker(normalized["ticker"])
+    if isinstance(normalized.get("tickers"), str):
+        normalized["tickers"] = ",".join(batch.unique_symbols(normalized["tickers"].split(",")))
+    if isinstance(normalized.get("query"), str):
+        normalized["query"] = " ".join(normalized["query"].split())
+    return normalized
+
+
+def _build_call(name: str, arguments: dict[str, Any]) -> Callable[[], dict[str, Any]] | None:
+    """根据工具名称构建对应的同步调用，未知工具返回 None"""
+    if name == "get_stock_info":
+        return partial(get_stock_info_impl, arguments["ticker"])
+    if name == "get_stock_history":
+        return partial(get_stock_history_impl, arguments["ticker"], arguments["period"])
+    if name == "search_financial_news":
+        return partial(search_financial_news_impl, arguments["query"], arguments["max_results"])
+    if name == "get_stock_news":
+        return partial(get_stock_news_impl, arguments["ticker"])
+    if name == "compare_stocks":
+        return partial(compare_stocks_impl, arguments["tickers"])
+    if name == "get_recommendations":
+        return partial(get_recommendations_impl, arguments["ticker"])
+    if name == "get_financial_statement":
+        return partial(
+            get_financial_statement_impl,
+            arguments["ticker"],
+            arguments["statement_type"],
+            arguments["quarterly"],
+            arguments["periods"],
+        )
+    if name == "get_technical_indicators":
+        return partial(
+            get_technical_indicators_impl,
+            arguments["tickers"],
+            arguments["period"],
+            arguments["benchmark"],
+        )
+    if name == "get_stock_info_batch":
+        return partial(get_stock_info_batch_impl, arguments["tickers"])
+    if name == "get_stock_history_batch":
+        return partial(get_stock_history_batch_impl, arguments["tickers"], arguments["period"])
+    if name == "get_stock_news_batch":
+        return partial(get_stock_news_batch_impl, arguments["tickers"])
+    if name == "get_recommendations_batch":
+        return partial(get_recommendations_batch_impl, arguments["tickers"])
+    return None
+
+
+async def execute_tool(
+    name: str, arguments: dict | None, on_row: RowCallback | None = None
+) -> dict[str, Any]:
+    """执行工具调用
+
+    相同工具 + 规范化后相同参数的并发调用共享同一次执行，
+    成功结果在 MCP_RESULT_TTL 秒内直接复用，失败结果不缓存。
+    执行方因自己的请求被取消或超过截止时间而失败时，合并进来的调用各自重新执行，
+    不会拿到别人的取消或超时错误。
+
+    on_row 在事件循环中回调，只有真正执行的那次调用会收到部分结果，
+    合并到进行中调用或命中缓存时直接得到完整结果。
+    """
+    arguments = normalize_arguments(name, arguments)
+    func = _build_call(name, arguments)
+    if func is None:
+        return {"success": False, "error": f"未知工具: {name}"}
+
+    if on_row is not None and name in PROGRESSIVE_TOOLS:
+        # 实现函数在调度器的线程中运行，把回调转回事件循环
+        loop = asyncio.get_running_loop()
+        func = partial(func, on_row=lambda row, total: loop.call_soon_threadsafe(on_row, row, total))
+
+    key = json.dumps([name, arguments], ensure_ascii=False, sort_keys=True)
+    return await _single_flight.do(
+        key,
+        partial(_schedule, name, func),
+        cacheable=lambda result: result.get("success", False),
+    )
+
+
+async def _schedule(name: str, func: Callable[[], dict[str, Any]]) -> dict[str, Any]:
+    """交给调度器执行，繁忙、超时和异常都转换为错误结果
+
+    因当前请求自身被取消或超过截止时间而失败时，错误结果包在 PrivateResult 中抛出，
+    只返回给当前请求，合并进来的其他调用方会重新执行。
+    """
+    try:
+        return await _scheduler.run(name, func)
+    except ToolRejected as e:
+        return {"success": False, "error": str(e)}
+    except ToolTimeout as e:
+        result = {"success": False, "error": f"工具 {name} {e}，请稍后重试"}
+        if _caller_gave_up():
+            raise PrivateResult(result) from None
+        return result
+    except deadline.Cancelled as e:
+        raise PrivateResult({"success": False, "error": f"工具 {name} 已取消：{e}"}) from None
+    except Exception as e:
+        return {"success": False, "error": f"工具 {name} 执行异常: {str(e)}"}
+
+
+# 调度器按当前令牌的剩余时间设置超时，超时触发时令牌可能还差时钟精度量级的时间才算过期
+_DEADLINE_SLACK = 0.005
 
 
-def _round(value, n=2):
-    if value is None:
-        return "N/A"
-    return round(value, n)
+def _caller_gave_up() -> bool:
+    """当前请求已被取消或已到截止时间（超时来自请求自身的预算，而不是调度器的统一超时）"""
+    token = deadline.current()
+    if token is None:
+        return False
+    remaining = token.remaining()
+    return token.cancelled or (remaining is not None and remaining <= _DEADLINE_SLACK)
 
 
-def _format_pct(value):
-    if value is None:
-        return "N/A"
-    return f"{value * 100:.2f}%"
+def clear_result_cache() -> None:
+    """清空工具结果的短期缓存"""
+    _single_flight.clear()
+
+
+# 运行统计以 MCP 资源的形式提供，客户端（如 Web 服务的 /metrics）通过 resources/read 读取
+STATS_URI = "finance://server/stats"
+
+
+def server_stats() -> dict[str, Any]:
+    """调度器、请求合并、行情缓存与取消的运行统计（排队深度、等待时间、运行时间、命中率、取消次数等）"""
+    return {
+        "scheduler": _scheduler.stats(),
+        "single_flight": _single_flight.stats(),
+        "market_cache": market_cache.stats(),
+        "deadline": deadline.stats(),
+    }
 
 
 # ============================================================
@@ -257,8 +738,8 @@ def _format_pct(value):
 # ============================================================
 
 
-async def serve() -> None:
-    """启动 MCP Server"""
+def create_server() -> Server:
+    """创建 MCP Server 并注册工具"""
 
     server = Server("finance-agent-mcp")
 
@@ -269,169 +750,203 @@ async def serve() -> None:
     @server.list_tools()
     async def list_tools() -> list[Tool]:
         """返回可用工具列表"""
+        return TOOLS
+
+    # ========================================
+    # 运行统计资源
+    # ========================================
+
+    @server.list_resources()
+    async def list_resources() -> list[Resource]:
         return [
-            Tool(
-                name="get_stock_info",
-                description="获取股票的基本信息，包括当前价格、市值、市盈率等关键指标",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "ticker": {
-                            "type": "string",
-                            "description": "股票代码，如 AAPL, MSFT, 600519.SS (贵州茅台), 000001.SZ (平安银行)",
-                        }
-                    },
-                    "required": ["ticker"],
-                },
-            ),
-            Tool(
-                name="get_stock_history",
-                description="获取股票的历史价格数据，包括汇总统计和近期交易数据",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "ticker": {
-                            "type": "string",
-                            "description": "股票代码",
-                        },
-                        "period": {
-                            "type": "string",
-                            "description": "时间范围，可选值: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, ytd, max",
-                            "default": "1mo",
-                        },
-                    },
-                    "required": ["ticker"],
-                },
-            ),
-            Tool(
-                name="search_financial_news",
-                description="搜索财经新闻和信息，返回相关新闻列表",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "搜索关键词，如'苹果公司财报'、'A股市场行情'",
-                        },
-                        "max_results": {
-                            "type": "integer",
-                            "description": "返回结果数量",
-                            "default": 6,
-                        },
-                    },
-                    "required": ["query"],
-                },
-            ),
-            Tool(
-                name="get_stock_news",
-                description="获取与特定股票相关的最新新闻",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "ticker": {
-                            "type": "string",
-                            "description": "股票代码",
-                        }
-                    },
-                    "required": ["ticker"],
-                },
-            ),
-            Tool(
-                name="compare_stocks",
-                description="对比多只股票的关键指标，帮助分析投资价值",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "tickers": {
-                            "type": "string",
-                            "description": "逗号分隔的股票代码列表，如 'AAPL,MSFT,GOOGL'",
-                        }
-                    },
-                    "required": ["tickers"],
-                },
-            ),
-            Tool(
-                name="get_recommendations",
-                description="获取分析师对股票的评级和推荐",
-                inputSchema={
-                    "type": "object",
-                    "properties": {
-                        "ticker": {
-                            "type": "string",
-                            "description": "股票代码",
-                        }
-                    },
-                    "required": ["ticker"],
-                },
-            ),
+            Resource(
+                uri=STATS_URI,
+                name="server_stats",
+                description="调度器、请求合并、行情缓存与取消的运行统计",
+                mimeType="application/json",
+            )
         ]
 
+    @server.read_resource()
+    async def read_resource(uri) -> list[ReadResourceContents]:
+        if str(uri) != STATS_URI:
+            raise ValueError(f"未知资源: {uri}")
+        return [ReadResourceContents(content=json.dumps(server_stats()), mime_type="application/json")]
+
     # ========================================
     # 处理工具调用
     # ========================================
 
     @server.call_tool()
     async def call_tool(name: str, arguments: dict) -> list[TextContent | ImageContent | EmbeddedResource]:
-        """执行工具调用（在线程池中运行同步函数，避免阻塞事件循环）"""
-
-        loop = asyncio.get_event_loop()
-        timeout = 30  # 超时时间（秒）
-
-        # 根据工具名称构建对应的同步调用
-        if name == "get_stock_info":
-            func = partial(get_stock_info_impl, arguments["ticker"])
-        elif name == "get_stock_history":
-            period = arguments.get("period", "1mo")
-            func = partial(get_stock_history_impl, arguments["ticker"], period)
-        elif name == "search_financial_news":
-            max_results = arguments.get("max_results", 6)
-            func = partial(search_financial_news_impl, arguments["query"], max_results)
-        elif name == "get_stock_news":
-            func = partial(get_stock_news_impl, arguments["ticker"])
-        elif name == "compare_stocks":
-            func = partial(compare_stocks_impl, arguments["tickers"])
-        elif name == "get_recommendations":
-            func = partial(get_recommendations_impl, arguments["ticker"])
-        else:
-            result = {"success": False, "error": f"未知工具: {name}"}
-            return [
-                TextContent(
-                    type="text",
-                    text=json.dumps(result, ensure_ascii=False, indent=2),
+        """执行工具调用（并发的相同调用会合并为一次执行）
+
+        客户端请求了进度（progressToken）时，部分结果以进度通知逐行推送；
+        _meta.deadline_ms 为客户端剩余的时间预算，客户端取消（notifications/cancelled）时
+        本协程被取消，调度器随即通知工具线程退出。
+        """
+        ctx = server.request_context
+        progress_token = ctx.meta.progressToken if ctx.meta else None
+        budget_ms = getattr(ctx.meta, "deadline_ms", None) if ctx.meta else None
+        with deadline.scope(budget_ms / 1000 if budget_ms is not None else None):
+            if progress_token is None:
+                result = await execute_tool(name, arguments)
+            else:
+                result = await _execute_with_progress(
+                    ctx.session, progress_token, str(ctx.request_id), name, arguments
                 )
-            ]
-
-        # 在线程池中执行同步函数，并设置超时
-        try:
-            result = await asyncio.wait_for(
-                loop.run_in_executor(_executor, func),
-                timeout=timeout,
-            )
-        except asyncio.TimeoutError:
-            result = {"success": False, "error": f"工具 {name} 执行超时（{timeout}秒），请稍后重试"}
-        except Exception as e:
-            result = {"success": False, "error": f"工具 {name} 执行异常: {str(e)}"}
-
-        # 返回结果
         return [
             TextContent(
                 type="text",
-                text=json.dumps(result, ensure_ascii=False, indent=2),
+                text=encode_result(result),
             )
         ]
 
-    # ========================================
-    # 启动服务器
-    # ========================================
+    return server
+
+
+async def _execute_with_progress(
+    session, progress_token: str | int, request_id: str, name: str, arguments: dict
+) -> dict[str, Any]:
+    """执行工具，每完成一行就发送一条进度通知，message 为该行的 JSON
+
+    通知由单独的任务按顺序发送，全部发出后才返回最终结果。
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def forward():
+        progress = 0
+        while (item := await queue.get()) is not None:
+            row, total = item
+            progress += 1
+            try:
+                await session.send_progress_notification(
+                    progress_token,
+                    progress,
+                    total,
+                    json.dumps(row, ensure_ascii=False),
+                    related_request_id=request_id,
+                )
+            except Exception:
+                # 客户端已断开等情况下放弃推送，不影响最终结果
+                return
+
+    forwarder = asyncio.create_task(forward())
+    try:
+        return await execute_tool(name, arguments, on_row=lambda row, total: queue.put_nowait((row, total)))
+    finally:
+        queue.put_nowait(None)
+        await forwarder
+
 
+def warm_up() -> None:
+    """在后台线程中导入取数模块，与客户端握手、列出工具同时进行"""
+    threading.Thread(target=preload, args=DATA_MODULES, name="warm-up", daemon=True).start()
+
+
+async def serve() -> None:
+    """通过 stdio 启动 MCP Server（每个客户端各自启动一个子进程）"""
+    warm_up()
+    server = create_server()
     options = server.create_initialization_options()
     async with stdio_server() as (read_stream, write_stream):
         await server.run(read_stream, write_stream, options, raise_exceptions=True)
 
 
+# ============================================================
+# 共享服务模式（Streamable HTTP / Unix Socket）
+# ============================================================
+
+# 共享服务的默认地址，客户端通过 MCP_URL / MCP_SOCKET 连接
+MCP_HOST = os.getenv("MCP_HOST", "127.0.0.1")
+MCP_PORT = int(os.getenv("MCP_PORT", "8765"))
+MCP_SOCKET = os.getenv("MCP_SOCKET", "/tmp/finance-mcp.sock")
+
+
+def create_http_app():
+    """Streamable HTTP 的 ASGI 应用
+
+    一个常驻进程服务所有客户端（多个 API worker、Agent、示例脚本），
+    缓存、本地行情库、调度器和取数线程池都在进程内共享。
+    MCP 端点为 /mcp，/health 返回调度与请求合并的运行统计，/metrics 为同样内容的 Prometheus 格式。
+    """
+    from contextlib import asynccontextmanager
+
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, PlainTextResponse
+    from starlette.routing import Mount, Route
+
+    session_manager = StreamableHTTPSessionManager(app=create_server())
+
+    async def handle_mcp(scope, receive, send):
+        await session_manager.handle_request(scope, receive, send)
+
+    async def health(request):
+        return JSONResponse({"status": "healthy", **server_stats()})
+
+    async def metrics(request):
+        from core.metrics import CONTENT_TYPE, render, server_stats_metrics
+
+        return PlainTextResponse(render(server_stats_metrics(server_stats())), media_type=CONTENT_TYPE)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        warm_up()
+        async with session_manager.run():
+            yield
+
+    return Starlette(
+        routes=[Route("/health", health), Route("/metrics", metrics), Mount("/mcp", app=handle_mcp)],
+        lifespan=lifespan,
+    )
+
+
+def serve_http(host: str = MCP_HOST, port: int = MCP_PORT, socket_path: str | None = None) -> None:
+    """启动共享服务：指定 socket_path 时监听 Unix Socket，否则监听 host:port"""
+    import uvicorn
+
+    if socket_path:
+        socket = Path(socket_path)
+        if socket.is_socket():
+            # 上次异常退出残留的 socket 文件
+            socket.unlink()
+        print(f"MCP Server 监听 unix:{socket_path}", file=sys.stderr)
+    else:
+        print(f"MCP Server 监听 http://{host}:{port}/mcp", file=sys.stderr)
+
+    config = uvicorn.Config(
+        create_http_app(),
+        host=host,
+        port=port,
+        uds=socket_path,
+        log_level="warning",
+    )
+    uvicorn.Server(config).run()
+
+
 def main():
     """主入口"""
-    asyncio.run(serve())
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Finance Agent MCP Server")
+    parser.add_argument(
+        "--transport",
+        choices=("stdio", "http", "unix"),
+        default=os.getenv("MCP_SERVER_TRANSPORT", "stdio"),
+        help="stdio: 作为子进程运行；http / unix: 作为多客户端共享的常驻服务",
+    )
+    parser.add_argument("--host", default=MCP_HOST)
+    parser.add_argument("--port", type=int, default=MCP_PORT)
+    parser.add_argument("--socket", default=MCP_SOCKET, help="Unix Socket 路径")
+    args = parser.parse_args()
+
+    if args.transport == "stdio":
+        asyncio.run(serve())
+    elif args.transport == "http":
+        serve_http(args.host, args.port)
+    else:
+        serve_http(socket_path=args.socket)
 
 
 if __name__ == "__main__":
@@ -7,9 +7,10 @@ from langchain_openai import ChatOpenAI
 from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage
 from langchain.agents import create_agent
-import yfinance as yf
-from duckduckgo_search import DDGS
-import json
+
+from core import market_data
+from core.encoding import encode_result
+from core.provider import data_provider
 
 # ============================================================
 # 研究专用工具
@@ -29,8 +30,7 @@ def search_financial_news(query: str) -> str:
         query: 搜索关键词，如"苹果公司财报"、"科技股行情"
     """
     try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=6))
+        results = data_provider.search_text(query, max_results=6)
 
         if not results:
             return f"未找到关于 '{query}' 的搜索结果"
@@ -43,7 +43,7 @@ def search_financial_news(query: str) -> str:
                 "来源": r.get("href", ""),
             })
 
-        return json.dumps(news_list, ensure_ascii=False, indent=2)
+        return encode_result(news_list)
     except Exception as e:
         return f"搜索时出错: {str(e)}"
 
@@ -61,8 +61,7 @@ def get_stock_news(ticker: str) -> str:
         ticker: 股票代码，如 AAPL, MSFT, 600519.SS
     """
     try:
-        stock = yf.Ticker(ticker)
-        news = stock.news
+        news = market_data.get_news(ticker)
 
         if not news:
             return f"未找到 {ticker} 的相关新闻"
@@ -77,7 +76,7 @@ def get_stock_news(ticker: str) -> str:
                         or item.get("link", "N/A"),
             })
 
-        return json.dumps(news_list, ensure_ascii=False, indent=2)
+        return encode_result(news_list)
     except Exception as e:
         return f"获取 {ticker} 新闻时出错: {str(e)}"
 
@@ -95,8 +94,7 @@ def get_market_sentiment(ticker: str) -> str:
         ticker: 股票代码
     """
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = market_data.get_info(ticker)
 
         # 获取推荐摘要
         sentiment = {
@@ -114,7 +112,7 @@ def get_market_sentiment(ticker: str) -> str:
             upside = (sentiment["目标均价"] / sentiment["当前价格"] - 1) * 100
             sentiment["目标涨幅"] = f"{upside:.2f}%"
 
-        return json.dumps(sentiment, ensure_ascii=False, indent=2)
+        return encode_result(sentiment)
     except Exception as e:
         return f"获取 {ticker} 市场情绪时出错: {str(e)}"
 
@@ -0,0 +1,233 @@
+"""
+Agent 运行的准入控制
+每个对话请求都会运行一次 Agent 循环（多次 LLM 调用 + 工具调用）。不加限制时，流量高峰下所有请求一起变慢，
+还会触发 LLM 的限流，MCP Server 的工具线程池也会被占满。这里限制同时运行的 Agent 数：
+
+- 超过上限的请求进入等待队列，按客户端轮转放行（每个客户端各放行一个，再轮到下一个），
+  一个客户端连续发很多请求时不会挤占其他客户端
+- 队列（总数或单个客户端的排队数）已满时立即拒绝，接口返回 429，不再无限堆积
+- 排队位置变化时回调通知，流式接口以 queue 事件推送给前端
+- 排队时间计入请求的截止时间（CHAT_TIMEOUT）
+"""
+
+import asyncio
+import os
+from collections import OrderedDict, deque
+from typing import Any, Callable
+
+# 同时运行的 Agent 数上限
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "8"))
+# 等待队列上限（全部客户端合计 / 单个客户端）
+AGENT_QUEUE_SIZE = int(os.getenv("AGENT_QUEUE_SIZE", "32"))
+AGENT_QUEUE_PER_CLIENT = int(os.getenv("AGENT_QUEUE_PER_CLIENT", "4"))
+
+
+class AdmissionRejected(Exception):
+    """等待队列已满，请求未执行
+
+    Attributes:
+        retry_after: 建议的重试间隔（秒）
+    """
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """一次 Agent 运行的准入凭证，运行结束后必须交给 release() 归还"""
+
+    def __init__(self, client: str):
+        self.client = client
+        self.granted = asyncio.get_running_loop().create_future()
+        # 排队位置可能变化时置位
+        self.moved = asyncio.Event()
+        self.released = False
+
+
+class AdmissionController:
+    """限制同时运行的 Agent 数，超出的请求按客户端公平排队
+
+    Args:
+        max_running: 同时运行的上限
+        max_queue: 等待中的请求数上限
+        max_queue_per_client: 单个客户端等待中的请求数上限
+    """
+
+    def __init__(
+        self,
+        max_running: int = AGENT_MAX_CONCURRENCY,
+        max_queue: int = AGENT_QUEUE_SIZE,
+        max_queue_per_client: int = AGENT_QUEUE_PER_CLIENT,
+    ):
+        self.max_running = max_running
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.running = 0
+        # 客户端 -> 排队的凭证；字典顺序即轮转顺序，放行后该客户端移到末尾
+        self._queues: OrderedDict[str, deque[Ticket]] = OrderedDict()
+        self._queued = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    def check(self, client: str) -> None:
+        """请求能否进入（立即运行或排队），不能时抛出 AdmissionRejected，不占用名额
+
+        Raises:
+            AdmissionRejected: 队列已满
+        """
+        if self.running < self.max_running and not self._queued:
+            return
+        if self._queued >= self.max_queue:
+            self._rejected += 1
+            raise AdmissionRejected(
+                f"服务器繁忙：已有 {self._queued} 个请求在排队，请稍后重试", self._retry_after()
+            )
+        queue = self._queues.get(client)
+        if queue is not None and len(queue) >= self.max_queue_per_client:
+            self._rejected += 1
+            raise AdmissionRejected(
+                f"请求过于频繁：您已有 {len(queue)} 个请求在排队，请等待之前的回答完成", self._retry_after()
+            )
+
+    def acquire(self, client: str) -> Ticket:
+        """申请运行名额：有空闲名额时立即获得，否则进入队列，由 wait() 等待放行
+
+        Raises:
+            AdmissionRejected: 队列已满
+        """
+        self.check(client)
+        ticket = Ticket(client)
+        if self.running < self.max_running and not self._queued:
+            self._grant(ticket)
+        else:
+            self._queues.setdefault(client, deque()).append(ticket)
+            self._queued += 1
+            self._notify_moved()
+        return ticket
+
+    async def wait(self, ticket: Ticket, on_position: Callable[[int], None] | None = None) -> float:
+        """等待放行，返回排队时间（秒），没有排队时为 0
+
+        on_position 在排队位置变化时调用（1 表示下一个放行），放行时以 0 调用一次。
+        等待被取消（超时、客户端断开）时退出队列，若恰好已放行则归还名额，之后的 release() 不再重复归还。
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        position = None
+        while not ticket.granted.done():
+            current = self.position(ticket)
+            if on_position is not None and current != position:
+                on_position(current)
+            position = current
+            ticket.moved.clear()
+            moved = asyncio.ensure_future(ticket.moved.wait())
+            try:
+                await asyncio.wait((ticket.granted, moved), return_when=asyncio.FIRST_COMPLETED)
+            except asyncio.CancelledError:
+                self._leave(ticket)
+                raise
+            finally:
+                moved.cancel()
+        if position is None:
+            # 没有排队，直接获得了名额
+            return 0.0
+        waited = loop.time() - started
+        self._wait_total += waited
+        if on_position is not None:
+            on_position(0)
+        return waited
+
+    def release(self, ticket: Ticket) -> None:
+        """归还名额（未放行的凭证则退出队列），重复调用无影响"""
+        self._leave(ticket)
+
+    def position(self, ticket: Ticket) -> int:
+        """凭证在放行顺序中的位置（从 1 开始），已放行时为 0
+
+        按客户端轮转放行：排在本客户端第 i 个（从 0 开始）的请求，
+        前面有每个客户端的前 i 个请求，以及轮转顺序在本客户端之前、排队数超过 i 的客户端的第 i 个请求。
+        """
+        if ticket.granted.done():
+            return 0
+        queue = self._queues.get(ticket.client)
+        if queue is None or ticket not in queue:
+            return 0
+        index = queue.index(ticket)
+        ahead = 0
+        before = True
+        for client, other in self._queues.items():
+            if client == ticket.client:
+                before = False
+                continue
+            ahead += min(len(other), index + 1 if before else index)
+        return ahead + index + 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "max_running": self.max_running,
+            "running": self.running,
+            "max_queue": self.max_queue,
+            "queued": self._queued,
+            "clients_queued": len(self._queues),
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "wait_total_s": round(self._wait_total, 6),
+        }
+
+    def _grant(self, ticket: Ticket) -> None:
+        self.running += 1
+        self._admitted += 1
+        ticket.granted.set_result(None)
+
+    def _dispatch(self) -> None:
+        """有空闲名额时按客户端轮转放行"""
+        granted = False
+        while self.running < self.max_running and self._queues:
+            client, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            self._grant(ticket)
+            granted = True
+        if granted:
+            self._notify_moved()
+
+    def _leave(self, ticket: Ticket) -> None:
+        """退出队列：已放行则归还名额"""
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.granted.done() and not ticket.granted.cancelled():
+            self.running -= 1
+            self._dispatch()
+            return
+        queue = self._queues.get(ticket.client)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            self._queued -= 1
+            if not queue:
+                del self._queues[ticket.client]
+            self._notify_moved()
+        ticket.granted.cancel()
+
+    def _notify_moved(self) -> None:
+        for queue in self._queues.values():
+            for ticket in queue:
+                ticket.moved.set()
+
+    def _retry_after(self) -> int:
+        """粗略估计：队列中每 max_running 个请求约需一轮 Agent 运行（按 10 秒计）"""
+        return max(1, round(10 * (self._queued + 1) / self.max_running))
+
+
+# 进程级共享的准入控制
+admission = AdmissionController()
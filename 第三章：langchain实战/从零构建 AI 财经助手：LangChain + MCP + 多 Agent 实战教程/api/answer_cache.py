@@ -0,0 +1,267 @@
+"""
+回答缓存
+相同的问题（规范化后）在数据仍然新鲜时直接返回上次的回答，不再运行 Agent 循环。
+
+新鲜度由回答用到的工具决定：行情类数据几分钟就过期，财务报表可以保留一天。
+时间按新鲜度周期对齐分桶（如 5 分钟的桶为 10:00-10:05、10:05-10:10），
+回答在所在桶结束时过期，缓存键相当于「规范化的问题 + 新鲜度桶」，多个进程的分桶边界一致。
+
+流式接口缓存的是推送过的 SSE 事件（工具调用和回答文本），命中时按原顺序重放。
+只缓存正常完成、回答非空且没有工具返回错误的结果。
+
+精确匹配未命中时再查语义索引（见 api/semantic_cache.py），换一种说法的同一个问题也能命中。
+
+配置了共享缓存（core.shared_store，多 worker 部署时）时，回答同时写入共享缓存，
+其他 worker 上的精确匹配也能命中；语义索引仍在各进程内，从共享缓存读到的回答会加入本进程的索引。
+
+get / put 会计算问题的向量（使用本地模型时每次几到几十毫秒）并读写 SQLite 共享缓存，
+异步代码中要用 asyncio.to_thread 调用，不要直接在事件循环中调用。
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Iterable
+
+from api.semantic_cache import SEMANTIC_CACHE_ENABLED, SemanticIndex
+from core.encoding import is_error_result
+from core.shared_store import SharedStore, shared_store_from_env
+
+# 关闭回答缓存：ANSWER_CACHE=0
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") not in ("0", "false", "off")
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+
+# 各工具数据的新鲜度（秒）：回答的有效期取所用工具中最短的一个
+TOOL_FRESHNESS = {
+    "get_stock_info": 300,
+    "get_stock_info_batch": 300,
+    "compare_stocks": 300,
+    "get_stock_history": 900,
+    "get_stock_history_batch": 900,
+    "get_technical_indicators": 900,
+    "get_stock_news": 900,
+    "get_stock_news_batch": 900,
+    "search_financial_news": 900,
+    "get_recommendations": 6 * 3600,
+    "get_recommendations_batch": 6 * 3600,
+    "get_financial_statement": 24 * 3600,
+    "think": None,  # 不取数，不影响新鲜度
+}
+
+# 未列出的工具按行情数据处理
+DEFAULT_TOOL_FRESHNESS = 300
+
+# 没有调用任何取数工具的回答（如拒答、概念解释）的有效期
+NO_DATA_FRESHNESS = float(os.getenv("ANSWER_CACHE_MAX_TTL", str(24 * 3600)))
+
+# 问题首尾的标点和语气词不影响含义
+_EDGE_PUNCTUATION = re.compile(r"^[\s?？!！。.,，、~～]+|[\s?？!！。.,，、~～]+$")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """规范化问题：全角转半角、统一大小写、合并空白、去掉首尾标点"""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = _SPACES.sub(" ", text)
+    return _EDGE_PUNCTUATION.sub("", text)
+
+
+def freshness(tools: Iterable[str]) -> float:
+    """回答的新鲜度（秒）：所用工具中最短的一个"""
+    periods = [TOOL_FRESHNESS.get(name, DEFAULT_TOOL_FRESHNESS) for name in tools]
+    periods = [period for period in periods if period is not None]
+    return min(periods, default=NO_DATA_FRESHNESS)
+
+
+def bucket_end(period: float, now: float | None = None) -> float:
+    """当前新鲜度桶的结束时间（Unix 时间戳）"""
+    now = time.time() if now is None else now
+    return (now // period + 1) * period
+
+
+# ============================================================
+# 记录一次回答
+# ============================================================
+
+
+class AnswerRecorder:
+    """记录 Agent 运行过程中的工具调用、工具结果和回答文本，用于写入缓存"""
+
+    def __init__(self):
+        self.frames: list[dict[str, str]] = []
+        self.tools: list[str] = []
+        self.failed = False
+        self._texts: OrderedDict[str, str] = OrderedDict()
+
+    def tool_call(self, name: str, args: Any) -> None:
+        self.tools.append(name)
+        self.frames.append({
+            "event": "tool_call",
+            "data": json.dumps({"name": name, "args": args}, ensure_ascii=False),
+        })
+
+    def tool_result(self, content: Any) -> None:
+        if is_error_result(content):
+            self.failed = True
+
+    def text(self, message_id: str | None, chunk: str) -> None:
+        """回答文本片段：同一条消息的片段合并，重放时作为一个事件推送"""
+        key = message_id or f"message-{len(self.frames)}"
+        if key not in self._texts:
+            self.frames.append({"event": "message", "data": "", "_id": key})
+        self._texts[key] = self._texts.get(key, "") + chunk
+
+    @property
+    def answer(self) -> str:
+        """最后一条消息的文本，即最终回答"""
+        return next(reversed(self._texts.values()), "")
+
+    @property
+    def cacheable(self) -> bool:
+        return not self.failed and bool(self.answer.strip())
+
+    def entry(self) -> dict[str, Any]:
+        frames = [
+            {"event": "message", "data": self._texts[frame["_id"]]} if "_id" in frame else frame
+            for frame in self.frames
+        ]
+        return {"answer": self.answer, "frames": frames, "tools": sorted(set(self.tools))}
+
+    @classmethod
+    def from_messages(cls, messages: list[Any]) -> "AnswerRecorder":
+        """从 agent.ainvoke 返回的消息列表构建（非流式接口）"""
+        recorder = cls()
+        for message in messages:
+            if message.type == "ai":
+                for call in getattr(message, "tool_calls", None) or []:
+                    recorder.tool_call(call["name"], call["args"])
+                if isinstance(message.content, str) and message.content:
+                    recorder.text(message.id, message.content)
+            elif message.type == "tool":
+                recorder.tool_result(message.content)
+        return recorder
+
+
+# ============================================================
+# 缓存
+# ============================================================
+
+
+class AnswerCache:
+    """进程内的回答缓存（LRU），键为模型名 + 规范化的问题
+
+    Args:
+        maxsize: 最大条目数
+        enabled: 为 False 时不读不写
+        semantic: 精确匹配未命中时是否按语义相似度查找
+        store: 跨进程共享的缓存，None 表示只用进程内缓存
+    """
+
+    def __init__(
+        self,
+        maxsize: int = ANSWER_CACHE_SIZE,
+        enabled: bool = ANSWER_CACHE_ENABLED,
+        semantic: bool = SEMANTIC_CACHE_ENABLED,
+        store: SharedStore | None = None,
+    ):
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.store = store
+        self.semantic = SemanticIndex(maxsize) if semantic else None
+        self._data: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, question: str) -> str:
+        return f"{model}\n{normalize_question(question)}"
+
+    def get(self, model: str, question: str) -> dict[str, Any] | None:
+        """读取仍在新鲜度桶内的回答
+
+        返回的条目带有 age（秒）和 match：exact 为精确匹配，semantic 为语义匹配（另有 similarity）。
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        key = self.key(model, question)
+        entry = self._lookup(key, now)
+        if entry is None and self.store is not None:
+            # 其他 worker 写入的回答
+            entry = self.store.get("answer", key)
+            if entry is not None:
+                self._store_local(key, model, question, entry)
+        if entry is not None:
+            return {**entry, "age": round(now - entry["created_at"], 1), "match": "exact"}
+        if self.semantic is None:
+            return None
+
+        found = self.semantic.search(model, question, now)
+        if found is None:
+            return None
+        key, similarity = found
+        entry = self._lookup(key, now)
+        if entry is None:
+            return None
+        return {
+            **entry, "age": round(now - entry["created_at"], 1),
+            "match": "semantic", "similarity": round(similarity, 3),
+        }
+
+    def _lookup(self, key: str, now: float) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= now:
+                del self._data[key]
+                self._forget(key)
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def put(self, model: str, question: str, recorder: AnswerRecorder) -> bool:
+        """写入一次回答，不可缓存（或缓存已关闭）时返回 False"""
+        if not self.enabled or not recorder.cacheable:
+            return False
+        entry = recorder.entry()
+        now = time.time()
+        expires_at = bucket_end(freshness(entry["tools"]), now)
+        entry.update(created_at=now, expires_at=expires_at)
+        key = self.key(model, question)
+        self._store_local(key, model, question, entry)
+        if self.store is not None:
+            self.store.set("answer", key, entry, expires_at)
+        return True
+
+    def _store_local(self, key: str, model: str, question: str, entry: dict[str, Any]) -> None:
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted, _ = self._data.popitem(last=False)
+                self._forget(evicted)
+        if self.semantic is not None:
+            self.semantic.add(key, model, question, entry["expires_at"])
+
+    def _forget(self, key: str) -> None:
+        if self.semantic is not None:
+            self.semantic.remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+        if self.semantic is not None:
+            self.semantic.clear()
+        if self.store is not None:
+            self.store.clear("answer")
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# 进程级共享的回答缓存（配置了 SHARED_CACHE_PATH 时各 worker 共享）
+answer_cache = AnswerCache(store=shared_store_from_env())
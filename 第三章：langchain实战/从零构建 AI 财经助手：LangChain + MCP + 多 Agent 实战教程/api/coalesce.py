@@ -0,0 +1,87 @@
+"""
+SSE 回答文本合并
+LLM 流式输出的每个片段通常只有一两个字，逐个作为 SSE 事件推送时，长回答会产生上千个很小的事件，
+每个事件都有协议开销，前端每收到一个都要重新渲染一次 Markdown。
+
+这里把连续的 message 事件合并后再推送：
+- 第一个片段立即推送，不影响首字延迟
+- 之后的片段在时间窗口（SSE_FLUSH_MS）内累积，或累积到 SSE_FLUSH_BYTES 字节时推送
+- 其他事件（tool_call、tool_progress、queue、done、error）立即推送，推送前先发出已累积的文本，保持顺序
+- SSE_FLUSH_MS=0 关闭合并
+
+合并前后的片段数、事件数和每个事件的字节数记入 /metrics（finance_sse_*）。
+"""
+
+import asyncio
+import os
+from typing import AsyncGenerator
+
+from api.metrics import SSE_CHUNKS, SSE_FRAME_BYTES, SSE_FRAMES
+
+# 累积文本的最长时间（毫秒）和最大字节数，任一达到即推送
+SSE_FLUSH_MS = float(os.getenv("SSE_FLUSH_MS", "50"))
+SSE_FLUSH_BYTES = int(os.getenv("SSE_FLUSH_BYTES", "1024"))
+
+
+async def coalesce_messages(
+    queue: asyncio.Queue,
+    flush_ms: float = SSE_FLUSH_MS,
+    flush_bytes: int = SSE_FLUSH_BYTES,
+) -> AsyncGenerator[dict, None]:
+    """从 queue 读取 SSE 事件直到 None，合并连续的 message 事件后逐个产出"""
+    loop = asyncio.get_running_loop()
+    window = flush_ms / 1000
+    pending: list[str] = []
+    pending_bytes = 0
+    deadline = None
+    first = True
+
+    def flush() -> dict:
+        nonlocal pending, pending_bytes, deadline
+        frame = {"event": "message", "data": "".join(pending)}
+        pending, pending_bytes, deadline = [], 0, None
+        return _sent(frame)
+
+    while True:
+        if deadline is None:
+            event = await queue.get()
+        else:
+            try:
+                async with asyncio.timeout_at(deadline):
+                    event = await queue.get()
+            except TimeoutError:
+                yield flush()
+                continue
+
+        if event is None:
+            break
+
+        if event.get("event") != "message":
+            if pending:
+                yield flush()
+            yield _sent(event)
+            continue
+
+        SSE_CHUNKS.inc()
+        if first or window <= 0:
+            first = False
+            yield _sent(event)
+            continue
+
+        pending.append(event["data"])
+        pending_bytes += len(event["data"].encode())
+        if deadline is None:
+            deadline = loop.time() + window
+        if pending_bytes >= flush_bytes:
+            yield flush()
+
+    if pending:
+        yield flush()
+
+
+def _sent(frame: dict) -> dict:
+    event = frame.get("event", "message")
+    SSE_FRAMES.inc(event=event)
+    if event == "message":
+        SSE_FRAME_BYTES.observe(len(frame["data"].encode()))
+    return frame
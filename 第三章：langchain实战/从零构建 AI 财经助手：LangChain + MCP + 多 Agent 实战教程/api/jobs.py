@@ -0,0 +1,622 @@
+"""
+后台任务
+多 Agent 深度研究（agents/multi_agent_system.py）要运行好几分钟，用 SSE 接口时浏览器要一直连着，
+断开就前功尽弃；流量高峰时这类长请求还会占满对话接口的运行名额。这里把它们改为后台任务：
+
+- POST /api/jobs 提交任务后立即返回任务号，任务写入 SQLite（JOBS_DB_PATH），排队数超过 JOB_QUEUE_SIZE 时拒绝
+- 每个 Web 进程有 JOB_CONCURRENCY 个后台 worker，从库中认领排队的任务并运行
+- 任务过程中的事件（工具调用、回答片段、各步骤的结果、状态变化）逐条写入库中，带递增的序号；
+  GET /api/jobs/{id}/events 从任意序号继续推送（SSE 的 id 即序号，EventSource 断线重连时自动带上 Last-Event-ID）
+- 任务出错时自动重试（共 JOB_MAX_ATTEMPTS 次），失败或取消的任务可以手动重试；
+  运行任务的进程退出后心跳中断，超过 JOB_STALE_AFTER 秒由其他 worker 重新认领
+- 结果在库中保留 JOB_RETENTION 秒，期间随时可以查询
+
+多 worker 模式（api/serve.py）下各进程共用同一个库：任一进程都能查询任务、推送事件。
+
+库操作在 JobManager 专用的线程池中执行，等待其他进程的写锁（WAL busy_timeout）时不阻塞事件循环。
+本进程写入的事件直接通知订阅者；其他进程写入的事件由每个进程一个的监视任务发现
+（每 JOB_POLL_INTERVAL 秒读一次 PRAGMA data_version），不必每个订阅者各自轮询。
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncGenerator, Awaitable, Callable
+
+from api.admission import AdmissionRejected
+from api.coalesce import coalesce_messages
+from api.metrics import JOB_DURATION, JOB_QUEUE_WAIT, JOBS
+from core import deadline
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# 任务库文件
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", str(PROJECT_ROOT / ".data" / "jobs.sqlite"))
+# 每个进程同时运行的任务数；排队中的任务数上限（所有进程合计）
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+# 单次运行的时间上限（秒）；出错时最多运行几次（含第一次）
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "900"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+# 运行中的任务多久没有心跳视为进程已退出（秒）；结束的任务保留多久（秒）
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "60"))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(7 * 86400)))
+# 多久查一次库中其他进程的变化（提交的任务、写入的事件）
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# 执行库操作的线程数（每个进程）
+JOB_DB_THREADS = int(os.getenv("JOB_DB_THREADS", "4"))
+
+# 任务状态：queued -> running -> succeeded / failed / cancelled（出错重试时回到 queued）
+TERMINAL = ("succeeded", "failed", "cancelled")
+
+# 任务的执行函数：(任务, 事件队列) -> 结果。事件格式与 SSE 接口相同（{"event": ..., "data": ...}）
+Runner = Callable[[dict[str, Any], asyncio.Queue], Awaitable[Any]]
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        query TEXT NOT NULL,
+        client TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        owner TEXT,
+        cancel_requested INTEGER NOT NULL DEFAULT 0,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        heartbeat_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)",
+    "CREATE INDEX IF NOT EXISTS jobs_client ON jobs (client, created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS job_events (
+        job_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        event TEXT NOT NULL,
+        data TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (job_id, seq)
+    ) WITHOUT ROWID
+    """,
+)
+
+_COLUMNS = (
+    "id", "kind", "query", "client", "status", "attempts", "max_attempts", "owner", "cancel_requested",
+    "result", "error", "created_at", "started_at", "finished_at", "heartbeat_at",
+)
+
+
+# ============================================================
+# 任务库
+# ============================================================
+
+
+class JobStore:
+    """任务和任务事件的 SQLite 存储（WAL 模式，多个进程共用）
+
+    Args:
+        path: 数据库文件路径，不存在时自动创建
+        busy_timeout: 等待其他进程写锁的最长时间（秒）
+    """
+
+    def __init__(self, path: str | Path = JOBS_DB_PATH, busy_timeout: float = 5.0):
+        self.path = Path(path)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._watch_lock = threading.Lock()
+        self._watch_conn: tuple[int, sqlite3.Connection] | None = None
+
+    def create(self, kind: str, query: str, client: str, max_attempts: int) -> dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, query, client, status, max_attempts, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, query, client, max_attempts, time.time()),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        row = self._conn().execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def recent(self, client: str, limit: int = 20) -> list[dict[str, Any]]:
+        """某个客户端最近提交的任务（新的在前）"""
+        rows = self._conn().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE client = ? ORDER BY created_at DESC LIMIT ?",
+            (client, limit),
+        ).fetchall()
+        return [_job(row) for row in rows]
+
+    def count(self, status: str) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def claim(self, owner: str, kinds: tuple[str, ...]) -> dict[str, Any] | None:
+        """认领最早排队的任务（或心跳已中断、还能重试的运行中任务），标记为运行中
+
+        认领是一条 UPDATE 语句，多个进程同时认领时同一个任务只会被一个进程拿到。
+        """
+        now = time.time()
+        placeholders = ", ".join("?" * len(kinds))
+        with self._conn() as conn:
+            row = conn.execute(
+                f"""
+                UPDATE jobs
+                SET status = 'running', owner = ?, attempts = attempts + 1,
+                    started_at = ?, heartbeat_at = ?, error = NULL
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE kind IN ({placeholders}) AND cancel_requested = 0 AND (
+                        status = 'queued'
+                        OR (status = 'running' AND heartbeat_at < ? AND attempts < max_attempts)
+                    )
+                    ORDER BY created_at LIMIT 1
+                )
+                RETURNING {', '.join(_COLUMNS)}
+                """,
+                (owner, now, now, *kinds, now - JOB_STALE_AFTER),
+            ).fetchone()
+        return _job(row) if row else None
+
+    def finish(self, job_id: str, status: str, result: Any = None, error: str | None = None) -> None:
+        """结束一次运行：status 为最终状态，或 queued（重新排队）"""
+        finished_at = time.time() if status in TERMINAL else None
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, owner = NULL WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error, finished_at, job_id,
+                ),
+            )
+
+    def requeue(self, job_id: str, extra_attempts: int = 0, refund: bool = False) -> bool:
+        """已结束（失败或取消）的任务重新排队，extra_attempts 为追加的运行次数；
+        refund=True 时退回本次运行（服务关闭打断的任务），不计入次数
+        """
+        with self._conn() as conn:
+            if refund:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'queued', owner = NULL, attempts = attempts - 1 "
+                    "WHERE id = ? AND status = 'running'",
+                    (job_id,),
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'queued', owner = NULL, cancel_requested = 0, error = NULL, "
+                    "result = NULL, finished_at = NULL, max_attempts = attempts + ? "
+                    "WHERE id = ? AND status IN ('failed', 'cancelled')",
+                    (extra_attempts, job_id),
+                )
+        return cursor.rowcount > 0
+
+    def request_cancel(self, job_id: str) -> str | None:
+        """请求取消：排队中的任务直接取消，运行中的任务打上标记由运行它的进程取消；返回当前状态"""
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def heartbeat(self, job_ids: list[str]) -> list[str]:
+        """更新运行中任务的心跳，返回其中被请求取消的任务"""
+        if not job_ids:
+            return []
+        placeholders = ", ".join("?" * len(job_ids))
+        with self._conn() as conn:
+            conn.execute(f"UPDATE jobs SET heartbeat_at = ? WHERE id IN ({placeholders})", (time.time(), *job_ids))
+            rows = conn.execute(
+                f"SELECT id FROM jobs WHERE id IN ({placeholders}) AND cancel_requested = 1", job_ids,
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def recover(self) -> list[tuple[str, str]]:
+        """心跳中断的任务：已用完运行次数的标记为失败，请求过取消的标记为取消；返回 [(任务号, 状态)]"""
+        now = time.time()
+        with self._conn() as conn:
+            rows = conn.execute(
+                """
+                UPDATE jobs
+                SET status = CASE WHEN cancel_requested = 1 THEN 'cancelled' ELSE 'failed' END,
+                    error = CASE WHEN cancel_requested = 1 THEN error ELSE '运行任务的进程已退出' END,
+                    finished_at = ?, owner = NULL
+                WHERE status = 'running' AND heartbeat_at < ? AND (attempts >= max_attempts OR cancel_requested = 1)
+                RETURNING id, status
+                """,
+                (now, now - JOB_STALE_AFTER),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def append(self, job_id: str, event: str, data: str) -> int:
+        """追加一条事件，返回序号（同一任务内从 1 递增）"""
+        with self._conn() as conn:
+            row = conn.execute(
+                "INSERT INTO job_events (job_id, seq, event, data, created_at) "
+                "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ? FROM job_events WHERE job_id = ? "
+                "RETURNING seq",
+                (job_id, event, data, time.time(), job_id),
+            ).fetchone()
+        return row[0]
+
+    def events(self, job_id: str, after: int = 0, limit: int = 500) -> list[tuple[int, str, str]]:
+        """序号大于 after 的事件 [(序号, 事件名, 数据)]"""
+        return self._conn().execute(
+            "SELECT seq, event, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+            (job_id, after, limit),
+        ).fetchall()
+
+    def purge(self, before: float) -> int:
+        """删除 before 之前结束的任务及其事件，返回删除的任务数"""
+        with self._conn() as conn:
+            conn.execute(
+                "DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)", (before,),
+            )
+            return conn.execute("DELETE FROM jobs WHERE finished_at < ?", (before,)).rowcount
+
+    def status_counts(self) -> dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+    def data_version(self) -> int:
+        """其他连接（包括其他进程）提交写入后变化的版本号，用于发现库中的变化"""
+        # data_version 按连接计算，固定用一个单独的连接比较（本进程其他连接的写入同样会使它变化）
+        with self._watch_lock:
+            if self._watch_conn is None or self._watch_conn[0] != os.getpid():
+                self._watch_conn = (os.getpid(), self._connect())
+            return self._watch_conn[1].execute("PRAGMA data_version").fetchone()[0]
+
+    def _conn(self) -> sqlite3.Connection:
+        """当前线程的连接；fork 之后的子进程重新连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = self._connect()
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        return conn
+
+
+def _job(row: tuple) -> dict[str, Any]:
+    job = dict(zip(_COLUMNS, row))
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    if job["result"] is not None:
+        job["result"] = json.loads(job["result"])
+    return job
+
+
+# ============================================================
+# 后台 worker
+# ============================================================
+
+
+class _Running:
+    """本进程中正在运行的一个任务"""
+
+    def __init__(self, token: deadline.CancelToken):
+        self.token = token
+        self.task: asyncio.Task | None = None
+        # 被用户取消时的原因；为 None 时任务被取消说明服务正在关闭
+        self.cancel_reason: str | None = None
+
+
+class JobManager:
+    """提交、查询任务，在后台运行排队的任务
+
+    所有库操作都在专用线程池中执行，公开的方法都是协程。
+
+    Args:
+        store: 任务库
+        concurrency: 本进程同时运行的任务数
+        max_queue: 排队中的任务数上限
+        timeout: 单次运行的时间上限（秒）
+        max_attempts: 出错时最多运行的次数（含第一次）
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        concurrency: int = JOB_CONCURRENCY,
+        max_queue: int = JOB_QUEUE_SIZE,
+        timeout: float = JOB_TIMEOUT,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ):
+        self.store = store
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._runners: dict[str, Runner] = {}
+        self._running: dict[str, _Running] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._executor: ThreadPoolExecutor | None = None
+        self._wakeup = asyncio.Event()
+        self._changed = asyncio.Event()
+
+    @property
+    def kinds(self) -> tuple[str, ...]:
+        return tuple(self._runners)
+
+    def register(self, kind: str, runner: Runner) -> None:
+        self._runners[kind] = runner
+
+    # ========================================
+    # 启动与关闭
+    # ========================================
+
+    async def start(self) -> None:
+        """启动后台 worker、心跳和库变化监视（在服务启动时调用，须先注册执行函数）"""
+        # fork 出的 worker 进程各自认领任务，线程池也在各进程中各自创建
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._executor = ThreadPoolExecutor(max_workers=JOB_DB_THREADS, thread_name_prefix="jobs-db")
+        await self._db(self.store.purge, time.time() - JOB_RETENTION)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+        self._tasks.append(asyncio.create_task(self._watch()))
+
+    async def stop(self) -> None:
+        """停止后台 worker；运行中的任务退回队列，由下次启动或其他进程继续"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # ========================================
+    # 提交与查询
+    # ========================================
+
+    async def submit(self, kind: str, query: str, client: str) -> dict[str, Any]:
+        """提交任务
+
+        Raises:
+            ValueError: 未知的任务类型
+            AdmissionRejected: 排队中的任务已达上限
+        """
+        if kind not in self._runners:
+            raise ValueError(f"未知的任务类型: {kind}（可选: {', '.join(self._runners)}）")
+        queued = await self._db(self.store.count, "queued")
+        if queued >= self.max_queue:
+            JOBS.inc(kind=kind, outcome="rejected")
+            raise AdmissionRejected(f"任务队列已满（{queued} 个任务在排队），请稍后重试", retry_after=30)
+        job = await self._db(self.store.create, kind, query, client, self.max_attempts)
+        await self._emit(job["id"], "status", {"status": "queued"})
+        JOBS.inc(kind=kind, outcome="submitted")
+        self._wake()
+        return job
+
+    async def get(self, job_id: str) -> dict[str, Any] | None:
+        return await self._db(self.store.get, job_id)
+
+    async def recent(self, client: str, limit: int = 20) -> list[dict[str, Any]]:
+        return await self._db(self.store.recent, client, limit)
+
+    async def cancel(self, job_id: str) -> str | None:
+        """取消任务，返回取消后的状态（运行中的任务由运行它的进程取消，可能稍后才变为 cancelled）"""
+        status = await self._db(self.store.request_cancel, job_id)
+        if status == "cancelled":
+            await self._emit(job_id, "status", {"status": "cancelled"})
+        elif status == "running" and job_id in self._running:
+            self._cancel_local(job_id)
+        return status
+
+    async def retry(self, job_id: str) -> bool:
+        """失败或取消的任务重新排队（再运行最多 max_attempts 次），其他状态返回 False"""
+        if not await self._db(self.store.requeue, job_id, extra_attempts=self.max_attempts):
+            return False
+        await self._emit(job_id, "status", {"status": "queued", "retry": True})
+        self._wake()
+        return True
+
+    async def events(self, job_id: str, after: int = 0) -> AsyncGenerator[dict, None]:
+        """从序号 after 之后推送任务事件，任务结束且事件推送完后结束
+
+        没有新事件时等待通知：本进程写入事件时立即通知，其他进程的写入由 _watch 发现后通知。
+        """
+        while True:
+            # 先记下当前的通知，避免查询之后、等待之前写入的事件被漏掉
+            changed = self._changed
+            rows = await self._db(self.store.events, job_id, after)
+            for seq, event, data in rows:
+                after = seq
+                yield {"id": str(seq), "event": event, "data": data}
+            if rows:
+                continue
+            job = await self._db(self.store.get, job_id)
+            if job is None or job["status"] in TERMINAL:
+                # 结束前写入的事件已在上面的查询中读完（结束状态在最后一条事件之后写入）
+                if not await self._db(self.store.events, job_id, after, limit=1):
+                    return
+                continue
+            await changed.wait()
+
+    async def stats(self) -> dict[str, Any]:
+        counts = await self._db(self.store.status_counts)
+        return {
+            "concurrency": self.concurrency,
+            "running_local": len(self._running),
+            "max_queue": self.max_queue,
+            **{status: counts.get(status, 0) for status in ("queued", "running", *TERMINAL)},
+        }
+
+    # ========================================
+    # 运行
+    # ========================================
+
+    async def _worker(self) -> None:
+        while True:
+            # 先清除再认领：认领之后提交的任务会重新置位，不会被漏掉
+            self._wakeup.clear()
+            job = await self._db(self.store.claim, self.owner, self.kinds)
+            if job is None:
+                try:
+                    async with asyncio.timeout(JOB_POLL_INTERVAL):
+                        await self._wakeup.wait()
+                except TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _run(self, job: dict[str, Any]) -> None:
+        job_id, kind = job["id"], job["kind"]
+        JOB_QUEUE_WAIT.observe(max(0.0, job["started_at"] - job["created_at"]), kind=kind)
+        await self._emit(job_id, "status", {"status": "running", "attempt": job["attempts"]})
+
+        entry = _Running(deadline.CancelToken(self.timeout))
+        self._running[job_id] = entry
+        queue: asyncio.Queue = asyncio.Queue()
+        persister = asyncio.create_task(self._persist(job_id, queue))
+        entry.task = asyncio.create_task(self._invoke(job, queue, entry.token))
+        started = time.monotonic()
+        status, result, error = "failed", None, None
+        try:
+            result = await entry.task
+            status = "succeeded"
+        except asyncio.CancelledError:
+            if entry.cancel_reason is None:
+                # 服务关闭：退回队列，不计入运行次数
+                entry.token.cancel("服务正在关闭")
+                status = "interrupted"
+                raise
+            status, error = "cancelled", entry.cancel_reason
+        except TimeoutError:
+            entry.token.cancel("任务超时")
+            error = f"任务超时（{self.timeout:g}秒）"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if job["attempts"] < job["max_attempts"]:
+                status = "retry"
+        finally:
+            del self._running[job_id]
+            queue.put_nowait(None)
+            await asyncio.shield(persister)
+            # 服务关闭时本协程已被取消，结束记录放在单独的任务中写完
+            await asyncio.shield(self._finish(job, status, result, error, time.monotonic() - started))
+
+    async def _invoke(self, job: dict[str, Any], queue: asyncio.Queue, token: deadline.CancelToken) -> Any:
+        with deadline.use(token):
+            async with asyncio.timeout(self.timeout):
+                return await self._runners[job["kind"]](job, queue)
+
+    async def _persist(self, job_id: str, queue: asyncio.Queue) -> None:
+        """把执行函数产生的事件写入库中；相邻的回答片段先合并，减少写入次数"""
+        async for event in coalesce_messages(queue):
+            await self._append(job_id, event["event"], event["data"])
+
+    async def _finish(
+        self, job: dict[str, Any], status: str, result: Any, error: str | None, duration: float
+    ) -> None:
+        job_id, kind = job["id"], job["kind"]
+        if status == "interrupted":
+            await self._db(self.store.requeue, job_id, refund=True)
+            await self._emit(job_id, "status", {"status": "queued", "interrupted": True})
+            return
+        if status == "retry":
+            await self._db(self.store.finish, job_id, "queued", error=error)
+            await self._emit(job_id, "status", {"status": "queued", "retry": True, "error": error})
+            JOBS.inc(kind=kind, outcome="retried")
+            self._wake()
+            return
+        await self._db(self.store.finish, job_id, status, result=result, error=error)
+        JOBS.inc(kind=kind, outcome=status)
+        JOB_DURATION.observe(duration, kind=kind)
+        await self._emit(job_id, "status", {"status": status, **({"error": error} if error else {})})
+
+    async def _heartbeat(self) -> None:
+        """定期更新本进程任务的心跳、执行其他进程转来的取消请求、回收心跳中断的任务"""
+        interval = JOB_STALE_AFTER / 4
+        last_purge = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                for job_id in await self._db(self.store.heartbeat, list(self._running)):
+                    self._cancel_local(job_id)
+                for job_id, status in await self._db(self.store.recover):
+                    await self._emit(job_id, "status", {"status": status})
+                if time.monotonic() - last_purge > 3600:
+                    last_purge = time.monotonic()
+                    await self._db(self.store.purge, time.time() - JOB_RETENTION)
+            except sqlite3.Error as e:
+                print(f"⚠️ 任务心跳失败: {e}")
+            # 心跳中断的任务可以重新认领了
+            self._wake()
+
+    async def _watch(self) -> None:
+        """发现其他进程写入的变化（事件、状态），通知本进程正在等待的订阅者"""
+        version = None
+        while True:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            try:
+                current = await self._db(self.store.data_version)
+            except sqlite3.Error as e:
+                print(f"⚠️ 读取任务库版本失败: {e}")
+                continue
+            if version is not None and current != version:
+                self._notify()
+            version = current
+
+    def _cancel_local(self, job_id: str) -> None:
+        entry = self._running.get(job_id)
+        if entry is None or entry.cancel_reason is not None:
+            return
+        entry.cancel_reason = "任务已取消"
+        entry.token.cancel(entry.cancel_reason)
+        if entry.task is not None:
+            entry.task.cancel()
+
+    # ========================================
+    # 事件
+    # ========================================
+
+    async def _emit(self, job_id: str, event: str, data: dict[str, Any]) -> None:
+        await self._append(job_id, event, json.dumps(data, ensure_ascii=False))
+
+    async def _append(self, job_id: str, event: str, data: str) -> None:
+        await self._db(self.store.append, job_id, event, data)
+        self._notify()
+
+    def _notify(self) -> None:
+        # 唤醒正在等待事件的订阅者，换一个新的 Event 供下一轮等待
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _wake(self) -> None:
+        self._wakeup.set()
+
+    async def _db(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在专用线程池中执行库操作"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+
+# 进程级共享的任务管理器
+job_manager = JobManager(JobStore())
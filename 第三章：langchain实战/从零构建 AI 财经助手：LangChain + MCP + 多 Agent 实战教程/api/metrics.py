@@ -0,0 +1,247 @@
+"""
+Web 服务的指标
+- HTTP 请求：按路由统计请求数和耗时（SSE 流式响应计到最后一个数据块发出）
+- 对话：首个回答片段的等待时间（TTFT）、每个请求的 LLM 调用次数、结束状态、回答缓存命中
+- 准入控制：正在运行和排队的 Agent 数、排队时间、被拒绝的请求数
+- 后台任务：提交、重试和各结束状态的任务数，排队时间和运行耗时，任务库中各状态的任务数（见 api.jobs）
+- 流式推送：合并前的回答片段数、合并后的事件数和每个事件的字节数（见 api.coalesce）
+- LLM 与工具：由 MetricsCallback（LangChain 回调）记录调用次数、耗时和 token 数
+- MCP Server：抓取时读取服务端的运行统计（排队深度、缓存命中率等），见 core.metrics.server_stats_metrics
+
+聚合都在进程内完成，/metrics 按 Prometheus 文本格式输出。
+"""
+
+import time
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from core.encoding import is_error_result
+from core.metrics import REGISTRY
+
+# ============================================================
+# 指标定义
+# ============================================================
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "finance_http_requests_total", "HTTP 请求数", ("method", "path", "status")
+)
+HTTP_DURATION = REGISTRY.histogram(
+    "finance_http_request_duration_seconds", "HTTP 请求耗时（流式响应计到最后一个数据块）", ("method", "path")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge("finance_http_requests_in_flight", "正在处理的 HTTP 请求数")
+
+CHAT_REQUESTS = REGISTRY.counter(
+    "finance_chat_requests_total", "对话请求数（按接口和结束状态）", ("endpoint", "outcome")
+)
+CHAT_TTFT = REGISTRY.histogram(
+    "finance_chat_time_to_first_token_seconds", "流式对话从收到请求到推送第一个回答片段的时间"
+)
+ANSWER_CACHE = REGISTRY.counter(
+    "finance_answer_cache_requests_total", "回答缓存的查询次数（result 为 exact / semantic / miss）", ("endpoint", "result")
+)
+AGENT_QUEUE_WAIT = REGISTRY.histogram(
+    "finance_agent_queue_wait_seconds", "对话请求等待 Agent 运行名额的时间（只统计排过队的请求）"
+)
+LLM_CALLS_PER_REQUEST = REGISTRY.histogram(
+    "finance_chat_llm_calls_per_request", "每个对话请求调用 LLM 的次数（即 Agent 步数）",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30),
+)
+
+JOBS = REGISTRY.counter(
+    "finance_jobs_total",
+    "后台任务数（outcome 为 submitted / rejected / retried / succeeded / failed / cancelled）",
+    ("kind", "outcome"),
+)
+JOB_QUEUE_WAIT = REGISTRY.histogram(
+    "finance_job_queue_wait_seconds", "后台任务从提交（或重新排队）到开始运行的时间", ("kind",),
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+JOB_DURATION = REGISTRY.histogram(
+    "finance_job_duration_seconds", "后台任务单次运行的耗时", ("kind",),
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 900, 1800),
+)
+
+SSE_CHUNKS = REGISTRY.counter("finance_sse_message_chunks_total", "LLM 输出的回答文本片段数（合并前）")
+SSE_FRAMES = REGISTRY.counter("finance_sse_frames_total", "推送的 SSE 事件数（合并后）", ("event",))
+SSE_FRAME_BYTES = REGISTRY.histogram(
+    "finance_sse_message_frame_bytes", "每个 message 事件的文本字节数（合并后）",
+    buckets=(4, 16, 64, 128, 256, 512, 1024, 2048, 4096),
+)
+
+LLM_CALLS = REGISTRY.counter("finance_llm_calls_total", "LLM 调用次数", ("model", "status"))
+LLM_DURATION = REGISTRY.histogram("finance_llm_call_duration_seconds", "单次 LLM 调用耗时", ("model",))
+LLM_TOKENS = REGISTRY.counter(
+    "finance_llm_tokens_total", "LLM 输入 / 输出 token 数（以模型返回的用量为准）", ("model", "direction")
+)
+
+TOOL_CALLS = REGISTRY.counter(
+    "finance_tool_calls_total", "Agent 发起的工具调用数（failed 为工具返回了错误结果）", ("tool", "status")
+)
+TOOL_DURATION = REGISTRY.histogram(
+    "finance_tool_call_duration_seconds", "Agent 视角的工具调用耗时（含传输）", ("tool",)
+)
+
+
+# ============================================================
+# HTTP 中间件
+# ============================================================
+
+
+class MetricsMiddleware:
+    """记录每个 HTTP 请求的状态码和耗时
+
+    纯 ASGI 实现：在最后一个响应数据块发出时才结束计时，SSE 流的耗时也是完整的。
+    路径取路由模板（如 /api/chat/stream），未匹配的路由统一记为 other，避免标签数量失控。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        finished = False
+
+        def finish() -> None:
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "other"
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method=method, path=path, status=status)
+            HTTP_DURATION.observe(time.perf_counter() - started, method=method, path=path)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            finish()
+
+
+# ============================================================
+# LangChain 回调
+# ============================================================
+
+
+class MetricsCallback(BaseCallbackHandler):
+    """记录一个对话请求中的 LLM 调用和工具调用
+
+    每个请求创建一个实例（通过 config={"callbacks": [...]} 传给 Agent），
+    结束时调用 finish() 记录本次请求的 LLM 调用次数。
+    """
+
+    # 回调只做计数，直接在事件循环中执行，不转到线程池
+    run_inline = True
+
+    def __init__(self, model: str):
+        self.model = model
+        self.llm_calls = 0
+        self._started: dict[UUID, float] = {}
+        self._tools: dict[UUID, str] = {}
+
+    # ---------- LLM ----------
+
+    def on_chat_model_start(self, serialized: dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self.llm_calls += 1
+        self._observe_llm(run_id, "ok")
+        input_tokens, output_tokens = _token_usage(response)
+        if input_tokens:
+            LLM_TOKENS.inc(input_tokens, model=self.model, direction="input")
+        if output_tokens:
+            LLM_TOKENS.inc(output_tokens, model=self.model, direction="output")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self.llm_calls += 1
+        self._observe_llm(run_id, "error")
+
+    def _observe_llm(self, run_id: UUID, status: str) -> None:
+        LLM_CALLS.inc(model=self.model, status=status)
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            LLM_DURATION.observe(time.perf_counter() - started, model=self.model)
+
+    # ---------- 工具 ----------
+
+    def on_tool_start(self, serialized: dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+        self._tools[run_id] = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._observe_tool(run_id, "failed" if is_error_result(output) else "ok")
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._observe_tool(run_id, "error")
+
+    def _observe_tool(self, run_id: UUID, status: str) -> None:
+        name = self._tools.pop(run_id, "unknown")
+        TOOL_CALLS.inc(tool=name, status=status)
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            TOOL_DURATION.observe(time.perf_counter() - started, tool=name)
+
+    # ---------- 请求结束 ----------
+
+    def finish(self) -> None:
+        """请求结束时记录本次请求的 LLM 调用次数"""
+        if self.llm_calls:
+            LLM_CALLS_PER_REQUEST.observe(self.llm_calls)
+
+
+def admission_metrics(stats: dict[str, Any]) -> list[tuple]:
+    """准入控制（api.admission）的状态 -> 指标族"""
+    return [
+        ("finance_agent_running", "gauge", "正在运行的 Agent 数", [({}, stats["running"])]),
+        ("finance_agent_max_running", "gauge", "同时运行的 Agent 数上限", [({}, stats["max_running"])]),
+        ("finance_agent_queued", "gauge", "等待运行名额的对话请求数", [({}, stats["queued"])]),
+        ("finance_agent_admitted_total", "counter", "获得运行名额的对话请求数", [({}, stats["admitted"])]),
+        ("finance_agent_rejected_total", "counter", "队列已满被拒绝（429）的对话请求数", [({}, stats["rejected"])]),
+    ]
+
+
+def job_metrics(stats: dict[str, Any]) -> list[tuple]:
+    """后台任务（api.jobs）的状态 -> 指标族；按状态的任务数来自共享的任务库，多 worker 时各进程相同"""
+    return [
+        ("finance_jobs_running_local", "gauge", "本进程正在运行的后台任务数", [({}, stats["running_local"])]),
+        ("finance_job_concurrency", "gauge", "本进程同时运行的后台任务数上限", [({}, stats["concurrency"])]),
+        ("finance_jobs", "gauge", "任务库中各状态的后台任务数", [
+            ({"status": status}, stats[status])
+            for status in ("queued", "running", "succeeded", "failed", "cancelled")
+        ]),
+    ]
+
+
+def _token_usage(response: Any) -> tuple[int, int]:
+    """从 LLMResult 中取出 (输入 token, 输出 token)，模型没有返回用量时为 0"""
+    input_tokens = output_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+    if not (input_tokens or output_tokens):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = usage.get("prompt_tokens", 0) or 0
+        output_tokens = usage.get("completion_tokens", 0) or 0
+    return input_tokens, output_tokens
+
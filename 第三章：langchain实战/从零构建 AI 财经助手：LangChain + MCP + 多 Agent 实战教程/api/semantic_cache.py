@@ -0,0 +1,379 @@
+"""
+语义回答缓存
+精确匹配只能命中完全相同的问题，「苹果股价多少」和「AAPL 现在多少钱」问的是同一件事却是两个键。
+这里把问题转换为向量，在近期的回答中按余弦相似度查找，超过阈值才视为同一个问题。
+
+- 规范化：公司名替换为股票代码，「多少钱 / 价格 / 报价」等同义词统一，去掉「请问 / 现在」等不影响含义的词
+- 实体校验：问题中的股票代码和数字（天数、年份等）必须完全相同，只比较其余部分的相似度，
+  避免「苹果股价」命中「微软股价」、「过去 30 天」命中「过去 90 天」。
+  股票代码按 KNOWN_TICKERS 不区分大小写识别（tsla 与 TSLA 相同）；其余部分去掉已知词汇（KNOWN_WORDS）后
+  剩下的字词视为未识别的名称（如不在别名表中的「宁德时代」「比亚迪」），也必须完全相同。
+  对财经回答来说，答成另一家公司比不命中更糟，宁可少命中
+- 向量：安装了 semantic 可选依赖（sentence-transformers）时默认使用本地的小型中文向量模型
+  （DEFAULT_SEMANTIC_MODEL，CPU 推理），SEMANTIC_CACHE_MODEL 可换成其他模型名或本地路径；
+  未安装或模型无法加载时退回内置的字符 n-gram 哈希向量（纯 numpy，微秒级）——那只是字面相似度，
+  不是语义向量，只能区分规范化后文本中「股价」「新闻」「走势」等意图
+- 检索：所有向量放在一个矩阵中，一次矩阵乘法得到全部相似度，过期和实体不符的行直接屏蔽
+
+过期规则与精确缓存相同：索引中的每一行都指向回答缓存中的一个条目，条目过期或被淘汰后该行失效。
+"""
+
+import importlib.util
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from typing import Protocol
+
+import numpy as np
+
+# 关闭语义缓存：SEMANTIC_CACHE=0（仍保留精确匹配）
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "1") not in ("0", "false", "off")
+# 余弦相似度阈值：越高越保守
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+# 安装了 sentence-transformers（pip install "finance-agent[semantic]"）时默认使用的本地模型
+DEFAULT_SEMANTIC_MODEL = "BAAI/bge-small-zh-v1.5"
+# 本地 sentence-transformers 模型名或路径；留空使用默认模型，hash 表示只用内置的哈希向量
+SEMANTIC_CACHE_MODEL = os.getenv("SEMANTIC_CACHE_MODEL", "")
+
+# 常见公司名 -> 股票代码（规范化时替换，实体校验时按代码比较）
+COMPANY_ALIASES = {
+    "AAPL": ("苹果", "apple"),
+    "MSFT": ("微软", "microsoft"),
+    "GOOGL": ("谷歌", "google", "alphabet"),
+    "AMZN": ("亚马逊", "amazon"),
+    "TSLA": ("特斯拉", "tesla"),
+    "NVDA": ("英伟达", "nvidia"),
+    "META": ("脸书", "facebook"),
+    "NFLX": ("奈飞", "网飞", "netflix"),
+    "TSM": ("台积电", "tsmc"),
+    "INTC": ("英特尔", "intel"),
+    "BABA": ("阿里巴巴", "阿里"),
+    "JD": ("京东",),
+    "PDD": ("拼多多",),
+    "BIDU": ("百度",),
+    "0700.HK": ("腾讯",),
+    "600519.SS": ("贵州茅台", "茅台"),
+}
+
+# 可以不区分大小写识别的股票代码（tsla、Nvda 与 TSLA、NVDA 相同）。
+# 不在表中的大写单词仍按股票代码处理，小写的未知英文单词按未识别的名称处理
+KNOWN_TICKERS = (
+    *(ticker for ticker in COMPANY_ALIASES if ticker.isalpha()),
+    "AMD", "AVGO", "QCOM", "ORCL", "CRM", "ADBE", "IBM", "CSCO", "UBER", "PLTR", "SNOW", "SHOP",
+    "PYPL", "DIS", "NKE", "KO", "PEP", "MCD", "SBUX", "WMT", "COST", "JPM", "BAC", "GS", "MS",
+    "BRK-B", "BRK.B", "XOM", "CVX", "PFE", "JNJ", "LLY", "NIO", "XPEV", "LI", "BILI", "NTES",
+    "SPY", "QQQ", "DIA", "IWM",
+)
+
+# 同义词 -> 统一的说法（长的先替换）
+SYNONYMS = {
+    "股价": ("股票价格", "最新价格", "最新价", "多少钱", "价格", "报价", "现价", "价位", "股价"),
+    "新闻": ("最新消息", "新闻", "消息", "资讯", "动态"),
+    "财报": ("财务报表", "财务数据", "财报"),
+    "评级": ("分析师评级", "分析师推荐", "投资评级", "评级", "推荐"),
+    "走势": ("历史价格", "历史走势", "价格走势", "k线", "走势"),
+    "对比": ("比较", "对比", "比一比", "vs"),
+}
+
+# 不影响含义的词
+STOP_WORDS = (
+    "请问", "帮我", "给我", "帮忙", "查询", "查一下", "查查", "看一下", "看看", "一下", "告诉我",
+    "现在", "目前", "当前", "今天", "最近的", "多少", "是", "的", "吗", "呢", "啊", "了",
+    "公司", "股票",
+)
+
+# 已知的一般词汇：规范化后的文本去掉这些词（和同义词的统一说法）后，剩下的字词都是未识别的名称。
+# 单字词只收虚词和时间单位，避免把公司名中的字当作已知词去掉
+KNOWN_WORDS = (
+    # 时间
+    "最近", "近期", "过去", "未来", "今年", "去年", "明年", "本周", "上周", "本月", "上个月", "季度", "年度",
+    "个月", "天", "周", "月", "年", "日",
+    # 意图和指标
+    "分析", "怎么样", "如何", "怎样", "怎么", "什么", "哪个", "哪些", "为什么", "情况", "表现", "趋势", "行情",
+    "数据", "信息", "详情", "概况", "基本面", "估值", "市值", "市盈率", "市净率", "涨跌幅", "涨幅", "跌幅", "涨跌",
+    "波动", "成交量", "技术指标", "技术面", "指标", "均线", "情绪", "市场", "风险", "前景", "预测", "预期",
+    "建议", "观点", "看法", "营收", "收入", "利润", "净利润", "现金流", "资产负债", "利润表", "分红", "股息",
+    "分析师",
+    # 投资
+    "值得", "买入", "卖出", "持有", "投资", "入手", "加仓", "减仓", "抄底", "可以", "应该", "还是", "适合",
+    # 虚词
+    "和", "与", "及", "以及", "还有", "跟", "或", "或者", "还", "更", "能", "会", "要", "吧", "么", "哪",
+    # 英文（已转为小写）
+    "stock", "stocks", "price", "quote", "news", "analysis", "compare", "vs", "and", "the", "of", "today",
+)
+
+# 中文与英文之间没有 \b 边界，用前后不是字母数字来界定
+_KNOWN_TICKER = re.compile(
+    r"(?<![A-Za-z0-9])(?:"
+    + "|".join(re.escape(ticker) for ticker in sorted(KNOWN_TICKERS, key=len, reverse=True))
+    + r")(?![A-Za-z0-9])",
+    re.IGNORECASE,
+)
+_TICKER = re.compile(
+    r"(?<![A-Za-z0-9])(?:\d{4,6}\.(?:SS|SZ|HK)|[A-Z]{1,5}(?:[.-][A-Z]{1,2})?)(?![A-Za-z0-9])", re.IGNORECASE
+)
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_NON_WORD = re.compile(r"[\W_]+")
+_LATIN_WORD = re.compile(r"[a-z]+")
+
+_ALIAS_PATTERN = re.compile(
+    "|".join(re.escape(alias) for alias in sorted(
+        (alias for aliases in COMPANY_ALIASES.values() for alias in aliases), key=len, reverse=True
+    )),
+    re.IGNORECASE,
+)
+_ALIAS_TO_TICKER = {alias.casefold(): ticker for ticker, aliases in COMPANY_ALIASES.items() for alias in aliases}
+_SYNONYM_PATTERN = re.compile("|".join(re.escape(word) for word in sorted(
+    (word for words in SYNONYMS.values() for word in words), key=len, reverse=True
+)))
+_SYNONYM_TO_CANONICAL = {word: canonical for canonical, words in SYNONYMS.items() for word in words}
+_STOP_PATTERN = re.compile("|".join(re.escape(word) for word in sorted(STOP_WORDS, key=len, reverse=True)))
+_KNOWN_PATTERN = re.compile("|".join(re.escape(word) for word in sorted(
+    {*KNOWN_WORDS, *SYNONYMS}, key=len, reverse=True
+)))
+
+
+def analyze(question: str) -> tuple[frozenset[str], str]:
+    """拆分问题：返回 (实体集合, 去掉实体后规范化的文本)
+
+    实体包括股票代码（公司名按 COMPANY_ALIASES 换成代码）和数字；
+    文本已统一同义词、去掉停用词和标点，用于计算相似度。
+    """
+    text = unicodedata.normalize("NFKC", question)
+    entities: set[str] = set()
+
+    def take_alias(match: re.Match) -> str:
+        entities.add(_ALIAS_TO_TICKER[match.group().casefold()])
+        return " "
+
+    def take_ticker(match: re.Match) -> str:
+        entities.add(match.group().upper())
+        return " "
+
+    def take_upper(match: re.Match) -> str:
+        # 不在代码表中的大写单词也按股票代码处理（ETF、PE 等缩写也一并要求相同，宁可少命中）；
+        # 交易所后缀不区分大小写（0700.hk 与 0700.HK 相同）
+        token = match.group()
+        if token.isupper() or token[0].isdigit():
+            return take_ticker(match)
+        return token
+
+    text = _ALIAS_PATTERN.sub(take_alias, text)
+    text = _KNOWN_TICKER.sub(take_ticker, text)
+    text = _TICKER.sub(take_upper, text)
+    entities.update(_NUMBER.findall(text))
+    text = _NUMBER.sub(" ", text).casefold()
+
+    text = _SYNONYM_PATTERN.sub(lambda match: f" {_SYNONYM_TO_CANONICAL[match.group()]} ", text)
+    text = _STOP_PATTERN.sub(" ", text)
+    text = " ".join(_NON_WORD.sub(" ", text).split())
+    return frozenset(entities), text
+
+
+def unknown_words(text: str) -> frozenset[str]:
+    """analyze 返回的文本中未识别的字词（去掉已知词汇后剩下的中文或英文片段）
+
+    这些片段多半是别名表以外的公司名或产品名，语义匹配时要求完全相同：
+    「宁德时代 走势」与「比亚迪 走势」向量相似度很高，但问的是两家公司。
+    """
+    return frozenset(_KNOWN_PATTERN.sub(" ", text).split())
+
+
+# ============================================================
+# 向量
+# ============================================================
+
+
+class Embedder(Protocol):
+    dim: int
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """返回形状为 (len(texts), dim) 的单位向量（float32）"""
+        ...
+
+
+class HashingEmbedder:
+    """字符 n-gram 哈希向量
+
+    中文按单字和相邻两字、英文按单词取特征，用 crc32 哈希到固定维度（各进程结果一致），再归一化。
+    规范化后的问题很短，这种向量足以区分「股价」和「新闻」「走势」等不同意图。
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                vectors[row, zlib.crc32(feature.encode()) % self.dim] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    @staticmethod
+    def _features(text: str) -> list[str]:
+        if not text:
+            # 去掉实体后什么都不剩（如只问了「AAPL」），这类问题彼此相同
+            return ["<empty>"]
+        features = _LATIN_WORD.findall(text)
+        for part in _LATIN_WORD.sub(" ", text).split():
+            features.extend(part)
+            features.extend(part[i:i + 2] for i in range(len(part) - 1))
+        return features
+
+
+class SentenceTransformerEmbedder:
+    """本地 sentence-transformers 模型（CPU 推理，首次使用时加载）"""
+
+    def __init__(self, model: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        # 空文本同样用固定的占位词，与哈希向量的处理一致
+        texts = [text or "<empty>" for text in texts]
+        vectors = self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        return vectors.astype(np.float32)
+
+
+def create_embedder(model: str = SEMANTIC_CACHE_MODEL) -> Embedder:
+    """按配置创建向量模型
+
+    明确指定的模型必须能加载；未指定时使用 DEFAULT_SEMANTIC_MODEL，
+    没有安装 sentence-transformers 或模型无法加载（如离线且本地没有缓存）时退回哈希向量。
+    """
+    if model == "hash":
+        return HashingEmbedder()
+    if model:
+        return SentenceTransformerEmbedder(model)
+    if importlib.util.find_spec("sentence_transformers") is None:
+        print('⚠️ 未安装 sentence-transformers（pip install "finance-agent[semantic]"），语义缓存退回字面相似度')
+        return HashingEmbedder()
+    try:
+        return SentenceTransformerEmbedder(DEFAULT_SEMANTIC_MODEL)
+    except Exception as e:
+        print(f"⚠️ 加载向量模型 {DEFAULT_SEMANTIC_MODEL} 失败，语义缓存退回字面相似度: {e}")
+        return HashingEmbedder()
+
+
+# ============================================================
+# 向量索引
+# ============================================================
+
+
+class SemanticIndex:
+    """近期问题的向量索引，容量满后覆盖最早写入的行
+
+    Args:
+        capacity: 最多保留的问题数（与回答缓存的容量一致）
+        threshold: 余弦相似度阈值
+        embedder: 向量模型，默认按 SEMANTIC_CACHE_MODEL 创建
+    """
+
+    def __init__(self, capacity: int, threshold: float = SEMANTIC_CACHE_THRESHOLD, embedder: Embedder | None = None):
+        self.capacity = capacity
+        self.threshold = threshold
+        self._embedder = embedder
+        # 向量模型只加载一次；加载期间（可能要几十秒）检索和索引直接跳过，不等待
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._vectors: np.ndarray | None = None
+        # 每行的实体签名（分区 + 实体集合的哈希）和过期时间，检索时向量化屏蔽
+        self._signatures = np.zeros(capacity, dtype=np.int64)
+        self._expires = np.zeros(capacity, dtype=np.float64)
+        self._keys: list[str | None] = [None] * capacity
+        self._rows: dict[str, int] = {}
+        self._next = 0
+
+    @property
+    def embedder(self) -> Embedder:
+        """向量模型，尚未加载时在当前线程加载（其他线程正在加载时等待它完成）"""
+        if self._embedder is None:
+            with self._load_lock:
+                if self._embedder is None:
+                    self._embedder = create_embedder()
+        return self._embedder
+
+    def warm_up(self) -> None:
+        """加载向量模型（sentence-transformers 模型加载需要几秒，启动时在后台完成）"""
+        self.embedder.embed([""])
+
+    def _ready_embedder(self) -> Embedder | None:
+        """已加载的向量模型；其他线程正在加载时返回 None，调用方按未命中处理"""
+        if self._embedder is not None:
+            return self._embedder
+        if not self._load_lock.acquire(blocking=False):
+            return None
+        try:
+            if self._embedder is None:
+                self._embedder = create_embedder()
+            return self._embedder
+        finally:
+            self._load_lock.release()
+
+    def add(self, key: str, partition: str, question: str, expires_at: float) -> None:
+        """索引一个问题，key 为回答缓存中的键，partition（如模型名）不同的问题互不匹配"""
+        embedder = self._ready_embedder()
+        if embedder is None:
+            return
+        entities, text = analyze(question)
+        vector = embedder.embed([text])[0]
+        signature = _signature(partition, entities, unknown_words(text))
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+            row = self._rows.get(key)
+            if row is None:
+                row = self._next
+                self._next = (self._next + 1) % self.capacity
+                if self._keys[row] is not None:
+                    del self._rows[self._keys[row]]
+                self._keys[row] = key
+                self._rows[key] = row
+            self._vectors[row] = vector
+            self._signatures[row] = signature
+            self._expires[row] = expires_at
+
+    def search(self, partition: str, question: str, now: float) -> tuple[str, float] | None:
+        """查找最相似且未过期、实体和未识别的字词都相同的问题，返回 (回答缓存中的键, 相似度)，低于阈值时返回 None"""
+        if not self._rows:
+            return None
+        embedder = self._ready_embedder()
+        if embedder is None:
+            return None
+        entities, text = analyze(question)
+        vector = embedder.embed([text])[0]
+        signature = _signature(partition, entities, unknown_words(text))
+        with self._lock:
+            if self._vectors is None:
+                return None
+            scores = self._vectors @ vector
+            scores[(self._signatures != signature) | (self._expires <= now)] = -1.0
+            row = int(np.argmax(scores))
+            score = float(scores[row])
+            key = self._keys[row]
+        if key is None or score < self.threshold:
+            return None
+        return key, score
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is not None:
+                self._keys[row] = None
+                self._expires[row] = 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+            self._keys = [None] * self.capacity
+            self._expires[:] = 0.0
+
+
+def _signature(partition: str, entities: frozenset[str], unknown: frozenset[str]) -> int:
+    text = "\n".join([partition, *sorted(entities), "", *sorted(unknown)])
+    return zlib.crc32(text.encode())
@@ -0,0 +1,183 @@
+"""
+多进程生产模式
+一个 Web 进程只能用上一个 CPU 核，但直接给 uvicorn 加 --workers 有两个问题：
+每个 worker 各自启动一个 MCP Server 子进程（stdio 模式），各自一份缓存；
+worker 是新启动的解释器，LangChain 等依赖要在每个 worker 中重新导入。
+
+这里的启动方式：
+1. 启动一个共享 MCP Server（Unix Socket），所有 worker 连接它：行情缓存、本地行情库、工具线程池只有一份
+2. 回答缓存和工具结果缓存写入本机 SQLite 共享缓存（core.shared_store），一个 worker 算过的问题其他 worker 直接命中
+3. 主进程导入应用和依赖、监听端口后再 fork 出 worker，worker 共享监听 socket，不必重新导入
+4. 主进程只负责看管：worker 异常退出时重新 fork，收到 SIGTERM / SIGINT 时通知所有 worker 正常退出
+
+用法：
+    python -m api.serve --workers 4 --port 8000
+
+--workers 1（默认，或 WEB_CONCURRENCY 未设置）时与直接运行 uvicorn 相同，不 fork、不启动共享 MCP Server。
+MCP_TRANSPORT 已设置为 http / unix（自行部署的共享 MCP Server）或 inprocess 时沿用该设置。
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import traceback
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+# worker 数，与 uvicorn / gunicorn 的约定相同
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# 多 worker 模式默认的共享缓存文件和共享 MCP Server 的 socket
+DEFAULT_SHARED_CACHE = PROJECT_ROOT / ".data" / "shared_cache.sqlite"
+DEFAULT_MCP_SOCKET = "/tmp/finance-mcp-workers.sock"
+
+# worker 启动后这么短时间内退出视为启动失败，重新 fork 前等待，避免反复崩溃空转
+CRASH_BACKOFF = 1.0
+
+
+def start_mcp_server(socket_path: str, timeout: float = 60) -> subprocess.Popen:
+    """启动共享 MCP Server（Unix Socket），等到 /health 可用后返回"""
+    import httpx
+
+    process = subprocess.Popen(
+        [sys.executable, str(PROJECT_ROOT / "agents" / "mcp_server.py"), "--transport", "unix", "--socket", socket_path],
+        cwd=PROJECT_ROOT,
+    )
+    started = time.monotonic()
+    with httpx.Client(transport=httpx.HTTPTransport(uds=socket_path), timeout=1) as client:
+        while time.monotonic() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("共享 MCP Server 启动失败")
+            try:
+                if client.get("http://localhost/health").status_code == 200:
+                    return process
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError(f"共享 MCP Server {timeout:g} 秒内未就绪")
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """在主进程中监听端口，fork 出的 worker 共享同一个 socket"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, log_level: str) -> None:
+    """在 fork 出的子进程中运行 uvicorn，结束后直接退出子进程"""
+    import uvicorn
+
+    # 恢复默认的信号处理，由 uvicorn 重新接管
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    try:
+        uvicorn.Server(uvicorn.Config(app, log_level=log_level)).run(sockets=[sock])
+    except BaseException:
+        traceback.print_exc()
+        os._exit(1)
+    os._exit(0)
+
+
+def serve(host: str, port: int, workers: int, mcp_socket: str, log_level: str) -> None:
+    mcp_process = None
+    if workers > 1:
+        os.environ.setdefault("SHARED_CACHE_PATH", str(DEFAULT_SHARED_CACHE))
+        if os.getenv("MCP_TRANSPORT", "stdio") == "stdio":
+            print(f"🚀 启动共享 MCP Server（unix:{mcp_socket}）...")
+            mcp_process = start_mcp_server(mcp_socket)
+            os.environ["MCP_TRANSPORT"] = "unix"
+            os.environ["MCP_SOCKET"] = mcp_socket
+
+    # 环境变量设置好之后再导入：缓存、传输方式等配置在导入时读取
+    import uvicorn
+
+    from api.server_with_mcp import app
+
+    if workers <= 1:
+        try:
+            uvicorn.run(app, host=host, port=port, log_level=log_level)
+        finally:
+            if mcp_process is not None:
+                mcp_process.terminate()
+        return
+
+    sock = bind_socket(host, port)
+    children: dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        # 先输出缓冲区，避免子进程重复输出主进程尚未写出的内容
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            run_worker(app, sock, log_level)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"🚀 启动 {workers} 个 worker，监听 http://{host}:{port}（共享缓存: {os.environ['SHARED_CACHE_PATH']}）")
+    for _ in range(workers):
+        spawn()
+
+    try:
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            if mcp_process is not None and pid == mcp_process.pid:
+                # os.wait() 也会回收 MCP Server 子进程，记下退出码供 Popen 使用
+                mcp_process.returncode = os.waitstatus_to_exitcode(status)
+                print(f"⚠️ 共享 MCP Server 已退出（状态 {mcp_process.returncode}），工具调用将失败")
+                continue
+            started = children.pop(pid, None)
+            if started is None or stopping:
+                continue
+            print(f"⚠️ worker {pid} 退出（状态 {os.waitstatus_to_exitcode(status)}），重新启动")
+            if time.monotonic() - started < CRASH_BACKOFF * 5:
+                time.sleep(CRASH_BACKOFF)
+            if not stopping:
+                spawn()
+    finally:
+        sock.close()
+        if mcp_process is not None:
+            mcp_process.terminate()
+            mcp_process.wait(timeout=10)
+        print("✅ 所有 worker 已退出")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="多进程运行 Web 服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY, help="worker 进程数（默认 WEB_CONCURRENCY 或 1）")
+    parser.add_argument("--mcp-socket", default=DEFAULT_MCP_SOCKET, help="共享 MCP Server 的 Unix Socket 路径")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.mcp_socket, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,19 +5,18 @@ FastAPI 服务器 - 使用 MCP Client 连接本地 MCP Server
 
 import json
 import asyncio
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Callable, Literal
 from pathlib import Path
 import os
+import time
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 from pydantic import BaseModel, Field
 from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
 
-# MCP Client 相关
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain.agents import create_agent
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
@@ -25,17 +24,40 @@ from langchain_core.messages import HumanMessage
 # 导入配置
 import sys
 sys.path.append(str(Path(__file__).parent.parent))
-from finance_agent import ZHIPU_API_KEY, ZHIPU_BASE_URL, MODEL_NAME, SYSTEM_PROMPT
+from config import ZHIPU_API_KEY, ZHIPU_BASE_URL, MODEL_NAME, SYSTEM_PROMPT
+from api.admission import AdmissionRejected, admission
+from api.answer_cache import AnswerRecorder, answer_cache
+from api.coalesce import coalesce_messages
+from api.jobs import TERMINAL, job_manager
+from api.metrics import (
+    AGENT_QUEUE_WAIT, ANSWER_CACHE, CHAT_REQUESTS, CHAT_TTFT,
+    MetricsCallback, MetricsMiddleware, admission_metrics, job_metrics,
+)
+from api.static_assets import StaticAssets
+from api.tool_transport import MCP_TRANSPORT, ToolLoader, progress_sink
+from core import deadline
+from core.metrics import CONTENT_TYPE, REGISTRY, server_stats_metrics
 
 
 # ============================================================
 # 全局变量
 # ============================================================
 
-mcp_client = None
+tool_loader = None  # 工具连接（后台建立，见 api/tool_transport.ToolLoader）
+llm = None
 agent = None
 tools = []
 
+# 单次对话的截止时间（秒）：超时或浏览器断开时取消 Agent 及仍在执行的工具调用
+CHAT_TIMEOUT = float(os.getenv("CHAT_TIMEOUT", "120"))
+
+# MCP Server 额外提供的批量工具：提示 Agent 涉及多只股票时一次调用，减少 Agent 步数
+BATCH_TOOLS_PROMPT = """
+**批量工具：**
+- 涉及两只及以上股票时，用 get_stock_info_batch、get_stock_history_batch、get_stock_news_batch、
+  get_recommendations_batch 一次获取全部股票的数据，不要对每只股票分别调用单只股票的工具
+"""
+
 
 # ============================================================
 # FastAPI 应用初始化
@@ -56,6 +78,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求数与耗时指标（见 /metrics）
+app.add_middleware(MetricsMiddleware)
+
 
 # ============================================================
 # MCP Client 初始化
@@ -66,30 +91,19 @@ async def startup_event():
     """
     应用启动时初始化 MCP Client
     """
-    global mcp_client, agent, tools
-
-    print("🚀 启动 MCP Client...")
-
-    # MCP Server 脚本路径
-    mcp_server_path = str(Path(__file__).parent.parent / "agents" / "mcp_server.py")
+    global tool_loader, llm, agent, tools
 
-    # 获取虚拟环境的 Python 路径
-    venv_python = str(Path(__file__).parent.parent / ".venv" / "bin" / "python")
+    print(f"🚀 启动 MCP Client（传输方式: {MCP_TRANSPORT}）...")
 
-    # 创建 MCP 客户端（连接本地 MCP Server）
-    mcp_client = MultiServerMCPClient({
-        "finance": {
-            "transport": "stdio",
-            "command": venv_python,
-            "args": [mcp_server_path],
-        },
-    })
+    # 工具连接在后台建立并在整个服务生命周期内保持，关闭时统一释放
+    tool_loader = ToolLoader(MCP_TRANSPORT)
 
     try:
-        # 获取 MCP 工具
+        # 获取 MCP 工具（stdio: 连接本地 MCP Server 子进程；inprocess: 进程内直接加载）
+        # 有上次缓存的工具定义时立即返回，连接就绪前的工具调用会等待连接
         print("📡 连接 MCP Server...")
-        tools = await mcp_client.get_tools()
-        print(f"✅ 成功获取 {len(tools)} 个工具：")
+        tools = await tool_loader.start()
+        print(f"✅ 成功获取 {len(tools)} 个工具{'' if tool_loader.ready else '（缓存的定义，连接在后台建立）'}：")
         for tool in tools:
             print(f"   - {tool.name}")
 
@@ -99,28 +113,58 @@ async def startup_event():
             openai_api_key=ZHIPU_API_KEY,
             openai_api_base=ZHIPU_BASE_URL,
             temperature=0.3,
+            # 流式输出时也返回 token 用量，供 /metrics 统计
+            stream_usage=True,
         )
 
         # 创建 Agent（使用 MCP 提供的工具）
-        agent = create_agent(llm, tools=tools, system_prompt=SYSTEM_PROMPT)
+        system_prompt = SYSTEM_PROMPT
+        if any(tool.name.endswith("_batch") for tool in tools):
+            system_prompt += BATCH_TOOLS_PROMPT
+        agent = create_agent(llm, tools=tools, system_prompt=system_prompt)
         print("✅ Agent 创建成功（使用 MCP 工具）")
 
     except Exception as e:
         print(f"❌ MCP Client 初始化失败: {e}")
         raise
 
+    if not tool_loader.ready:
+        asyncio.create_task(report_tools_ready(tool_loader))
+
+    # 后台任务（见 api/jobs.py）：chat 与 /api/chat 相同，research 运行多 Agent 深度研究
+    job_manager.register("chat", run_chat_job)
+    job_manager.register("research", run_research_job)
+    await job_manager.start()
+
+    # 压缩静态文件（brotli 最高级别较慢），完成前的请求在线程池中等待加载
+    asyncio.create_task(static_assets.refresh())
+    if answer_cache.semantic is not None:
+        asyncio.create_task(asyncio.to_thread(answer_cache.semantic.warm_up))
+
+
+async def report_tools_ready(loader: ToolLoader) -> None:
+    """后台连接完成后输出结果"""
+    try:
+        await loader.wait_ready()
+    except Exception as e:
+        print(f"❌ MCP Server 连接失败，工具调用将返回错误: {e}")
+        return
+    print("✅ MCP Server 连接就绪")
+    if loader.schemas_changed:
+        print("⚠️ MCP Server 的工具定义与缓存不同，已更新缓存，重启服务后生效")
+
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """
     应用关闭时清理 MCP Client
     """
-    global mcp_client
-    if mcp_client:
+    # 先停止后台任务（运行中的任务退回队列），再断开它们用到的工具连接
+    await job_manager.stop()
+    if tool_loader:
         print("🔄 关闭 MCP Client...")
         try:
-            # MCP Client 会自动清理，不需要手动调用
-            pass
+            await tool_loader.close()
         except Exception as e:
             print(f"⚠️ 清理时出错: {e}")
         print("✅ MCP Client 已关闭")
@@ -145,6 +189,7 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     """对话响应模型"""
     response: str = Field(..., description="Agent 的回复")
+    cached: bool = Field(False, description="是否为缓存的回答（数据仍在新鲜度周期内的相同问题）")
 
     class Config:
         json_schema_extra = {
@@ -154,6 +199,37 @@ class ChatResponse(BaseModel):
         }
 
 
+class JobRequest(BaseModel):
+    """后台任务请求模型"""
+    query: str = Field(..., description="用户输入的问题")
+    kind: Literal["research", "chat"] = Field(
+        "research", description="research: 多 Agent 深度研究；chat: 与 /api/chat 相同的单 Agent 对话"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "query": "综合分析英伟达的最新财报和市场情绪",
+                "kind": "research",
+            }
+        }
+
+
+class JobInfo(BaseModel):
+    """后台任务状态模型"""
+    id: str = Field(..., description="任务号")
+    kind: str = Field(..., description="任务类型")
+    query: str = Field(..., description="用户输入的问题")
+    status: str = Field(..., description="queued / running / succeeded / failed / cancelled")
+    attempts: int = Field(..., description="已运行的次数")
+    created_at: float = Field(..., description="提交时间（Unix 时间戳）")
+    started_at: float | None = Field(None, description="最近一次开始运行的时间")
+    finished_at: float | None = Field(None, description="结束时间")
+    error: str | None = Field(None, description="失败原因（重试中的任务为上一次的失败原因）")
+    result: Any = Field(None, description="任务结果（成功后才有）")
+    events_url: str = Field(..., description="任务事件（SSE）的地址")
+
+
 class ToolInfo(BaseModel):
     """工具信息模型"""
     name: str = Field(..., description="工具名称")
@@ -174,11 +250,33 @@ async def health_check():
         "status": "healthy",
         "service": "finance-agent-api-mcp",
         "version": "2.0.0-mcp",
-        "mcp_enabled": mcp_client is not None,
+        "mcp_enabled": tool_loader is not None,
+        "mcp_ready": tool_loader is not None and tool_loader.ready,
+        "mcp_transport": MCP_TRANSPORT,
         "tools_count": len(tools),
+        "worker_pid": os.getpid(),
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse, tags=["系统"])
+async def metrics():
+    """
+    Prometheus 格式的指标：HTTP 请求、对话、LLM 与工具调用，以及 MCP Server 的运行统计
+    """
+    stats = None
+    if tool_loader is not None:
+        try:
+            stats = await asyncio.wait_for(tool_loader.server_stats(), timeout=2)
+        except Exception:
+            stats = None
+    extra = admission_metrics(admission.stats())
+    extra += job_metrics(await job_manager.stats())
+    extra.append(("finance_mcp_up", "gauge", "是否成功读取 MCP Server 的运行统计", [({}, 1 if stats else 0)]))
+    if stats:
+        extra += server_stats_metrics(stats)
+    return PlainTextResponse(REGISTRY.render(extra), media_type=CONTENT_TYPE)
+
+
 @app.get("/api/tools", response_model=list[ToolInfo], tags=["工具"])
 async def list_tools():
     """
@@ -194,92 +292,409 @@ async def list_tools():
     return tool_list
 
 
+def client_id(http_request: Request) -> str:
+    """排队时区分客户端：优先使用 X-Client-Id 请求头，否则按来源 IP"""
+    header = http_request.headers.get("x-client-id")
+    if header:
+        return header[:64]
+    return http_request.client.host if http_request.client else "unknown"
+
+
+def reject(e: AdmissionRejected, endpoint: str) -> HTTPException:
+    CHAT_REQUESTS.inc(endpoint=endpoint, outcome="rejected")
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
 @app.post("/api/chat", response_model=ChatResponse, tags=["对话"])
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """
     非流式对话端点
+
+    同时运行的 Agent 数达到上限时排队，队列已满返回 429（见 api/admission.py）。
     """
     if not agent:
         raise HTTPException(status_code=500, detail="Agent 未初始化")
 
+    cached = await asyncio.to_thread(answer_cache.get, MODEL_NAME, request.message)
+    ANSWER_CACHE.inc(endpoint="chat", result=cached["match"] if cached else "miss")
+    if cached:
+        CHAT_REQUESTS.inc(endpoint="chat", outcome="cached")
+        return ChatResponse(response=cached["answer"], cached=True)
+
     try:
-        result = await agent.ainvoke({
-            "messages": [HumanMessage(content=request.message)]
-        })
+        ticket = admission.acquire(client_id(http_request))
+    except AdmissionRejected as e:
+        raise reject(e, "chat")
+
+    token = deadline.CancelToken(CHAT_TIMEOUT)
+    callback = MetricsCallback(MODEL_NAME)
+    outcome = "error"
+    try:
+        with deadline.use(token):
+            async with asyncio.timeout(CHAT_TIMEOUT):
+                if waited := await admission.wait(ticket):
+                    AGENT_QUEUE_WAIT.observe(waited)
+                result = await agent.ainvoke(
+                    {"messages": [HumanMessage(content=request.message)]},
+                    config={"callbacks": [callback]},
+                )
         response = result["messages"][-1].content
+        outcome = "ok"
+        recorder = AnswerRecorder.from_messages(result["messages"])
+        await asyncio.to_thread(answer_cache.put, MODEL_NAME, request.message, recorder)
         return ChatResponse(response=response)
+    except TimeoutError:
+        token.cancel("请求超时")
+        outcome = "timeout"
+        raise HTTPException(status_code=504, detail=f"处理超时（{CHAT_TIMEOUT:g}秒）")
+    except asyncio.CancelledError:
+        outcome = "disconnected"
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"处理请求时出错: {str(e)}")
+    finally:
+        admission.release(ticket)
+        callback.finish()
+        CHAT_REQUESTS.inc(endpoint="chat", outcome=outcome)
 
 
 @app.get("/api/chat/stream", tags=["对话"])
-async def stream_chat_get(message: str):
+async def stream_chat_get(message: str, http_request: Request):
     """
     SSE 流式对话端点（GET 方式，用于 EventSource）
+
+    事件：queue（排队位置，0 表示开始处理）、tool_call（工具调用）、
+    tool_progress（工具的部分结果，逐行推送）、message（回答文本，相邻片段合并推送）、done、error
+
+    队列已满时直接返回 429。
+    命中回答缓存时按原顺序重放缓存的 tool_call 和 message 事件
+    （响应头 X-Answer-Cache: hit 为精确匹配，semantic 为语义匹配）。
     """
     if not agent:
         raise HTTPException(status_code=500, detail="Agent 未初始化")
 
-    async def event_generator() -> AsyncGenerator[dict, None]:
+    started = time.perf_counter()
+    cached = await asyncio.to_thread(answer_cache.get, MODEL_NAME, message)
+    ANSWER_CACHE.inc(endpoint="stream", result=cached["match"] if cached else "miss")
+    if cached:
+        headers = {"X-Answer-Cache": "hit" if cached["match"] == "exact" else "semantic"}
+        return EventSourceResponse(replay_cached(cached, started), headers=headers)
+
+    try:
+        ticket = admission.acquire(client_id(http_request))
+    except AdmissionRejected as e:
+        raise reject(e, "stream")
+
+    callback = MetricsCallback(MODEL_NAME)
+    recorder = AnswerRecorder()
+
+    async def run_agent(queue: asyncio.Queue, token: deadline.CancelToken) -> None:
+        """在独立任务中运行 Agent，事件和工具的部分结果都放入 queue，结束时放入 None
+
+        token 随上下文传到工具调用（进程内或经 MCP），超时或被取消时工具一并停止。
+        """
+        # 工具执行过程中推送的部分结果（见 api.tool_transport.progress_sink）
+        progress_sink.set(lambda progress: queue.put_nowait({
+            "event": "tool_progress",
+            "data": json.dumps(progress, ensure_ascii=False),
+        }))
+        outcome = "error"
         try:
-            # 使用 agent.astream 异步流式输出（MCP 工具需要异步）
-            events = agent.astream(
-                {"messages": [HumanMessage(content=message)]},
-                stream_mode="messages",
-            )
-
-            async for msg, metadata in events:
-                # 处理工具调用事件
-                if hasattr(msg, "tool_calls") and msg.tool_calls:
-                    for tc in msg.tool_calls:
-                        yield {
-                            "event": "tool_call",
-                            "data": json.dumps({
-                                "name": tc["name"],
-                                "args": tc["args"],
-                            }, ensure_ascii=False)
-                        }
-
-                # 处理 agent 输出的文本（节点名为 "model"）
-                elif hasattr(msg, "content") and msg.content and metadata.get("langgraph_node") == "model":
-                    yield {
-                        "event": "message",
-                        "data": msg.content
-                    }
+            with deadline.use(token):
+                async with asyncio.timeout(token.remaining()):
+                    waited = await admission.wait(ticket, lambda position: queue.put_nowait({
+                        "event": "queue",
+                        "data": json.dumps({"position": position}),
+                    }))
+                    if waited:
+                        AGENT_QUEUE_WAIT.observe(waited)
+                    await stream_agent(
+                        message, queue, callback, recorder,
+                        on_first_token=lambda: CHAT_TTFT.observe(time.perf_counter() - started),
+                    )
 
             # 发送完成标志
-            yield {
+            queue.put_nowait({
                 "event": "done",
                 "data": "[DONE]"
-            }
-
+            })
+            outcome = "ok"
+            await asyncio.to_thread(answer_cache.put, MODEL_NAME, message, recorder)
+
+        except TimeoutError:
+            token.cancel("请求超时")
+            outcome = "timeout"
+            queue.put_nowait({
+                "event": "error",
+                "data": json.dumps({"error": f"处理超时（{CHAT_TIMEOUT:g}秒），请稍后重试"}, ensure_ascii=False)
+            })
+        except asyncio.CancelledError:
+            outcome = "disconnected"
+            raise
         except Exception as e:
             # 发送错误信息
-            yield {
+            queue.put_nowait({
                 "event": "error",
                 "data": json.dumps({"error": str(e)}, ensure_ascii=False)
-            }
+            })
+        finally:
+            admission.release(ticket)
+            queue.put_nowait(None)
+            callback.finish()
+            CHAT_REQUESTS.inc(endpoint="stream", outcome=outcome)
+
+    async def event_generator() -> AsyncGenerator[dict, None]:
+        # Agent 在等待工具结果时，部分结果也要能及时推送，所以两者经同一个队列合并输出
+        queue: asyncio.Queue = asyncio.Queue()
+        token = deadline.CancelToken(CHAT_TIMEOUT)
+        task = asyncio.create_task(run_agent(queue, token))
+        try:
+            # 连续的回答片段合并后推送，其他事件立即推送（见 api/coalesce.py）
+            async for event in coalesce_messages(queue):
+                yield event
+        finally:
+            if not task.done():
+                # 客户端断开：取消令牌让工具线程退出，再停止 Agent
+                token.cancel("客户端已断开")
+                task.cancel()
+
+    # 事件流没有开始（如客户端在响应前断开）时 run_agent 不会运行，由响应结束后的后台任务归还名额
+    return EventSourceResponse(event_generator(), background=BackgroundTask(admission.release, ticket))
+
+
+async def stream_agent(
+    message: str,
+    queue: asyncio.Queue,
+    callback: MetricsCallback,
+    recorder: AnswerRecorder,
+    on_first_token: Callable[[], None] | None = None,
+) -> None:
+    """运行 Agent，把工具调用和回答文本转换为 SSE 事件放入 queue（流式接口和后台任务共用）"""
+    # 使用 agent.astream 异步流式输出（MCP 工具需要异步）
+    events = agent.astream(
+        {"messages": [HumanMessage(content=message)]},
+        stream_mode="messages",
+        config={"callbacks": [callback]},
+    )
+    first_token = True
+
+    async for msg, metadata in events:
+        # 处理工具调用事件
+        if hasattr(msg, "tool_calls") and msg.tool_calls:
+            for tc in msg.tool_calls:
+                recorder.tool_call(tc["name"], tc["args"])
+                queue.put_nowait({
+                    "event": "tool_call",
+                    "data": json.dumps({
+                        "name": tc["name"],
+                        "args": tc["args"],
+                    }, ensure_ascii=False)
+                })
+
+        # 处理 agent 输出的文本（节点名为 "model"）
+        elif hasattr(msg, "content") and msg.content and metadata.get("langgraph_node") == "model":
+            if first_token:
+                first_token = False
+                if on_first_token is not None:
+                    on_first_token()
+            recorder.text(msg.id, msg.content)
+            queue.put_nowait({
+                "event": "message",
+                "data": msg.content
+            })
+
+        # 工具结果不推送给前端，只用于判断回答能否缓存
+        elif msg.type == "tool":
+            recorder.tool_result(msg.content)
+
+
+async def replay_cached(entry: dict, started: float) -> AsyncGenerator[dict, None]:
+    """重放缓存的 SSE 事件"""
+    CHAT_TTFT.observe(time.perf_counter() - started)
+    CHAT_REQUESTS.inc(endpoint="stream", outcome="cached")
+    for frame in entry["frames"]:
+        yield frame
+    yield {"event": "done", "data": "[DONE]"}
+
+
+# ============================================================
+# 后台任务
+# ============================================================
+
+async def run_chat_job(job: dict, queue: asyncio.Queue) -> dict:
+    """chat 任务：与 /api/chat 相同，先查回答缓存"""
+    cached = await asyncio.to_thread(answer_cache.get, MODEL_NAME, job["query"])
+    ANSWER_CACHE.inc(endpoint="job", result=cached["match"] if cached else "miss")
+    if cached:
+        for frame in cached["frames"]:
+            queue.put_nowait(frame)
+        return {"answer": cached["answer"], "cached": True}
+
+    progress_sink.set(lambda progress: queue.put_nowait({
+        "event": "tool_progress",
+        "data": json.dumps(progress, ensure_ascii=False),
+    }))
+    callback = MetricsCallback(MODEL_NAME)
+    recorder = AnswerRecorder()
+    try:
+        await stream_agent(job["query"], queue, callback, recorder)
+    finally:
+        callback.finish()
+    await asyncio.to_thread(answer_cache.put, MODEL_NAME, job["query"], recorder)
+    return {"answer": recorder.answer, "cached": False}
+
+
+async def run_research_job(job: dict, queue: asyncio.Queue) -> dict:
+    """research 任务：运行多 Agent 协作系统，每完成一步推送一个 step 事件
+
+    多 Agent 系统是同步的，在线程中运行；任务被取消或超时后，线程在当前步骤或下一次取数时停止。
+    """
+    # 用到时才导入，不拖慢服务启动
+    from agents.multi_agent_system import stream_multi_agent
+
+    loop = asyncio.get_running_loop()
+    token = deadline.current()
+    # 各步骤的输出字段
+    outputs = {
+        "route": "next_step",
+        "research": "research_result",
+        "analysis": "analysis_result",
+        "synthesize": "final_report",
+    }
+
+    def run() -> dict:
+        state: dict = {}
+        for update in stream_multi_agent(llm, job["query"]):
+            if token is not None:
+                token.check()
+            for node, node_state in update.items():
+                state.update(node_state)
+                step = {"node": node, "content": node_state.get(outputs.get(node, ""), "")}
+                loop.call_soon_threadsafe(queue.put_nowait, {
+                    "event": "step",
+                    "data": json.dumps(step, ensure_ascii=False),
+                })
+        return {
+            "final_report": state.get("final_report", ""),
+            "research_result": state.get("research_result", ""),
+            "analysis_result": state.get("analysis_result", ""),
+            "execution_path": state.get("next_step", ""),
+        }
+
+    # to_thread 复制当前上下文，取数代码能读到任务的取消令牌
+    return await asyncio.to_thread(run)
+
+
+def job_info(job: dict) -> JobInfo:
+    return JobInfo(
+        **{field: job[field] for field in (
+            "id", "kind", "query", "status", "attempts", "created_at", "started_at", "finished_at", "error", "result",
+        )},
+        events_url=f"/api/jobs/{job['id']}/events",
+    )
+
+
+async def get_job_or_404(job_id: str) -> dict:
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return job
+
+
+@app.post("/api/jobs", response_model=JobInfo, status_code=202, tags=["后台任务"])
+async def submit_job(request: JobRequest, http_request: Request):
+    """
+    提交后台任务，立即返回任务号
+
+    任务在后台排队运行，用 /api/jobs/{id}/events 接收进度，用 /api/jobs/{id} 查询结果。
+    排队中的任务已达上限时返回 429。
+    """
+    try:
+        job = await job_manager.submit(request.kind, request.query, client_id(http_request))
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job_info(job)
+
+
+@app.get("/api/jobs", response_model=list[JobInfo], tags=["后台任务"])
+async def list_jobs(http_request: Request, limit: int = 20):
+    """
+    当前客户端（X-Client-Id 或 IP）最近提交的任务
+    """
+    return [job_info(job) for job in await job_manager.recent(client_id(http_request), min(max(limit, 1), 100))]
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobInfo, tags=["后台任务"])
+async def get_job(job_id: str):
+    """
+    查询任务状态和结果
+    """
+    return job_info(await get_job_or_404(job_id))
+
 
-    return EventSourceResponse(event_generator())
+@app.get("/api/jobs/{job_id}/events", tags=["后台任务"])
+async def job_events(job_id: str, http_request: Request, after: int = 0):
+    """
+    任务事件（SSE），任务结束且事件推送完后关闭
+
+    事件：status（queued / running / succeeded / failed / cancelled，重新运行时 attempt 递增）、
+    tool_call、tool_progress、message（chat 任务）、step（research 任务每一步的结果）。
+    每个事件的 id 为序号；断线后带上 Last-Event-ID 请求头（EventSource 自动带上）或 after 参数，从下一条继续推送。
+    """
+    await get_job_or_404(job_id)
+    last_event_id = http_request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+    return EventSourceResponse(job_manager.events(job_id, after))
+
+
+@app.post("/api/jobs/{job_id}/retry", response_model=JobInfo, tags=["后台任务"])
+async def retry_job(job_id: str):
+    """
+    重新运行失败或已取消的任务（事件接着原来的序号继续写入）
+    """
+    job = await get_job_or_404(job_id)
+    if not await job_manager.retry(job_id):
+        raise HTTPException(status_code=409, detail=f"任务状态为 {job['status']}，只能重试失败或已取消的任务")
+    return job_info(await job_manager.get(job_id))
+
+
+@app.delete("/api/jobs/{job_id}", response_model=JobInfo, tags=["后台任务"])
+async def cancel_job(job_id: str):
+    """
+    取消任务：排队中的任务立即取消，运行中的任务稍后停止（状态先保持 running）
+    """
+    job = await get_job_or_404(job_id)
+    if job["status"] in TERMINAL and job["status"] != "cancelled":
+        raise HTTPException(status_code=409, detail=f"任务已结束（{job['status']}）")
+    await job_manager.cancel(job_id)
+    return job_info(await job_manager.get(job_id))
 
 
 # ============================================================
 # 静态文件服务
 # ============================================================
 
-static_path = Path(__file__).parent.parent / "static"
-if static_path.exists():
-    app.mount("/static", StaticFiles(directory=str(static_path)), name="static")
+# 启动时读入内存并预先压缩，带内容哈希的 ETag 和缓存头（见 api/static_assets.py）
+static_assets = StaticAssets(Path(__file__).parent.parent / "static")
+
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_file(path: str, request: Request):
+    await static_assets.refresh()
+    return static_assets.response(request, path)
 
 
 @app.get("/", response_class=HTMLResponse, tags=["前端"])
-async def root():
+async def root(request: Request):
     """
-    根路径 - 返回前端 HTML 页面
+    根路径 - 返回前端 HTML 页面（内容未变时返回 304）
     """
-    index_file = static_path / "index.html"
-    if index_file.exists():
-        return index_file.read_text(encoding="utf-8")
+    await static_assets.refresh()
+    if static_assets.exists("index.html"):
+        return static_assets.response(request, "index.html")
     else:
         return """
         <!DOCTYPE html>
@@ -301,6 +716,7 @@ async def root():
                 <li><a href="/docs">API 文档（Swagger UI）</a></li>
                 <li><a href="/redoc">API 文档（ReDoc）</a></li>
                 <li><a href="/api/health">健康检查</a></li>
+                <li><a href="/metrics">运行指标（Prometheus）</a></li>
                 <li><a href="/api/tools">查看工具列表</a></li>
             </ul>
             <h3>架构说明</h3>
@@ -336,6 +752,7 @@ if __name__ == "__main__":
         "server_with_mcp:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        # 开发时用 make dev 热重载；生产环境的多 worker 模式见 api/serve.py
+        reload=os.getenv("API_RELOAD", "0") == "1",
         log_level="info",
     )
@@ -0,0 +1,220 @@
+"""
+前端静态文件
+原来每次访问 / 都重新读取 index.html，app.js、style.css 由 StaticFiles 原样返回：没有压缩，
+浏览器每次打开页面都要重新验证甚至重新下载。这里在启动时把 static/ 下的文件一次读入内存：
+
+- 文本类文件预先压缩为 gzip 和 brotli（安装了 brotli 包时），按 Accept-Encoding 直接返回压缩好的内容
+- ETag 取内容的哈希，If-None-Match 匹配时返回 304
+- index.html 中引用的 /static/ 文件加上 ?v=<内容哈希>，带正确版本号的请求返回
+  Cache-Control: immutable，一年内不再请求；文件内容变化后版本号随之变化
+- index.html 本身和不带版本号的请求用 no-cache，每次用 ETag 验证
+
+加载、压缩和开发模式下的修改检查都在线程池中进行，请求处理函数先 await refresh()，不阻塞事件循环。
+开发时设置 STATIC_RELOAD=1（make dev 默认开启），最多每 STATIC_RELOAD_INTERVAL 秒检查一次修改，有变化时重新加载。
+"""
+
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：pip install brotli
+    brotli = None
+
+# 文件修改后是否自动重新加载
+STATIC_RELOAD = os.getenv("STATIC_RELOAD", "0") == "1"
+# 检查修改的最短间隔（秒）：每次检查都要遍历目录并读取修改时间
+STATIC_RELOAD_INTERVAL = float(os.getenv("STATIC_RELOAD_INTERVAL", "1"))
+
+# 值得压缩的类型和最小字节数
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_SIZE = 512
+
+# 带版本号的文件缓存一年；其他响应每次验证
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+_STATIC_REF = re.compile(r'((?:src|href)=")/static/([^"?#]+)(")')
+
+
+class StaticAsset:
+    """一个静态文件：原始内容、各压缩格式的内容和 ETag"""
+
+    def __init__(self, path: Path, body: bytes):
+        self.path = path
+        self.mtime = path.stat().st_mtime
+        self.body = body
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        self.content_type = _content_type(path)
+        # 编码 -> 内容；压缩后没有变小的格式不保留
+        self.encodings: dict[str, bytes] = {}
+        if self.content_type.startswith(COMPRESSIBLE_TYPES) and len(body) >= MIN_COMPRESS_SIZE:
+            if brotli is not None:
+                self._keep("br", brotli.compress(body, quality=11, mode=brotli.MODE_TEXT))
+            self._keep("gzip", gzip.compress(body, compresslevel=9, mtime=0))
+
+    def etag(self, encoding: str | None) -> str:
+        # 同一内容的不同编码是不同的字节，ETag 也要不同
+        return f'"{self.version}-{encoding}"' if encoding else f'"{self.version}"'
+
+    def _keep(self, encoding: str, data: bytes) -> None:
+        if len(data) < len(self.body):
+            self.encodings[encoding] = data
+
+
+class StaticAssets:
+    """启动时加载 static/ 下的全部文件，按请求头返回压缩内容或 304
+
+    Args:
+        directory: 静态文件目录
+        reload: 文件修改后是否重新加载
+        reload_interval: 检查修改的最短间隔（秒）
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        reload: bool = STATIC_RELOAD,
+        reload_interval: float = STATIC_RELOAD_INTERVAL,
+    ):
+        self.directory = Path(directory)
+        self.reload = reload
+        self.reload_interval = reload_interval
+        self._assets: dict[str, StaticAsset] | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """读取并压缩全部文件（brotli 最高压缩级别较慢，服务启动时在后台调用）"""
+        assets = {}
+        for path in sorted(self.directory.rglob("*")):
+            if path.is_file():
+                name = path.relative_to(self.directory).as_posix()
+                assets[name] = StaticAsset(path, path.read_bytes())
+        # index.html 中的引用加上版本号，依赖其他文件的哈希，最后处理
+        index = assets.get("index.html")
+        if index is not None:
+            html = _STATIC_REF.sub(
+                lambda m: f"{m[1]}/static/{m[2]}?v={assets[m[2]].version}{m[3]}" if m[2] in assets else m[0],
+                index.body.decode("utf-8"),
+            )
+            assets["index.html"] = StaticAsset(index.path, html.encode("utf-8"))
+        self._assets = assets
+
+    async def refresh(self) -> None:
+        """确保文件已加载，开发模式下按间隔检查修改；加载和检查在线程池中进行
+
+        启动时的后台加载尚未完成时，在线程中等待它，不会重复加载。
+        """
+        if self._assets is not None and not self._check_due():
+            return
+        await asyncio.to_thread(self._refresh)
+
+    def exists(self, name: str) -> bool:
+        return name in self._current()
+
+    def response(self, request: Request, name: str) -> Response:
+        """返回文件 name（相对于 static/ 的路径）；不存在时返回 404"""
+        asset = self._current().get(name)
+        if asset is None:
+            return Response("Not Found", status_code=404, media_type="text/plain")
+
+        encoding = _negotiate(request.headers.get("accept-encoding", ""), asset.encodings)
+        versioned = name != "index.html" and request.query_params.get("v") == asset.version
+        headers = {
+            "ETag": asset.etag(encoding),
+            "Cache-Control": IMMUTABLE if versioned else REVALIDATE,
+            "Vary": "Accept-Encoding",
+        }
+        if _matches(request.headers.get("if-none-match", ""), asset):
+            return Response(status_code=304, headers=headers)
+
+        body = asset.body
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            body = asset.encodings[encoding]
+        if request.method == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            body = b""
+        return Response(body, headers=headers, media_type=asset.content_type)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """每个文件原始和各压缩格式的字节数"""
+        return {
+            name: {"identity": len(asset.body), **{enc: len(data) for enc, data in asset.encodings.items()}}
+            for name, asset in self._current().items()
+        }
+
+    def _current(self) -> dict[str, StaticAsset]:
+        """已加载的文件；尚未加载时在当前线程加载（异步调用方应先 await refresh()）"""
+        if self._assets is None:
+            self._refresh()
+        return self._assets
+
+    def _check_due(self) -> bool:
+        return self.reload and time.monotonic() - self._checked_at >= self.reload_interval
+
+    def _refresh(self) -> None:
+        with self._lock:
+            if self._assets is None:
+                self.load()
+                self._checked_at = time.monotonic()
+            elif self._check_due():
+                self._checked_at = time.monotonic()
+                if self._changed():
+                    self.load()
+
+    def _changed(self) -> bool:
+        files = {path for path in self.directory.rglob("*") if path.is_file()}
+        if {asset.path for asset in self._assets.values()} != files:
+            return True
+        return any(asset.path.stat().st_mtime != asset.mtime for asset in self._assets.values())
+
+
+def _content_type(path: Path) -> str:
+    content_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type == "application/javascript":
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def _negotiate(accept_encoding: str, available: dict[str, bytes]) -> str | None:
+    """按 Accept-Encoding 选择编码：br 优先于 gzip，q=0 表示不接受"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and _float(q[2:]) <= 0:
+            continue
+        accepted.add(coding.strip())
+    for encoding in ("br", "gzip"):
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return None
+
+
+def _matches(if_none_match: str, asset: StaticAsset) -> bool:
+    """If-None-Match 中有这个文件任一编码的 ETag（弱比较）时视为未修改"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etags = {asset.etag(None), *(asset.etag(encoding) for encoding in asset.encodings)}
+    return any(tag.strip().removeprefix("W/") in etags for tag in if_none_match.split(","))
+
+
+def _float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return 1.0
@@ -0,0 +1,406 @@
+"""
+工具传输层
+Web 服务获取财经工具的几种方式，工具名称、描述和参数结构完全相同：
+- stdio: 启动 agents/mcp_server.py 子进程，通过 MCP 协议调用（保持一个长连接会话）
+- inprocess: 直接在当前进程加载 mcp_server 的工具实现，省去序列化和进程间通信
+- http / unix: 连接常驻的共享 MCP Server（Streamable HTTP，TCP 或 Unix Socket），
+  多个 worker 和 Agent 共用一份缓存和取数线程池
+
+支持逐行返回的工具（如 compare_stocks）在执行过程中推送部分结果，
+调用方通过 progress_sink 接收，见 api/server_with_mcp.py 的 SSE 流。
+调用方的取消令牌（core.deadline）随工具调用传给服务端，调用方取消时服务端停止执行。
+
+ToolLoader 在后台任务中建立连接，并缓存上次的工具定义：
+Web 服务启动时不必等待子进程启动和 list_tools，连接就绪前的工具调用会等待连接完成。
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import sys
+from contextlib import AsyncExitStack
+from contextvars import ContextVar
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Callable
+
+from langchain_core.tools import BaseTool, StructuredTool
+from langchain_mcp_adapters.callbacks import CallbackContext, Callbacks
+from mcp import ClientSession, types
+
+from core import deadline
+from core.encoding import encode_result
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+TRANSPORTS = ("stdio", "inprocess", "http", "unix")
+
+# 工具传输方式：stdio（默认）/ inprocess / http / unix
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
+
+# 共享 MCP Server 的地址（python agents/mcp_server.py --transport http / unix）
+MCP_URL = os.getenv("MCP_URL", "http://127.0.0.1:8765/mcp/")
+MCP_SOCKET = os.getenv("MCP_SOCKET", "/tmp/finance-mcp.sock")
+
+# 上次连接成功时的工具定义（名称、描述、参数结构）
+TOOL_SCHEMA_CACHE = Path(os.getenv("TOOL_SCHEMA_CACHE", str(PROJECT_ROOT / ".data" / "tool_schemas.json")))
+
+
+def stdio_connection() -> dict[str, Any]:
+    """本地 MCP Server 子进程的连接配置"""
+    venv_python = PROJECT_ROOT / ".venv" / "bin" / "python"
+    return {
+        "transport": "stdio",
+        "command": str(venv_python) if venv_python.exists() else sys.executable,
+        "args": [str(PROJECT_ROOT / "agents" / "mcp_server.py")],
+        # stdio 默认只继承少量环境变量，显式传入以便数据源、调度等配置对子进程生效
+        "env": dict(os.environ),
+    }
+
+
+def http_connection(url: str = MCP_URL) -> dict[str, Any]:
+    """共享 MCP Server 的 HTTP 连接配置"""
+    return {"transport": "streamable_http", "url": url}
+
+
+def unix_connection(socket_path: str = MCP_SOCKET) -> dict[str, Any]:
+    """共享 MCP Server 的 Unix Socket 连接配置：HTTP 请求走本机 socket 文件"""
+    import httpx
+
+    def client_factory(headers=None, timeout=None, auth=None) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(uds=socket_path),
+            headers=headers,
+            timeout=timeout or httpx.Timeout(30, read=300),
+            auth=auth,
+            follow_redirects=True,
+        )
+
+    return {
+        "transport": "streamable_http",
+        "url": "http://localhost/mcp/",
+        "httpx_client_factory": client_factory,
+    }
+
+
+CONNECTIONS = {
+    "stdio": stdio_connection,
+    "http": http_connection,
+    "unix": unix_connection,
+}
+
+
+# ============================================================
+# 部分结果推送
+# ============================================================
+
+# 当前请求的部分结果接收者，参数为 {"name", "progress", "total", "row"}
+# 由发起请求的任务设置（如 SSE 流），未设置时不请求进度通知
+progress_sink: ContextVar[Callable[[dict[str, Any]], None] | None] = ContextVar(
+    "progress_sink", default=None
+)
+
+
+class ProgressCallbacks(Callbacks):
+    """把 MCP 进度通知交给发起这次工具调用的请求
+
+    进度通知在会话的接收任务中回调，取不到调用方的上下文；
+    to_mcp_format 在每次工具调用开始时执行，在这里取出调用方的 progress_sink。
+    """
+
+    def to_mcp_format(self, *, context: CallbackContext):
+        callbacks = super().to_mcp_format(context=context)
+        sink = progress_sink.get()
+        if sink is None:
+            return callbacks
+
+        async def on_progress(progress: float, total: float | None, message: str | None) -> None:
+            row = json.loads(message) if message else None
+            sink({
+                "name": context.tool_name,
+                "progress": int(progress),
+                "total": int(total) if total is not None else None,
+                "row": row,
+            })
+
+        return replace(callbacks, progress_callback=on_progress)
+
+
+async def load_tools(stack: AsyncExitStack, transport: str = MCP_TRANSPORT) -> list[BaseTool]:
+    """按传输方式加载工具，连接等资源注册到 stack，关闭 stack 时释放
+
+    Args:
+        stack: 由调用方负责关闭的 AsyncExitStack
+        transport: stdio / inprocess / http / unix
+    """
+    if transport == "inprocess":
+        return inprocess_tools()
+    if transport in CONNECTIONS:
+        return await session_tools(stack, CONNECTIONS[transport]())
+    raise ValueError(f"不支持的工具传输方式: {transport}，请使用 {' / '.join(TRANSPORTS)}")
+
+
+async def session_tools(stack: AsyncExitStack, connection: dict[str, Any]) -> list[BaseTool]:
+    """与 MCP Server 建立一个长连接会话并加载工具
+
+    默认的 get_tools() 每次工具调用都会新建会话（stdio 下即重新启动子进程），
+    这里改为整个服务生命周期共用一个会话，服务端的缓存也能持续生效。
+    """
+    return await tools_for_session(await open_session(stack, connection))
+
+
+async def open_session(stack: AsyncExitStack, connection: dict[str, Any]) -> ClientSession:
+    """建立一个 MCP 会话，注册到 stack，关闭 stack 时断开"""
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+
+    client = MultiServerMCPClient({"finance": connection})
+    return await stack.enter_async_context(client.session("finance"))
+
+
+async def tools_for_session(session: ClientSession) -> list[BaseTool]:
+    """基于已建立的会话加载工具：支持截止时间、取消通知和部分结果推送"""
+    from langchain_mcp_adapters.tools import load_mcp_tools
+
+    return await load_mcp_tools(
+        DeadlineSession(session), callbacks=ProgressCallbacks(), server_name="finance"
+    )
+
+
+class DeadlineSession:
+    """ClientSession 的代理，让工具调用遵守调用方的取消令牌
+
+    - 当前令牌的剩余时间通过 _meta.deadline_ms 传给服务端，服务端据此限制执行时间
+    - 调用方被取消（浏览器断开、Agent 超时）时发送 notifications/cancelled，
+      服务端取消对应的执行，调度名额立即释放，取数线程在下一次检查时退出
+
+    MCP SDK 在调用方取消时只停止等待响应，不会通知服务端，所以在这里补上。
+    """
+
+    def __init__(self, session: ClientSession):
+        self._session = session
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._session, name)
+
+    async def call_tool(
+        self,
+        name: str,
+        arguments: dict[str, Any] | None = None,
+        read_timeout_seconds=None,
+        progress_callback=None,
+        *,
+        meta: dict[str, Any] | None = None,
+    ) -> types.CallToolResult:
+        remaining = deadline.remaining()
+        if remaining is not None:
+            meta = {**(meta or {}), "deadline_ms": int(remaining * 1000)}
+        # send_request 在第一次挂起之前就取走 _request_id，这里读到的就是本次请求的 id
+        request_id = self._session._request_id
+        try:
+            return await self._session.call_tool(
+                name, arguments, read_timeout_seconds, progress_callback, meta=meta
+            )
+        except asyncio.CancelledError:
+            await self._notify_cancelled(request_id)
+            raise
+
+    async def _notify_cancelled(self, request_id: int) -> None:
+        try:
+            await self._session.send_notification(
+                types.ClientNotification(
+                    types.CancelledNotification(
+                        params=types.CancelledNotificationParams(
+                            requestId=request_id, reason="调用方已取消"
+                        ),
+                    )
+                )
+            )
+        except Exception:
+            # 连接已关闭时服务端的执行也会随会话结束
+            pass
+
+
+def inprocess_tools() -> list[BaseTool]:
+    """直接使用 mcp_server 的工具定义和 execute_tool 构建 LangChain 工具
+
+    与 langchain_mcp_adapters 的转换方式一致：参数结构取自 MCP 的 inputSchema，
+    返回 content_and_artifact 格式的文本块，Agent 看到的工具和结果与 stdio 模式相同。
+    """
+    from agents import mcp_server
+
+    def make_tool(spec) -> StructuredTool:
+        async def call_tool(**arguments: Any) -> tuple[list[dict[str, str]], None]:
+            result = await mcp_server.execute_tool(spec.name, arguments, on_row=_row_callback(spec.name))
+            return [{"type": "text", "text": encode_result(result)}], None
+
+        return StructuredTool(
+            name=spec.name,
+            description=spec.description or "",
+            args_schema=spec.inputSchema,
+            coroutine=call_tool,
+            response_format="content_and_artifact",
+        )
+
+    return [make_tool(spec) for spec in mcp_server.TOOLS]
+
+
+def _row_callback(name: str) -> Callable[[dict[str, Any], int], None] | None:
+    """进程内调用时把部分结果直接交给 progress_sink，格式与 MCP 进度通知一致"""
+    sink = progress_sink.get()
+    if sink is None:
+        return None
+    counter = itertools.count(1)
+    return lambda row, total: sink({"name": name, "progress": next(counter), "total": total, "row": row})
+
+
+# ============================================================
+# 工具定义缓存与后台连接
+# ============================================================
+
+
+def load_schemas(path: Path = TOOL_SCHEMA_CACHE) -> list[dict[str, Any]] | None:
+    """读取缓存的工具定义，不存在或无法解析时返回 None"""
+    try:
+        schemas = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(schemas, list) or not all(isinstance(spec, dict) and "name" in spec for spec in schemas):
+        return None
+    return schemas
+
+
+def save_schemas(tools: list[BaseTool], path: Path = TOOL_SCHEMA_CACHE) -> bool:
+    """保存工具定义，返回与之前的缓存相比是否有变化"""
+    schemas = [
+        {
+            "name": tool.name,
+            "description": tool.description,
+            "inputSchema": tool.args_schema if isinstance(tool.args_schema, dict) else {},
+        }
+        for tool in tools
+    ]
+    if schemas == load_schemas(path):
+        return False
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(schemas, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(path)
+    except OSError:
+        # 缓存只用于加快下次启动，写不进去不影响使用
+        pass
+    return True
+
+
+class ToolLoader:
+    """在后台任务中建立工具连接
+
+    有缓存的工具定义时，start() 立即返回同名的代理工具，服务马上可以创建 Agent、接收请求，
+    代理工具被调用时等待连接就绪，再转交给真实工具；没有缓存（首次启动）时等待连接完成。
+    连接成功后更新缓存。MCP 会话必须在同一个任务中建立和关闭，所以整个连接由后台任务持有。
+
+    Args:
+        transport: stdio / inprocess / http / unix
+    """
+
+    def __init__(self, transport: str = MCP_TRANSPORT):
+        self.transport = transport
+        self.schemas_changed = False
+        self._tools: asyncio.Future[dict[str, BaseTool]] | None = None
+        self._session: ClientSession | None = None
+        self._closing = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def ready(self) -> bool:
+        """连接已就绪"""
+        return (
+            self._tools is not None
+            and self._tools.done()
+            and not self._tools.cancelled()
+            and self._tools.exception() is None
+        )
+
+    async def start(self) -> list[BaseTool]:
+        """开始连接，返回工具列表（可能是等待连接的代理工具）"""
+        self._tools = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._run())
+
+        schemas = load_schemas() if self.transport != "inprocess" else None
+        if schemas:
+            return [self._proxy(spec) for spec in schemas]
+        return list((await self.wait_ready()).values())
+
+    async def wait_ready(self) -> dict[str, BaseTool]:
+        """等待连接就绪，连接失败时抛出对应的异常"""
+        # shield：调用方被取消时不能取消共享的 future
+        return await asyncio.shield(self._tools)
+
+    async def server_stats(self) -> dict[str, Any] | None:
+        """MCP Server 的运行统计（见 mcp_server.server_stats），连接未就绪时返回 None"""
+        if not self.ready:
+            return None
+        from agents.mcp_server import STATS_URI
+
+        if self._session is None:
+            # inprocess：工具实现就在本进程
+            from agents.mcp_server import server_stats
+
+            return server_stats()
+        result = await self._session.read_resource(STATS_URI)
+        return json.loads(result.contents[0].text)
+
+    async def close(self) -> None:
+        """关闭连接"""
+        if self._task is None:
+            return
+        if self.ready:
+            self._closing.set()
+        else:
+            self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+    async def _run(self) -> None:
+        try:
+            async with AsyncExitStack() as stack:
+                if self.transport in CONNECTIONS:
+                    # 保留会话，用于读取服务端的运行统计
+                    self._session = await open_session(stack, CONNECTIONS[self.transport]())
+                    tools = await tools_for_session(self._session)
+                else:
+                    tools = await load_tools(stack, self.transport)
+                self._tools.set_result({tool.name: tool for tool in tools})
+                self.schemas_changed = save_schemas(tools)
+                await self._closing.wait()
+        except Exception as e:
+            if not self._tools.done():
+                self._tools.set_exception(e)
+            else:
+                raise
+
+    def _proxy(self, spec: dict[str, Any]) -> StructuredTool:
+        """按缓存的定义创建工具，调用时转交给连接就绪后的同名工具"""
+        name = spec["name"]
+
+        async def call_tool(**arguments: Any) -> tuple[Any, Any]:
+            try:
+                tools = await self.wait_ready()
+            except Exception as e:
+                result = {"success": False, "error": f"工具服务连接失败: {e}"}
+                return [{"type": "text", "text": encode_result(result)}], None
+            if name not in tools:
+                result = {"success": False, "error": f"未知工具: {name}"}
+                return [{"type": "text", "text": encode_result(result)}], None
+            return await tools[name].coroutine(**arguments)
+
+        return StructuredTool(
+            name=name,
+            description=spec.get("description") or "",
+            args_schema=spec.get("inputSchema") or {"type": "object", "properties": {}},
+            coroutine=call_tool,
+            response_format="content_and_artifact",
+        )
@@ -0,0 +1,11 @@
+"""
+Benchmarks - 工具层性能基准
+
+基于回放数据离线运行，结果输出为 JSON，便于在不同提交之间对比：
+- fixtures: 生成确定性的合成回放数据
+- common: 回放环境、延迟统计、结果文件与对比
+- bench_tools: 工具层微基准（冷 / 热，串行 / 并发）
+- bench_transport: 工具传输方式（stdio / inprocess / http / unix）的单次调用开销
+- bench_encoding: 工具结果在各种编码下的字节数和 token 数
+- bench_startup: 模块导入、MCP Server 和 Web 服务的启动耗时
+"""
@@ -0,0 +1,123 @@
+"""
+工具结果编码基准
+基于回放数据对每个工具的结果分别按 pretty / compact / table 编码，
+统计字节数、token 数（即每一步 Agent 循环额外占用的提示词大小）和编码耗时。
+
+用法：
+    python -m benchmarks.bench_encoding
+    python -m benchmarks.bench_encoding --suite agent --compare .data/bench/encoding-old.json
+"""
+
+import argparse
+import asyncio
+import shutil
+import sys
+import time
+from typing import Any
+
+from benchmarks.bench_tools import CASES
+from benchmarks.common import compare, latency_stats, replay_environment, write_report
+
+
+def mcp_results() -> dict[str, Any]:
+    """MCP 工具的原始结果（编码前的字典）"""
+    from agents import mcp_server
+
+    async def collect():
+        return {
+            name: await mcp_server.execute_tool(name, args)
+            for name, args in CASES
+            if name in {tool.name for tool in mcp_server.TOOLS}
+        }
+
+    return asyncio.run(collect())
+
+
+def agent_outputs(fmt: str) -> dict[str, str]:
+    """finance_agent 的 @tool 在指定编码下的输出"""
+    import finance_agent
+    from core import encoding
+
+    registry = {tool.name: tool for tool in finance_agent.tools}
+    previous, encoding.TOOL_OUTPUT_FORMAT = encoding.TOOL_OUTPUT_FORMAT, fmt
+    try:
+        return {name: registry[name].invoke(args) for name, args in CASES if name in registry and name != "think"}
+    finally:
+        encoding.TOOL_OUTPUT_FORMAT = previous
+
+
+def measure_encoding(result: Any, fmt: str, iterations: int) -> dict[str, Any]:
+    from core.encoding import count_tokens, encode_result
+
+    latencies = []
+    wall_started = time.perf_counter()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        text = encode_result(result, fmt)
+        latencies.append(time.perf_counter() - started)
+    wall = time.perf_counter() - wall_started
+    return {
+        **latency_stats(latencies, wall),
+        "bytes": len(text.encode("utf-8")),
+        "tokens": count_tokens(text),
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="工具结果编码基准")
+    parser.add_argument("--fixtures", help="回放数据目录，默认生成合成数据")
+    parser.add_argument("--suite", choices=("all", "mcp", "agent"), default="all")
+    parser.add_argument("--iterations", type=int, default=200, help="每种编码的重复次数（测量编码耗时）")
+    parser.add_argument("--output", help="结果文件路径，默认 .data/bench/encoding-<时间>.json")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    args = parser.parse_args(argv)
+
+    workdir = replay_environment(args.fixtures, "0")
+    try:
+        from core.encoding import FORMATS, count_tokens, tokenizer_name
+
+        results = {}
+        if args.suite in ("all", "mcp"):
+            for name, result in mcp_results().items():
+                for fmt in FORMATS:
+                    results[f"mcp.{name}.{fmt}"] = measure_encoding(result, fmt, args.iterations)
+
+        if args.suite in ("all", "agent"):
+            # @tool 内部完成编码，只统计输出大小
+            for fmt in FORMATS:
+                for name, text in agent_outputs(fmt).items():
+                    results[f"agent.{name}.{fmt}"] = {
+                        "bytes": len(text.encode("utf-8")),
+                        "tokens": count_tokens(text),
+                    }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"token 计数方式: {tokenizer_name()}")
+    print(f"{'tool':<38} {'format':<8} {'bytes':>7} {'tokens':>7} {'vs pretty':>10} {'encode p50':>11}")
+    totals = {fmt: 0 for fmt in FORMATS}
+    for key, stats in results.items():
+        suite, name, fmt = key.split(".")
+        base = results[f"{suite}.{name}.pretty"]["tokens"]
+        stats["token_ratio"] = round(stats["tokens"] / base, 4) if base else None
+        totals[fmt] += stats["tokens"]
+        encode = f"{stats['p50_ms'] * 1000:>9.1f}µs" if "p50_ms" in stats else f"{'-':>11}"
+        print(
+            f"{suite + '.' + name:<38} {fmt:<8} {stats['bytes']:>7} {stats['tokens']:>7} "
+            f"{(stats['token_ratio'] - 1) * 100 if stats['token_ratio'] else 0:>+9.1f}% {encode}"
+        )
+    for fmt in FORMATS:
+        print(f"合计 {fmt:<8} {totals[fmt]:>7} tokens")
+
+    report = write_report(results, {
+        "fixtures": "recorded" if args.fixtures else "synthetic",
+        "tokenizer": tokenizer_name(),
+        "iterations": args.iterations,
+    }, args.output, prefix="encoding")
+
+    if args.compare:
+        compare(args.compare, report, metrics=("tokens", "bytes", "p50_ms"))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
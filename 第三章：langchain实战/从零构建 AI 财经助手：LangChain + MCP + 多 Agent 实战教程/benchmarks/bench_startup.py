@@ -0,0 +1,160 @@
+"""
+启动耗时基准
+每次都在新的子进程中测量，结果包含解释器和依赖的导入：
+- import: 导入各个入口模块的耗时（不含解释器启动）
+- mcp_stdio: 启动 MCP Server 子进程到 list_tools 返回、到第一次工具调用返回的耗时
+- api: 启动 Web 服务到 /api/health 可用、到 MCP 工具连接就绪的耗时，
+  分别测量没有工具定义缓存（首次启动）和有缓存两种情况
+
+用法：
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --iterations 10 --compare .data/bench/startup-old.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any
+
+from benchmarks.common import PROJECT_ROOT, compare, latency_stats, replay_environment, write_report
+
+SUITES = ("import", "mcp_stdio", "api")
+
+IMPORT_MODULES = ("config", "agents.mcp_server", "api.tool_transport", "api.server_with_mcp", "finance_agent")
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def _env() -> dict[str, str]:
+    return {**os.environ, "PYTHONPATH": str(PROJECT_ROOT)}
+
+
+def measure_import(module: str) -> float:
+    """在新进程中导入模块，返回导入耗时（秒）"""
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=PROJECT_ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+async def measure_mcp_stdio() -> tuple[float, float]:
+    """启动 MCP Server 子进程，返回 (到 list_tools 返回, 到第一次工具调用返回) 的耗时（秒）"""
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    from api.tool_transport import stdio_connection
+
+    connection = stdio_connection()
+    params = StdioServerParameters(command=connection["command"], args=connection["args"], env=connection["env"])
+    started = time.perf_counter()
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            await session.list_tools()
+            listed = time.perf_counter() - started
+            await session.call_tool("get_stock_info", {"ticker": "AAPL"})
+            called = time.perf_counter() - started
+    return listed, called
+
+
+def measure_api(schema_cache: Path, timeout: float = 120) -> tuple[float, float]:
+    """启动 Web 服务，返回 (到 /api/health 可用, 到 MCP 工具连接就绪) 的耗时（秒）"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    env = {**_env(), "TOOL_SCHEMA_CACHE": str(schema_cache), "MCP_TRANSPORT": "stdio"}
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.server_with_mcp:app", "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    healthy = None
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("Web 服务启动失败")
+            health = _get_json(f"http://127.0.0.1:{port}/api/health")
+            if health is not None:
+                healthy = healthy or time.perf_counter() - started
+                if health.get("mcp_ready"):
+                    return healthy, time.perf_counter() - started
+            time.sleep(0.01)
+        raise RuntimeError(f"Web 服务 {timeout:g} 秒内未就绪")
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def _get_json(url: str) -> dict[str, Any] | None:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return json.loads(response.read())
+    except OSError:
+        return None
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="启动耗时基准")
+    parser.add_argument("--fixtures", help="回放数据目录，默认生成合成数据")
+    parser.add_argument("--iterations", type=int, default=5, help="每项测量的次数")
+    parser.add_argument("--suites", nargs="*", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--output", help="结果文件路径，默认 .data/bench/startup-<时间>.json")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    args = parser.parse_args(argv)
+
+    # 子进程通过环境变量继承回放模式，上游不加延迟，只测启动本身
+    workdir = replay_environment(args.fixtures, "0")
+    samples: dict[str, list[float]] = {}
+
+    def record(key: str, seconds: float) -> None:
+        samples.setdefault(key, []).append(seconds)
+        print(f"  {key:<36} {seconds * 1000:>9.1f}ms", flush=True)
+
+    try:
+        for _ in range(args.iterations):
+            if "import" in args.suites:
+                for module in IMPORT_MODULES:
+                    record(f"import.{module}", measure_import(module))
+
+            if "mcp_stdio" in args.suites:
+                listed, called = asyncio.run(measure_mcp_stdio())
+                record("mcp_stdio.list_tools", listed)
+                record("mcp_stdio.first_call", called)
+
+            if "api" in args.suites:
+                schema_cache = workdir / "tool_schemas.json"
+                schema_cache.unlink(missing_ok=True)
+                # 第一次没有缓存，启动过程中写入缓存，第二次使用缓存
+                for scenario in ("cold", "cached"):
+                    healthy, ready = measure_api(schema_cache)
+                    record(f"api.{scenario}.health", healthy)
+                    record(f"api.{scenario}.tools_ready", ready)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {key: latency_stats(values, sum(values)) for key, values in samples.items()}
+    print(f"\n{'case':<36} {'p50':>10} {'max':>10}")
+    for key, stats in results.items():
+        print(f"{key:<36} {stats['p50_ms']:>8.1f}ms {stats['max_ms']:>8.1f}ms")
+
+    report = write_report(results, {
+        "fixtures": "recorded" if args.fixtures else "synthetic",
+        "iterations": args.iterations,
+    }, args.output, prefix="startup")
+
+    if args.compare:
+        compare(args.compare, report, metrics=("p50_ms", "p95_ms", "max_ms"))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""
+工具层微基准
+覆盖 agents/mcp_server.py（execute_tool，含调度和请求合并）与 finance_agent.py（@tool）中的每个工具，
+基于回放数据分别测量冷 / 热缓存、串行 / 并发四种场景，
+输出 p50/p95/p99 延迟、吞吐量、序列化字节数、token 数和缓存命中率。
+
+用法：
+    python -m benchmarks.bench_tools                             # 使用合成回放数据
+    python -m benchmarks.bench_tools --fixtures .data/fixtures   # 使用录制的回放数据
+    python -m benchmarks.bench_tools --compare .data/bench/old.json
+"""
+
+import argparse
+import asyncio
+import json
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import numpy as np
+
+from benchmarks.common import compare, latency_stats, replay_environment, write_report
+
+SCENARIOS = ("cold_serial", "warm_serial", "cold_concurrent", "warm_concurrent")
+
+# (工具名, 参数)，两套工具使用相同的参数
+CASES = [
+    ("get_stock_info", {"ticker": "AAPL"}),
+    ("get_stock_history", {"ticker": "AAPL", "period": "6mo"}),
+    ("search_financial_news", {"query": "苹果公司财报"}),
+    ("get_stock_news", {"ticker": "AAPL"}),
+    ("compare_stocks", {"tickers": "AAPL,MSFT,GOOGL,AMZN,NVDA"}),
+    ("get_recommendations", {"ticker": "AAPL"}),
+    ("get_financial_statement", {"ticker": "AAPL", "statement_type": "income"}),
+    ("get_technical_indicators", {"tickers": "AAPL,MSFT,GOOGL", "period": "6mo"}),
+    ("think", {"reflection": "已获取基本面和技术指标，下一步对比同行业估值"}),
+    # 批量工具只有 MCP Server 提供
+    ("get_stock_info_batch", {"tickers": "AAPL,MSFT,GOOGL,AMZN,NVDA"}),
+    ("get_stock_history_batch", {"tickers": "AAPL,MSFT,GOOGL", "period": "6mo"}),
+    ("get_stock_news_batch", {"tickers": "AAPL,MSFT,GOOGL"}),
+    ("get_recommendations_batch", {"tickers": "AAPL,MSFT,GOOGL"}),
+]
+
+
+# ============================================================
+# 被测对象
+# ============================================================
+
+
+class Suite:
+    """一组可调用的工具：call 返回 (序列化后的输出, 是否成功)"""
+
+    name = ""
+
+    def tools(self) -> list[str]:
+        raise NotImplementedError
+
+    def call(self, tool: str, args: dict) -> tuple[str, bool]:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        """清空本套件自己的缓存"""
+
+    def close(self) -> None:
+        pass
+
+
+class MCPSuite(Suite):
+    """MCP Server 的工具：在后台事件循环中调用 execute_tool，输出与 call_tool 的 TextContent 一致（按 TOOL_OUTPUT_FORMAT 编码）"""
+
+    name = "mcp"
+
+    def __init__(self):
+        from agents import mcp_server
+        from core.encoding import encode_result
+
+        self.server = mcp_server
+        self.encode = encode_result
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def tools(self) -> list[str]:
+        return [tool.name for tool in self.server.TOOLS]
+
+    def call(self, tool: str, args: dict) -> tuple[str, bool]:
+        future = asyncio.run_coroutine_threadsafe(self.server.execute_tool(tool, args), self.loop)
+        result = future.result()
+        return self.encode(result), bool(result.get("success"))
+
+    def reset(self) -> None:
+        self.server.clear_result_cache()
+
+    def close(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class AgentSuite(Suite):
+    """finance_agent.py 中注册给 Agent 的 @tool"""
+
+    name = "agent"
+
+    def __init__(self):
+        import finance_agent
+
+        self.registry = {tool.name: tool for tool in finance_agent.tools}
+
+    def tools(self) -> list[str]:
+        return list(self.registry)
+
+    def call(self, tool: str, args: dict) -> tuple[str, bool]:
+        output = self.registry[tool].invoke(args)
+        try:
+            json.loads(output)
+            ok = True
+        except ValueError:
+            # 工具出错时返回的是纯文本提示
+            ok = tool == "think"
+        return output, ok
+
+
+# ============================================================
+# 测量
+# ============================================================
+
+
+def reset_shared_caches() -> None:
+    """清空进程级缓存和本地行情库，回到冷启动状态"""
+    from core.cache import market_cache
+    from core.price_store import price_store
+
+    market_cache.invalidate()
+    shutil.rmtree(price_store.root, ignore_errors=True)
+
+
+def _cache_counts() -> tuple[int, int]:
+    from core.cache import market_cache
+
+    kinds = market_cache.stats()["kinds"].values()
+    return sum(k["hits"] for k in kinds), sum(k["misses"] for k in kinds)
+
+
+def _upstream_calls() -> int:
+    from core.provider import data_provider
+
+    return data_provider.stats()["replayed"]
+
+
+def measure(
+    call: Callable[[], tuple[str, bool]],
+    n: int,
+    concurrency: int,
+    before_each: Callable[[], None] | None = None,
+) -> dict[str, Any]:
+    """执行 n 次调用并汇总统计；concurrency > 1 时所有调用同时提交"""
+    from core.encoding import count_tokens
+
+    latencies: list[float] = []
+    sizes: list[int] = []
+    outputs: list[str] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one():
+        nonlocal errors
+        started = time.perf_counter()
+        output, ok = call()
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            sizes.append(len(output.encode("utf-8")))
+            errors += not ok
+            if not outputs:
+                outputs.append(output)
+
+    hits0, misses0 = _cache_counts()
+    upstream0 = _upstream_calls()
+    wall_started = time.perf_counter()
+    if concurrency <= 1:
+        for _ in range(n):
+            if before_each:
+                before_each()
+            one()
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for future in [pool.submit(one) for _ in range(n)]:
+                future.result()
+    wall = time.perf_counter() - wall_started
+    hits, misses = _cache_counts()
+    lookups = (hits - hits0) + (misses - misses0)
+
+    return {
+        **latency_stats(latencies, wall),
+        "concurrency": concurrency,
+        "bytes_per_call": int(np.mean(sizes)),
+        "tokens_per_call": count_tokens(outputs[0]),
+        "cache_hit_rate": round((hits - hits0) / lookups, 4) if lookups else None,
+        "upstream_calls": _upstream_calls() - upstream0,
+        "errors": errors,
+    }
+
+
+def run_suite(suite: Suite, args: argparse.Namespace) -> dict[str, dict[str, Any]]:
+    available = set(suite.tools())
+    results = {}
+    for tool, tool_args in CASES:
+        if tool not in available or (args.tools and tool not in args.tools):
+            continue
+        call = lambda: suite.call(tool, tool_args)
+
+        def cold():
+            suite.reset()
+            reset_shared_caches()
+
+        for scenario in SCENARIOS:
+            if scenario.startswith("cold"):
+                cold()
+            else:
+                call()  # 预热
+            if scenario == "cold_serial":
+                stats = measure(call, args.cold_iterations, 1, before_each=cold)
+            elif scenario == "warm_serial":
+                stats = measure(call, args.warm_iterations, 1)
+            else:
+                stats = measure(call, args.concurrent_calls, args.concurrency)
+            results[f"{suite.name}.{tool}.{scenario}"] = stats
+            print(
+                f"  {suite.name:<5} {tool:<26} {scenario:<16} "
+                f"p50={stats['p50_ms']:>9.2f}ms p95={stats['p95_ms']:>9.2f}ms "
+                f"{stats['throughput_rps']:>9.1f}/s {stats['bytes_per_call']:>6}B {stats['tokens_per_call']:>5}tok "
+                f"hit={stats['cache_hit_rate'] if stats['cache_hit_rate'] is not None else '-'} "
+                f"upstream={stats['upstream_calls']} err={stats['errors']}",
+                flush=True,
+            )
+    return results
+
+
+# ============================================================
+# 入口
+# ============================================================
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="工具层微基准")
+    parser.add_argument("--fixtures", help="回放数据目录，默认生成合成数据")
+    parser.add_argument("--latency", default="20-60", help="模拟上游延迟（毫秒），如 50 或 20-60")
+    parser.add_argument("--suite", choices=("all", "mcp", "agent"), default="all")
+    parser.add_argument("--tools", nargs="*", help="只运行指定的工具")
+    parser.add_argument("--cold-iterations", type=int, default=5)
+    parser.add_argument("--warm-iterations", type=int, default=50)
+    parser.add_argument("--concurrent-calls", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="结果文件路径，默认 .data/bench/tools-<时间>.json")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    args = parser.parse_args(argv)
+
+    workdir = replay_environment(args.fixtures, args.latency)
+    try:
+        suites = []
+        if args.suite in ("all", "mcp"):
+            suites.append(MCPSuite())
+        if args.suite in ("all", "agent"):
+            suites.append(AgentSuite())
+
+        results = {}
+        for suite in suites:
+            results.update(run_suite(suite, args))
+            suite.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = write_report(results, {
+        "fixtures": "recorded" if args.fixtures else "synthetic",
+        "latency_ms": args.latency,
+        "cold_iterations": args.cold_iterations,
+        "warm_iterations": args.warm_iterations,
+        "concurrent_calls": args.concurrent_calls,
+        "concurrency": args.concurrency,
+    }, args.output, prefix="tools")
+
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""
+工具传输方式基准
+对比 Web 服务调用同一个工具的几种方式（缓存预热后测量，差值即传输开销）：
+- inprocess: 进程内直接调用 mcp_server.execute_tool
+- stdio: 与 MCP Server 子进程保持一个长连接会话
+- stdio_per_call: MultiServerMCPClient.get_tools() 的默认行为，每次调用新建会话和子进程
+- http / unix: 连接常驻的共享 MCP Server（Streamable HTTP，TCP 或 Unix Socket）
+
+用法：
+    python -m benchmarks.bench_transport
+    python -m benchmarks.bench_transport --iterations 500 --compare .data/bench/transport-old.json
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack, contextmanager
+from pathlib import Path
+from typing import Any, Iterator
+
+from benchmarks.common import PROJECT_ROOT, compare, latency_stats, replay_environment, write_report
+
+TRANSPORTS = ("inprocess", "stdio", "stdio_per_call", "http", "unix")
+
+CASES = [
+    ("get_stock_info", {"ticker": "AAPL"}),
+    ("compare_stocks", {"tickers": "AAPL,MSFT,GOOGL,AMZN,NVDA"}),
+    ("get_technical_indicators", {"tickers": "AAPL,MSFT,GOOGL", "period": "6mo"}),
+]
+
+
+@contextmanager
+def shared_server(transport: str, workdir: Path) -> Iterator[dict[str, Any]]:
+    """启动一个共享 MCP Server 子进程，返回连接配置，退出时关闭"""
+    from api import tool_transport
+
+    if transport == "http":
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        args = ["--transport", "http", "--port", str(port)]
+        connection = tool_transport.http_connection(f"http://127.0.0.1:{port}/mcp/")
+        ready = lambda: _port_open(port)
+    else:
+        socket_path = str(workdir / "mcp.sock")
+        args = ["--transport", "unix", "--socket", socket_path]
+        connection = tool_transport.unix_connection(socket_path)
+        ready = lambda: Path(socket_path).is_socket()
+
+    process = subprocess.Popen([sys.executable, str(PROJECT_ROOT / "agents" / "mcp_server.py"), *args])
+    try:
+        deadline = time.monotonic() + 60
+        while not ready():
+            if process.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"共享 MCP Server（{transport}）启动失败")
+            time.sleep(0.1)
+        yield connection
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def _port_open(port: int) -> bool:
+    with socket.socket() as sock:
+        return sock.connect_ex(("127.0.0.1", port)) == 0
+
+
+async def load(transport: str, stack: AsyncExitStack, connection: dict[str, Any] | None) -> dict[str, Any]:
+    from langchain_mcp_adapters.client import MultiServerMCPClient
+
+    from api import tool_transport
+
+    if transport == "inprocess":
+        tools = tool_transport.inprocess_tools()
+    elif transport == "stdio_per_call":
+        client = MultiServerMCPClient({"finance": tool_transport.stdio_connection()})
+        tools = await client.get_tools()
+    else:
+        tools = await tool_transport.session_tools(stack, connection or tool_transport.stdio_connection())
+    return {tool.name: tool for tool in tools}
+
+
+async def run_transport(
+    transport: str, iterations: int, connection: dict[str, Any] | None = None
+) -> dict[str, dict[str, Any]]:
+    results = {}
+    async with AsyncExitStack() as stack:
+        tools = await load(transport, stack, connection)
+        for name, args in CASES:
+            tool = tools[name]
+            output = await tool.ainvoke(args)  # 预热服务端缓存
+            payload = sum(len(block["text"].encode("utf-8")) for block in output)
+
+            latencies = []
+            wall_started = time.perf_counter()
+            for _ in range(iterations):
+                started = time.perf_counter()
+                await tool.ainvoke(args)
+                latencies.append(time.perf_counter() - started)
+            wall = time.perf_counter() - wall_started
+
+            stats = {**latency_stats(latencies, wall), "bytes_per_call": payload}
+            results[f"transport.{name}.{transport}"] = stats
+            print(
+                f"  {transport:<15} {name:<26} p50={stats['p50_ms']:>9.3f}ms "
+                f"p99={stats['p99_ms']:>9.3f}ms {stats['throughput_rps']:>9.1f}/s {payload:>6}B",
+                flush=True,
+            )
+    return results
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="工具传输方式基准")
+    parser.add_argument("--fixtures", help="回放数据目录，默认生成合成数据")
+    parser.add_argument("--iterations", type=int, default=200, help="除 stdio_per_call 外每个工具的调用次数")
+    parser.add_argument("--per-call-iterations", type=int, default=5, help="stdio_per_call 每个工具的调用次数")
+    parser.add_argument("--transports", nargs="*", choices=TRANSPORTS, default=list(TRANSPORTS))
+    parser.add_argument("--output", help="结果文件路径，默认 .data/bench/transport-<时间>.json")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    args = parser.parse_args(argv)
+
+    # 只测传输开销：上游不加延迟，结果缓存覆盖整个测量过程（子进程通过环境变量继承）
+    workdir = replay_environment(args.fixtures, "0")
+    os.environ["MCP_RESULT_TTL"] = "3600"
+    try:
+        results = {}
+        for transport in args.transports:
+            iterations = args.per_call_iterations if transport == "stdio_per_call" else args.iterations
+            if transport in ("http", "unix"):
+                with shared_server(transport, workdir) as connection:
+                    results.update(asyncio.run(run_transport(transport, iterations, connection)))
+            else:
+                results.update(asyncio.run(run_transport(transport, iterations)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    # 每次调用相对 inprocess 多出的开销
+    for name, _ in CASES:
+        base = results.get(f"transport.{name}.inprocess")
+        for transport in TRANSPORTS[1:]:
+            stats = results.get(f"transport.{name}.{transport}")
+            if base and stats:
+                stats["overhead_p50_ms"] = round(stats["p50_ms"] - base["p50_ms"], 3)
+                print(f"  {name:<26} {transport:<15} 比 inprocess 每次多 {stats['overhead_p50_ms']:.3f}ms (p50)")
+
+    report = write_report(results, {
+        "fixtures": "recorded" if args.fixtures else "synthetic",
+        "iterations": args.iterations,
+        "per_call_iterations": args.per_call_iterations,
+    }, args.output, prefix="transport")
+
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
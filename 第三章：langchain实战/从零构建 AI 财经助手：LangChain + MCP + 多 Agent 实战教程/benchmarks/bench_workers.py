@@ -0,0 +1,196 @@
+"""
+多 worker 吞吐量基准
+用 api.serve 分别以 1、2、4 个 worker 启动 Web 服务，并发请求 /api/chat，测量吞吐量和延迟：
+- throughput: 每个请求的问题都不同（不命中回答缓存），每个请求运行一次完整的 Agent 循环
+- shared_cache: 先回答一个问题，再把同一个问题发送多次，统计命中回答缓存的比例
+  （多 worker 时请求落在不同的 worker 上，命中依赖 SQLite 共享缓存）
+
+LLM 使用本地替身服务（benchmarks/stub_llm.py，在单独的进程中运行）：第一轮调用 get_stock_info，
+收到工具结果后返回回答，首字延迟和输出速度由 --llm-ttft-ms、--llm-tps 设置；工具数据使用离线回放数据。
+
+用法：
+    python -m benchmarks.bench_workers
+    python -m benchmarks.bench_workers --workers 1 4 --requests 400 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+import httpx
+
+from benchmarks import stub_llm
+from benchmarks.common import PROJECT_ROOT, compare, latency_stats, replay_environment, write_report
+
+
+# ============================================================
+# Web 服务
+# ============================================================
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_api(workers: int, port: int, workdir: Path, timeout: float = 120) -> subprocess.Popen:
+    """用 api.serve 启动 Web 服务，等到所有 worker 的 MCP 工具连接就绪后返回"""
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(PROJECT_ROOT),
+        "SHARED_CACHE_PATH": str(workdir / f"shared-{workers}.sqlite"),
+        "TOOL_SCHEMA_CACHE": str(workdir / "tool_schemas.json"),
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "api.serve", "--workers", str(workers), "--host", "127.0.0.1",
+            "--port", str(port), "--mcp-socket", str(workdir / f"mcp-{workers}.sock"), "--log-level", "warning",
+        ],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    # 连接由哪个 worker 接受不确定，每次新建连接，直到见过每个 worker 都已就绪
+    ready: set[int] = set()
+    started = time.monotonic()
+    with httpx.Client(timeout=1, headers={"Connection": "close"}) as client:
+        while time.monotonic() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError("Web 服务启动失败")
+            try:
+                health = client.get(f"http://127.0.0.1:{port}/api/health").json()
+            except httpx.HTTPError:
+                time.sleep(0.05)
+                continue
+            if health.get("mcp_ready"):
+                ready.add(health.get("worker_pid"))
+                if len(ready) >= workers:
+                    return process
+            time.sleep(0.01)
+    stop_api(process)
+    raise RuntimeError(f"Web 服务 {timeout:g} 秒内未就绪（已就绪 {len(ready)}/{workers} 个 worker）")
+
+
+def stop_api(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+# ============================================================
+# 负载
+# ============================================================
+
+
+async def run_load(port: int, questions: list[str], concurrency: int) -> dict[str, Any]:
+    """以固定并发发送 questions 中的每个问题，返回延迟统计和命中缓存的比例"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    cached = errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+
+        async def one(index: int, question: str) -> None:
+            nonlocal cached, errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    # 每个请求单独一个客户端标识，排队时不受单客户端上限影响
+                    response = await client.post(
+                        "/api/chat", json={"message": question}, headers={"X-Client-Id": f"bench-{index}"},
+                    )
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - started)
+                cached += bool(response.json().get("cached"))
+
+        wall_started = time.perf_counter()
+        await asyncio.gather(*(one(i, q) for i, q in enumerate(questions)))
+        wall = time.perf_counter() - wall_started
+
+    stats = latency_stats(latencies, wall) if latencies else {"n": 0}
+    return {**stats, "errors": errors, "cache_hit_rate": round(cached / len(latencies), 4) if latencies else 0.0}
+
+
+def bench(workers: int, requests: int, concurrency: int, workdir: Path) -> dict[str, dict[str, Any]]:
+    port = _free_port()
+    process = start_api(workers, port, workdir)
+    try:
+        # 问题带编号，实体（数字）各不相同，不会命中精确或语义缓存
+        distinct = [f"第{i}号问题：查询股票行情" for i in range(requests)]
+        throughput = asyncio.run(run_load(port, distinct, concurrency))
+
+        repeated = "共享缓存测试：苹果股价多少"
+        asyncio.run(run_load(port, [repeated], 1))
+        shared = asyncio.run(run_load(port, [repeated] * requests, concurrency))
+    finally:
+        stop_api(process)
+    return {f"workers{workers}.throughput": throughput, f"workers{workers}.shared_cache": shared}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="多 worker 吞吐量基准")
+    parser.add_argument("--fixtures", help="回放数据目录，默认生成合成数据")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4], help="依次测量的 worker 数")
+    parser.add_argument("--requests", type=int, default=200, help="每组的请求数")
+    parser.add_argument("--concurrency", type=int, default=32, help="同时进行的请求数")
+    parser.add_argument("--llm-ttft-ms", type=float, default=50, help="LLM 替身服务的首字延迟（毫秒）")
+    parser.add_argument("--llm-tps", type=float, default=0, help="LLM 替身服务每秒输出的 token 数，0 为不限速")
+    parser.add_argument("--output", help="结果文件路径，默认 .data/bench/workers-<时间>.json")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    args = parser.parse_args(argv)
+
+    # Web 服务子进程通过环境变量继承回放模式和 LLM 地址
+    workdir = replay_environment(args.fixtures, "5")
+    llm_port = _free_port()
+    llm = stub_llm.start_subprocess(llm_port, [
+        "--ttft-ms", str(args.llm_ttft_ms), "--tps", str(args.llm_tps), "--answer-tokens", "20",
+    ])
+    os.environ["ZHIPU_BASE_URL"] = f"http://127.0.0.1:{llm_port}/v1/"
+    os.environ["ZHIPU_API_KEY"] = "bench"
+    os.environ.pop("MCP_TRANSPORT", None)
+
+    results: dict[str, dict[str, Any]] = {}
+    try:
+        for workers in args.workers:
+            print(f"\n▶ {workers} 个 worker", flush=True)
+            for key, stats in bench(workers, args.requests, args.concurrency, workdir).items():
+                results[key] = stats
+                print(
+                    f"  {key:<28} {stats.get('throughput_rps') or 0:>8.1f} req/s"
+                    f"  p50 {stats.get('p50_ms', 0):>8.1f}ms  p95 {stats.get('p95_ms', 0):>8.1f}ms"
+                    f"  缓存命中 {stats['cache_hit_rate']:>6.1%}  错误 {stats['errors']}",
+                    flush=True,
+                )
+    finally:
+        llm.terminate()
+        llm.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = write_report(results, {
+        "fixtures": "recorded" if args.fixtures else "synthetic",
+        "cpu_count": os.cpu_count(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "llm_ttft_ms": args.llm_ttft_ms,
+        "llm_tps": args.llm_tps,
+    }, args.output, prefix="workers")
+
+    if args.compare:
+        compare(args.compare, report, metrics=("p50_ms", "p95_ms", "throughput_rps"))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
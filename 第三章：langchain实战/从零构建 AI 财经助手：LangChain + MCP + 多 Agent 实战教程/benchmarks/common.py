@@ -0,0 +1,112 @@
+"""
+基准测试的公共部分：回放环境、延迟统计、结果文件和对比
+"""
+
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+RESULTS_DIR = PROJECT_ROOT / ".data" / "bench"
+
+
+def replay_environment(fixtures: str | None, latency: str) -> Path:
+    """切换到离线回放模式，返回由调用方负责删除的临时工作目录
+
+    必须在导入项目模块之前调用：数据源和行情库在导入时读取这些环境变量。
+    没有指定 fixtures 时生成合成回放数据。
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="finance-bench-"))
+    fixture_dir = fixtures or str(workdir / "fixtures")
+    os.environ["FINANCE_DATA_MODE"] = "replay"
+    os.environ["FINANCE_FIXTURE_DIR"] = fixture_dir
+    os.environ["FINANCE_REPLAY_LATENCY_MS"] = latency
+    os.environ["PRICE_STORE_DIR"] = str(workdir / "prices")
+
+    if not fixtures:
+        from benchmarks import fixtures as synthetic
+
+        print(f"生成合成回放数据: {synthetic.generate(fixture_dir)} 条")
+    return workdir
+
+
+def latency_stats(seconds: list[float], wall: float) -> dict[str, Any]:
+    """延迟分位数和吞吐量"""
+    ms = np.asarray(seconds) * 1000
+    return {
+        "n": len(seconds),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "throughput_rps": round(len(seconds) / wall, 2) if wall > 0 else None,
+    }
+
+
+def write_report(
+    results: dict[str, dict[str, Any]],
+    settings: dict[str, Any],
+    output: str | None,
+    prefix: str,
+) -> dict[str, Any]:
+    """写入结果文件（默认 .data/bench/<prefix>-<时间>.json），返回报告内容"""
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            **settings,
+        },
+        "results": results,
+    }
+    path = Path(output) if output else RESULTS_DIR / f"{prefix}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n结果已写入 {path}")
+    return report
+
+
+def compare(
+    baseline_path: str,
+    current: dict[str, Any],
+    metrics: tuple[str, ...] = ("p50_ms", "p95_ms", "throughput_rps"),
+) -> None:
+    """打印与基线结果的对比（延迟、字节数和 token 数越低越好，吞吐越高越好）"""
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+
+    def delta(old, new):
+        if not old or new is None:
+            return "     -"
+        return f"{(new - old) / old * 100:+6.1f}%"
+
+    def cell(b, c, metric):
+        old, new = b.get(metric), c.get(metric)
+        if old is None or new is None:
+            return f"{'-':>20}"
+        return f"{old:>8.2f}→{new:<8.2f}{delta(old, new)}"
+
+    base, cur = baseline["results"], current["results"]
+    print(f"\n对比基线 {baseline['meta'].get('commit')} -> {current['meta'].get('commit')}")
+    print(f"{'case':<56} " + " ".join(f"{metric:>20}" for metric in metrics))
+    for key in sorted(set(base) & set(cur)):
+        print(f"{key:<56} " + " ".join(cell(base[key], cur[key], metric) for metric in metrics))
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=10,
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
@@ -0,0 +1,196 @@
+"""
+合成回放数据
+按股票代码生成确定性的 info / 新闻 / 评级 / 财务报表 / 历史 K 线和搜索结果，
+结构与 yfinance、DuckDuckGo 的返回值一致，没有录制数据时也能离线压测
+"""
+
+import hashlib
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from core.provider import DataProvider
+
+TICKERS = ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "META", "TSLA", "600519.SS", "0700.HK", "^GSPC"]
+
+SEARCH_QUERIES = ["苹果公司财报", "A股市场行情", "美联储 利率 决议"]
+
+HISTORY_YEARS = 3
+
+_INCOME_ITEMS = [
+    "Total Revenue", "Cost Of Revenue", "Gross Profit", "Operating Expense", "Operating Income",
+    "Research And Development", "Selling General And Administration", "Interest Expense",
+    "Pretax Income", "Tax Provision", "Net Income", "Basic EPS", "Diluted EPS", "EBITDA", "EBIT",
+]
+_BALANCE_ITEMS = [
+    "Total Assets", "Current Assets", "Cash And Cash Equivalents", "Inventory", "Receivables",
+    "Total Liabilities Net Minority Interest", "Current Liabilities", "Long Term Debt",
+    "Stockholders Equity", "Retained Earnings", "Working Capital", "Total Debt", "Net Debt",
+]
+_CASHFLOW_ITEMS = [
+    "Operating Cash Flow", "Investing Cash Flow", "Financing Cash Flow", "Free Cash Flow",
+    "Capital Expenditure", "Depreciation And Amortization", "Stock Based Compensation",
+    "Repurchase Of Capital Stock", "Cash Dividends Paid", "Changes In Cash",
+]
+
+
+def _rng(*parts) -> np.random.Generator:
+    seed = int(hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:8], 16)
+    return np.random.default_rng(seed)
+
+
+def _timezone(symbol: str) -> str:
+    if symbol.endswith((".SS", ".SZ")):
+        return "Asia/Shanghai"
+    if symbol.endswith(".HK"):
+        return "Asia/Hong_Kong"
+    return "America/New_York"
+
+
+def make_history(symbol: str, today: pd.Timestamp | None = None) -> pd.DataFrame:
+    """几何随机游走生成的日 K 线，截止到今天"""
+    tz = _timezone(symbol)
+    today = today or pd.Timestamp.now(tz=tz).normalize()
+    index = pd.bdate_range(end=today.tz_localize(None), periods=HISTORY_YEARS * 252, name="Date").tz_localize(tz)
+    rng = _rng("history", symbol)
+    returns = rng.normal(0.0004, 0.018, len(index))
+    close = 100 * np.exp(np.cumsum(returns))
+    spread = np.abs(rng.normal(0, 0.01, len(index))) * close
+    open_ = close * (1 + rng.normal(0, 0.005, len(index)))
+    return pd.DataFrame({
+        "Open": open_,
+        "High": np.maximum(open_, close) + spread,
+        "Low": np.minimum(open_, close) - spread,
+        "Close": close,
+        "Volume": rng.integers(1_000_000, 50_000_000, len(index)).astype(float),
+        "Dividends": 0.0,
+        "Stock Splits": 0.0,
+    }, index=index)
+
+
+def make_info(symbol: str, last_close: float) -> dict:
+    rng = _rng("info", symbol)
+    now = datetime.now(timezone.utc)
+    fiscal_year_end = datetime(now.year - 1, 12, 31, tzinfo=timezone.utc)
+    quarter_month = (now.month - 1) // 3 * 3 or 12
+    quarter_year = now.year if quarter_month != 12 else now.year - 1
+    recent_quarter = (pd.Timestamp(quarter_year, quarter_month, 1, tz="UTC") + pd.offsets.MonthEnd(0))
+    revenue = float(rng.uniform(5e10, 4e11))
+    return {
+        "longName": f"{symbol} Holdings Inc.",
+        "shortName": f"{symbol} Inc.",
+        "currency": "CNY" if symbol.endswith((".SS", ".SZ")) else "HKD" if symbol.endswith(".HK") else "USD",
+        "currentPrice": round(last_close, 2),
+        "regularMarketPrice": round(last_close, 2),
+        "previousClose": round(last_close * 0.99, 2),
+        "open": round(last_close * 0.995, 2),
+        "dayHigh": round(last_close * 1.01, 2),
+        "dayLow": round(last_close * 0.985, 2),
+        "fiftyTwoWeekHigh": round(last_close * 1.3, 2),
+        "fiftyTwoWeekLow": round(last_close * 0.7, 2),
+        "marketCap": int(rng.uniform(1e11, 3e12)),
+        "trailingPE": float(rng.uniform(10, 60)),
+        "forwardPE": float(rng.uniform(10, 50)),
+        "trailingEps": float(rng.uniform(1, 20)),
+        "dividendYield": float(rng.uniform(0, 0.03)),
+        "beta": float(rng.uniform(0.6, 1.8)),
+        "totalRevenue": int(revenue),
+        "revenueGrowth": float(rng.uniform(-0.05, 0.3)),
+        "profitMargins": float(rng.uniform(0.05, 0.4)),
+        "industry": "Consumer Electronics",
+        "sector": "Technology",
+        "longBusinessSummary": f"{symbol} designs, manufactures and markets products worldwide. " * 8,
+        "recommendationKey": "buy",
+        "targetMeanPrice": round(last_close * 1.15, 2),
+        "targetHighPrice": round(last_close * 1.4, 2),
+        "targetLowPrice": round(last_close * 0.8, 2),
+        "numberOfAnalystOpinions": int(rng.integers(10, 50)),
+        "lastFiscalYearEnd": int(fiscal_year_end.timestamp()),
+        "mostRecentQuarter": int(recent_quarter.timestamp()),
+    }
+
+
+def make_statement(symbol: str, items: list[str], end: datetime, quarterly: bool) -> pd.DataFrame:
+    rng = _rng("statement", symbol, items[0], quarterly)
+    step = pd.DateOffset(months=3 if quarterly else 12)
+    columns = [pd.Timestamp(end.date()) - step * i for i in range(4)]
+    values = rng.uniform(-5e10, 3e11, (len(items), len(columns)))
+    values[rng.random(values.shape) < 0.05] = np.nan
+    return pd.DataFrame(values, index=items, columns=columns)
+
+
+def make_news(symbol: str) -> list[dict]:
+    return [
+        {
+            "id": f"{symbol}-{i}",
+            "content": {
+                "title": f"{symbol} 第 {i + 1} 条新闻：业绩与市场动态",
+                "provider": {"displayName": "Reuters"},
+                "canonicalUrl": {"url": f"https://example.com/{symbol}/{i}"},
+            },
+        }
+        for i in range(10)
+    ]
+
+
+def make_recommendations(symbol: str) -> pd.DataFrame:
+    rng = _rng("recommendations", symbol)
+    return pd.DataFrame({
+        "period": ["0m", "-1m", "-2m", "-3m"],
+        "strongBuy": rng.integers(0, 15, 4),
+        "buy": rng.integers(0, 25, 4),
+        "hold": rng.integers(0, 15, 4),
+        "sell": rng.integers(0, 5, 4),
+        "strongSell": rng.integers(0, 3, 4),
+    })
+
+
+def make_search(query: str, max_results: int) -> list[dict]:
+    return [
+        {
+            "title": f"{query} - 相关报道 {i + 1}",
+            "body": f"关于「{query}」的最新报道与分析。" * 10,
+            "href": f"https://example.com/search/{i}",
+        }
+        for i in range(max_results)
+    ]
+
+
+def generate(fixture_dir: str, tickers: list[str] = TICKERS, queries: list[str] = SEARCH_QUERIES) -> int:
+    """把合成数据写入 fixture_dir，返回写入的条目数"""
+    provider = DataProvider(mode="replay", fixture_dir=fixture_dir)
+    count = 0
+
+    def save(namespace, key, value):
+        nonlocal count
+        provider.save_fixture(namespace, key, value)
+        count += 1
+
+    for symbol in tickers:
+        hist = make_history(symbol)
+        info = make_info(symbol, float(hist["Close"].iloc[-1]))
+        save("history", (symbol, "1d"), hist)
+        save("ticker", (symbol, "info"), info)
+        save("ticker", (symbol, "news"), make_news(symbol))
+        save("ticker", (symbol, "recommendations"), make_recommendations(symbol))
+
+        year_end = datetime.fromtimestamp(info["lastFiscalYearEnd"], tz=timezone.utc)
+        quarter_end = datetime.fromtimestamp(info["mostRecentQuarter"], tz=timezone.utc)
+        for attr, items in (("financials", _INCOME_ITEMS), ("balance_sheet", _BALANCE_ITEMS), ("cashflow", _CASHFLOW_ITEMS)):
+            save("ticker", (symbol, attr), make_statement(symbol, items, year_end, quarterly=False))
+            save("ticker", (symbol, f"quarterly_{attr}"), make_statement(symbol, items, quarter_end, quarterly=True))
+
+    for query in queries:
+        for max_results in (5, 6, 10):
+            save("search", (query, max_results), make_search(query, max_results))
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="生成合成回放数据")
+    parser.add_argument("fixture_dir", help="输出目录（即 FINANCE_FIXTURE_DIR）")
+    args = parser.parse_args()
+    print(f"已写入 {generate(args.fixture_dir)} 条回放数据到 {args.fixture_dir}")
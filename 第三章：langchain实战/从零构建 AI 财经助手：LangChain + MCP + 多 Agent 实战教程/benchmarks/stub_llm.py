@@ -0,0 +1,424 @@
+"""
+本地 LLM 替身服务
+OpenAI 兼容的 /chat/completions 接口，不调用真实模型：按脚本返回工具调用和回答，按设定的速度输出。
+用于在一台机器上、不联网地压测整个服务（Web 服务、Agent 循环、MCP 工具），结果可重复，也不花 token 费用。
+
+- 支持流式（SSE，含 stream_options.include_usage 的用量块）和非流式
+- 工具调用按脚本（--plan）：对话中已完成几轮工具调用，就返回第几步的调用，步骤用完后返回回答；
+  请求中没有提供的工具会被跳过
+- 首字延迟（--ttft-ms）和输出速度（--tps，每秒 token 数）可调，可加随机抖动和按比例注入 503 错误
+- /stats 返回统计，/metrics 为 Prometheus 格式
+
+用法：
+    python -m benchmarks.stub_llm --port 9000 --ttft-ms 300 --tps 40
+    ZHIPU_BASE_URL=http://127.0.0.1:9000/v1/ make run
+
+脚本文件（JSON）示例：按顺序匹配第一条规则（正则匹配最后一条用户消息），都不匹配时用默认脚本
+（对问题中的每只股票调用一次 get_stock_info）。字符串中的 {ticker}、{tickers}、{query} 会被替换：
+
+    {
+      "rules": [
+        {
+          "match": "新闻|消息",
+          "steps": [[{"name": "get_stock_news", "arguments": {"ticker": "{ticker}"}}]],
+          "answer": "{ticker} 最近的新闻摘要……"
+        }
+      ]
+    }
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncGenerator
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from api.semantic_cache import analyze
+from core.metrics import CONTENT_TYPE, Registry
+
+# 默认脚本中最多调用几只股票、没有识别到股票时用的代码
+MAX_DEFAULT_TICKERS = 3
+DEFAULT_TICKER = "AAPL"
+
+FILLER = "根据工具返回的数据，{ticker} 的最新行情、估值和市场情绪均已汇总如上，以下是逐项分析与风险提示。"
+
+
+class StubConfig:
+    """替身服务的行为设置
+
+    Args:
+        ttft_ms: 收到请求到输出第一个 token 的时间（毫秒）
+        tps: 每秒输出的 token 数（0 为不限速）
+        chars_per_token: 每个 token 的字符数（中文约 1~2 个字一个 token）
+        answer_tokens: 脚本没有指定回答时，生成的回答长度（token）
+        jitter: 延迟的随机抖动比例（0.2 即 ±20%）
+        error_rate: 返回 503 的请求比例
+        plan: 工具调用脚本（见模块说明）
+        seed: 随机数种子
+    """
+
+    def __init__(
+        self,
+        ttft_ms: float = 300,
+        tps: float = 50,
+        chars_per_token: int = 2,
+        answer_tokens: int = 200,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        plan: dict[str, Any] | None = None,
+        seed: int | None = None,
+    ):
+        self.ttft = ttft_ms / 1000
+        self.tps = tps
+        self.chars_per_token = max(1, chars_per_token)
+        self.answer_tokens = answer_tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rules = [
+            {**rule, "pattern": re.compile(rule.get("match", ""), re.IGNORECASE)}
+            for rule in (plan or {}).get("rules", [])
+        ]
+        self.random = random.Random(seed)
+
+    def jittered(self, seconds: float) -> float:
+        if not self.jitter:
+            return seconds
+        return max(0.0, seconds * self.random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+# ============================================================
+# 脚本
+# ============================================================
+
+
+def plan_turn(config: StubConfig, body: dict[str, Any]) -> tuple[list[dict[str, Any]], str]:
+    """决定本轮的输出：返回 (工具调用列表, 回答文本)，有工具调用时回答为空"""
+    messages = body.get("messages", [])
+    question, rounds = _conversation(messages)
+    entities, _ = analyze(question)
+    tickers = sorted(entity for entity in entities if any(c.isalpha() for c in entity)) or [DEFAULT_TICKER]
+    fields = {"ticker": tickers[0], "tickers": ",".join(tickers), "query": question}
+
+    rule = next((rule for rule in config.rules if rule["pattern"].search(question)), None)
+    if rule is not None:
+        steps = rule.get("steps", [])
+        answer = rule.get("answer")
+    else:
+        steps = [[{"name": "get_stock_info", "arguments": {"ticker": ticker}} for ticker in tickers[:MAX_DEFAULT_TICKERS]]]
+        answer = None
+
+    offered = {tool.get("function", {}).get("name") for tool in body.get("tools") or []}
+    # 请求中没有的工具跳过，整步都没有时顺延到下一步
+    runnable = [[call for call in step if call["name"] in offered] for step in steps]
+    runnable = [step for step in runnable if step]
+    if rounds < len(runnable):
+        calls = [
+            {"name": call["name"], "arguments": _fill(call.get("arguments", {}), fields)}
+            for call in runnable[rounds]
+        ]
+        return calls, ""
+
+    if answer is None:
+        sentence = FILLER.format(**fields)
+        length = config.answer_tokens * config.chars_per_token
+        answer = (sentence * (length // len(sentence) + 1))[:length]
+    return [], _fill(answer, fields)
+
+
+def _conversation(messages: list[dict[str, Any]]) -> tuple[str, int]:
+    """最后一条用户消息，以及它之后已经完成的工具调用轮数"""
+    question, rounds = "", 0
+    for message in messages:
+        if message.get("role") == "user":
+            content = message.get("content") or ""
+            if isinstance(content, list):
+                content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+            question, rounds = content, 0
+        elif message.get("role") == "assistant" and message.get("tool_calls"):
+            rounds += 1
+    return question, rounds
+
+
+def _fill(value: Any, fields: dict[str, str]) -> Any:
+    """替换字符串中的 {ticker} 等占位符（递归处理字典和列表，不认识的占位符保留原样）"""
+    if isinstance(value, str):
+        return re.sub(r"\{(\w+)\}", lambda m: fields.get(m[1], m[0]), value)
+    if isinstance(value, dict):
+        return {key: _fill(item, fields) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, fields) for item in value]
+    return value
+
+
+def _pieces(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def _prompt_tokens(body: dict[str, Any], chars_per_token: int) -> int:
+    chars = sum(len(json.dumps(message.get("content") or "", ensure_ascii=False)) for message in body.get("messages", []))
+    chars += len(json.dumps(body.get("tools") or [], ensure_ascii=False))
+    return max(1, chars // chars_per_token)
+
+
+# ============================================================
+# 服务
+# ============================================================
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="LLM 替身服务", docs_url=None, redoc_url=None)
+    registry = Registry()
+    requests = registry.counter("stub_llm_requests_total", "请求数", ("stream", "result"))
+    in_flight = registry.gauge("stub_llm_requests_in_flight", "正在输出的请求数")
+    tokens = registry.counter("stub_llm_tokens_total", "token 数", ("type",))
+    ttft = registry.histogram("stub_llm_time_to_first_token_seconds", "实际的首字延迟")
+    duration = registry.histogram("stub_llm_request_duration_seconds", "请求耗时")
+    stats = {"requests": 0, "tool_call_turns": 0, "answer_turns": 0, "errors_injected": 0,
+             "prompt_tokens": 0, "completion_tokens": 0, "in_flight": 0}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+    @app.get("/{prefix:path}models")
+    async def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+    @app.post("/{prefix:path}chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stream = bool(body.get("stream"))
+        stats["requests"] += 1
+        if config.error_rate and config.random.random() < config.error_rate:
+            stats["errors_injected"] += 1
+            requests.inc(stream=str(stream).lower(), result="error")
+            return JSONResponse(
+                {"error": {"message": "stub: injected error", "type": "server_error"}}, status_code=503,
+            )
+
+        calls, answer = plan_turn(config, body)
+        stats["tool_call_turns" if calls else "answer_turns"] += 1
+        requests.inc(stream=str(stream).lower(), result="tool_calls" if calls else "answer")
+        prompt_tokens = _prompt_tokens(body, config.chars_per_token)
+        turn = Turn(config, body.get("model", "stub"), calls, answer, prompt_tokens)
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += turn.completion_tokens
+        tokens.inc(prompt_tokens, type="prompt")
+        tokens.inc(turn.completion_tokens, type="completion")
+
+        def observe(first_token: float, finished: float) -> None:
+            ttft.observe(first_token)
+            duration.observe(finished)
+
+        async def tracked(generator: AsyncGenerator[bytes, None]) -> AsyncGenerator[bytes, None]:
+            stats["in_flight"] += 1
+            in_flight.inc()
+            try:
+                async for chunk in generator:
+                    yield chunk
+            finally:
+                stats["in_flight"] -= 1
+                in_flight.dec()
+
+        if stream:
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(tracked(turn.stream(include_usage, observe)), media_type="text/event-stream")
+
+        stats["in_flight"] += 1
+        in_flight.inc()
+        try:
+            return await turn.complete(observe)
+        finally:
+            stats["in_flight"] -= 1
+            in_flight.dec()
+
+    return app
+
+
+class Turn:
+    """一次补全：按 token 切分输出内容，按设定的速度流式或一次性返回"""
+
+    def __init__(self, config: StubConfig, model: str, calls: list[dict[str, Any]], answer: str, prompt_tokens: int):
+        self.config = config
+        self.model = model
+        self.id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        self.created = int(time.time())
+        self.answer = answer
+        self.prompt_tokens = prompt_tokens
+        size = config.chars_per_token
+        self.calls = [
+            {
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "name": call["name"],
+                "arguments": json.dumps(call["arguments"], ensure_ascii=False),
+            }
+            for call in calls
+        ]
+        # 输出顺序：每个工具调用的参数逐 token 输出，或回答文本逐 token 输出
+        self.pieces: list[tuple[int | None, str]] = (
+            [(index, piece) for index, call in enumerate(self.calls) for piece in _pieces(call["arguments"], size)]
+            if self.calls else [(None, piece) for piece in _pieces(answer, size)]
+        )
+        self.completion_tokens = len(self.pieces)
+        self.finish_reason = "tool_calls" if self.calls else "stop"
+
+    def usage(self) -> dict[str, int]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+        }
+
+    async def complete(self, observe) -> JSONResponse:
+        """非流式：等待首字延迟加全部 token 的输出时间后一次返回"""
+        started = time.perf_counter()
+        ttft = self.config.jittered(self.config.ttft)
+        generation = self.completion_tokens / self.config.tps if self.config.tps > 0 else 0.0
+        await asyncio.sleep(ttft + self.config.jittered(generation))
+        message: dict[str, Any] = {"role": "assistant", "content": self.answer or None}
+        if self.calls:
+            message["tool_calls"] = [
+                {"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": call["arguments"]}}
+                for call in self.calls
+            ]
+        observe(ttft, time.perf_counter() - started)
+        return JSONResponse({
+            "id": self.id,
+            "object": "chat.completion",
+            "created": self.created,
+            "model": self.model,
+            "choices": [{"index": 0, "message": message, "finish_reason": self.finish_reason}],
+            "usage": self.usage(),
+        })
+
+    async def stream(self, include_usage: bool, observe) -> AsyncGenerator[bytes, None]:
+        """流式：首字延迟后按 tps 逐 token 输出；落后于计划时连续输出，不累积误差"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.sleep(self.config.jittered(self.config.ttft))
+        first_token = loop.time() - started
+        yield self._chunk({"role": "assistant", "content": ""})
+
+        interval = 1 / self.config.tps if self.config.tps > 0 else 0.0
+        next_at = loop.time()
+        announced: set[int] = set()
+        for index, piece in self.pieces:
+            if interval:
+                next_at += self.config.jittered(interval)
+                delay = next_at - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            if index is None:
+                yield self._chunk({"content": piece})
+                continue
+            call = self.calls[index]
+            tool_delta: dict[str, Any] = {"index": index, "function": {"arguments": piece}}
+            if index not in announced:
+                # 每个工具调用的第一个分片带上 id 和名称
+                announced.add(index)
+                tool_delta.update(id=call["id"], type="function")
+                tool_delta["function"]["name"] = call["name"]
+            yield self._chunk({"tool_calls": [tool_delta]})
+
+        yield self._chunk({}, finish_reason=self.finish_reason)
+        if include_usage:
+            yield self._data({
+                "id": self.id, "object": "chat.completion.chunk", "created": self.created,
+                "model": self.model, "choices": [], "usage": self.usage(),
+            })
+        yield b"data: [DONE]\n\n"
+        observe(first_token, loop.time() - started)
+
+    def _chunk(self, delta: dict[str, Any], finish_reason: str | None = None) -> bytes:
+        return self._data({
+            "id": self.id,
+            "object": "chat.completion.chunk",
+            "created": self.created,
+            "model": self.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        })
+
+    @staticmethod
+    def _data(payload: dict[str, Any]) -> bytes:
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode()
+
+
+# ============================================================
+# 在子进程中运行（基准测试用）
+# ============================================================
+
+
+def start_subprocess(port: int, args: list[str] | None = None, timeout: float = 30) -> subprocess.Popen:
+    """在子进程中启动替身服务（与被测服务分开占用 CPU），可用后返回"""
+    import httpx
+
+    from benchmarks.common import PROJECT_ROOT
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_llm", "--port", str(port), *(args or [])],
+        cwd=PROJECT_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        if process.poll() is not None:
+            raise RuntimeError("LLM 替身服务启动失败")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError(f"LLM 替身服务 {timeout:g} 秒内未就绪")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容 LLM 替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--ttft-ms", type=float, default=300, help="首字延迟（毫秒）")
+    parser.add_argument("--tps", type=float, default=50, help="每秒输出的 token 数，0 为不限速")
+    parser.add_argument("--chars-per-token", type=int, default=2, help="每个 token 的字符数")
+    parser.add_argument("--answer-tokens", type=int, default=200, help="默认回答的长度（token）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机抖动比例，如 0.2")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的请求比例，如 0.01")
+    parser.add_argument("--plan", help="工具调用脚本（JSON 文件）")
+    parser.add_argument("--seed", type=int, help="随机数种子")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    config = StubConfig(
+        ttft_ms=args.ttft_ms,
+        tps=args.tps,
+        chars_per_token=args.chars_per_token,
+        answer_tokens=args.answer_tokens,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        plan=json.loads(Path(args.plan).read_text(encoding="utf-8")) if args.plan else None,
+        seed=args.seed,
+    )
+    print(f"🤖 LLM 替身服务: http://{args.host}:{args.port}/v1/（首字 {args.ttft_ms:g}ms，{args.tps:g} token/s）")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
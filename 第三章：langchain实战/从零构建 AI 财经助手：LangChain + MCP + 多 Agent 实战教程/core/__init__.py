@@ -0,0 +1,18 @@
+"""
+Core 模块 - 工具层共享的数据访问与基础设施
+
+包含：
+- cache: 进程级 TTL + LRU 缓存
+- market_data: 基于 yfinance 的统一取数入口（带缓存）
+- batch: 多只股票的批量并发取数
+- price_store: 本地增量 OHLCV 行情库
+- indicators: 向量化技术指标引擎
+- statements: 财务报表的列式转换
+- singleflight: 异步请求合并（相同调用共享一次执行）
+- executor: 工具调度器（并发上限、有界队列、超时放弃、运行统计）
+- provider: yfinance / DuckDuckGo 的统一入口（live / record / replay）
+- encoding: 工具结果编码（pretty / compact / table）与 token 统计
+- deadline: 截止时间与协作式取消令牌
+- lazy: 耗时依赖的延迟导入
+- metrics: 进程内指标（计数器 / 直方图）与 Prometheus 文本格式输出
+"""
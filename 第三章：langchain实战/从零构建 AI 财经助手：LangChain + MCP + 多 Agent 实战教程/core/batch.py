@@ -0,0 +1,104 @@
+"""
+批量并发取数引擎
+多只股票的数据通过有界线程池并发获取，按完成顺序逐个返回，
+单只股票失败只影响它自己那一行，不会拖垮整批请求
+"""
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterator
+
+from core import deadline, market_data
+from core.cache import market_cache
+from core.price_store import price_store
+
+# 取数专用线程池：限制对上游的总并发，避免触发限流
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "16"))
+_fetch_pool = ThreadPoolExecutor(max_workers=FETCH_MAX_WORKERS, thread_name_prefix="fetch")
+
+
+def unique_symbols(tickers: list[str]) -> list[str]:
+    """规范化并去重股票代码，保留原始顺序"""
+    symbols = [market_data.normalize_ticker(t) for t in tickers if t and t.strip()]
+    return list(dict.fromkeys(symbols))
+
+
+def iter_fetch(
+    tickers: list[str],
+    fetch: Callable[[str], Any],
+) -> Iterator[tuple[str, Any, Exception | None]]:
+    """并发执行 fetch(ticker)，按完成顺序产出 (股票代码, 结果, 异常)
+
+    Args:
+        tickers: 股票代码列表
+        fetch: 单只股票的取数函数，如 market_data.get_info
+
+    Yields:
+        (symbol, result, None) 或 (symbol, None, error)
+
+    Raises:
+        deadline.Cancelled: 当前请求已取消或超时，尚未开始的任务随之取消
+    """
+    # 取数线程继承调用方的上下文（取消令牌），请求取消后不再访问上游
+    futures = {
+        _fetch_pool.submit(contextvars.copy_context().run, fetch, symbol): symbol
+        for symbol in unique_symbols(tickers)
+    }
+    try:
+        for future in as_completed(futures, timeout=deadline.remaining()):
+            deadline.check()
+            symbol = futures[future]
+            try:
+                result = future.result()
+            except deadline.Cancelled:
+                # 取数线程先发现令牌已取消：整批取消，不当作这一只股票的错误
+                raise
+            except Exception as e:
+                yield symbol, None, e
+            else:
+                yield symbol, result, None
+    except TimeoutError:
+        raise deadline.Cancelled("已超过截止时间") from None
+    finally:
+        # 调用方提前退出时，取消尚未开始的任务
+        for future in futures:
+            future.cancel()
+
+
+def iter_infos(tickers: list[str]) -> Iterator[tuple[str, dict[str, Any] | None, Exception | None]]:
+    """并发获取多只股票的 info，按完成顺序产出"""
+    return iter_fetch(tickers, market_data.get_info)
+
+
+def get_histories(tickers: list[str], period: str = "1mo") -> dict[str, Any]:
+    """批量获取多只股票的历史价格
+
+    已缓存的直接复用，其余由本地行情库（core.price_store）批量补齐：
+    需要下载的股票用 yf.download 一次性下载并写入行情库，再按 period 切片写回缓存，
+    与单只查询（market_data.get_history）使用同一份数据和同一个缓存键。
+
+    Returns:
+        股票代码 -> DataFrame，无数据的股票不在结果中
+
+    Raises:
+        批量下载失败时抛出原始异常
+    """
+    symbols = unique_symbols(tickers)
+    result = {}
+    missing = []
+    for symbol in symbols:
+        cached = market_cache.get("history", (symbol, period))
+        if cached is not None:
+            result[symbol] = cached
+        else:
+            missing.append(symbol)
+
+    if missing:
+        for symbol, hist in price_store.histories(missing, period).items():
+            if hist.empty:
+                continue
+            market_cache.set("history", (symbol, period), hist)
+            result[symbol] = hist
+
+    return result
@@ -0,0 +1,157 @@
+"""
+进程级 TTL 缓存
+按 (数据类型, 键) 缓存上游数据：每种数据类型有独立的过期时间，
+超出容量时按 LRU 淘汰，并分类型统计命中 / 未命中 / 实际加载次数
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+# 各类数据的默认过期时间（秒）
+DEFAULT_TTLS = {
+    "info": 300,                        # 行情快照 / 基本面
+    "history": 600,                     # 历史价格
+    "statements": 120 * 24 * 3600,      # 财务报表：缓存键含报告期，新一期出现即失效
+    "news": 600,                        # 个股新闻
+    "recommendations": 3600,            # 分析师评级
+}
+
+_MISSING = object()
+
+
+class TTLCache:
+    """线程安全的 TTL + LRU 缓存
+
+    同一个键的并发加载只会触发一次上游请求，其余调用方等待并复用结果。
+
+    Args:
+        ttls: 数据类型 -> 过期时间（秒），未列出的类型使用 default_ttl
+        maxsize: 最大条目数，超出后淘汰最久未使用的条目
+        default_ttl: 默认过期时间（秒）
+    """
+
+    def __init__(
+        self,
+        ttls: dict[str, float] | None = None,
+        maxsize: int = 1024,
+        default_ttl: float = 300,
+    ):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self._data: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple, threading.Lock] = {}
+        self._stats: dict[str, dict[str, int]] = {}
+
+    # ========================================
+    # 读写
+    # ========================================
+
+    def get(self, kind: str, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，过期或不存在时返回 default"""
+        value = self._lookup(kind, key)
+        return default if value is _MISSING else value
+
+    def set(self, kind: str, key: Hashable, value: Any) -> None:
+        """写入缓存"""
+        expires_at = time.monotonic() + self.ttls.get(kind, self.default_ttl)
+        with self._lock:
+            full_key = (kind, key)
+            self._data[full_key] = (expires_at, value)
+            self._data.move_to_end(full_key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, kind: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """读取缓存，未命中时调用 loader 加载并写入
+
+        同一个键同时只有一个线程执行 loader；loader 抛出的异常不会被缓存。
+        """
+        value = self._lookup(kind, key)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault((kind, key), threading.Lock())
+
+        with key_lock:
+            # 等锁期间可能已被其他线程加载
+            value = self._peek(kind, key)
+            if value is not _MISSING:
+                return value
+            self._count(kind, "loads")
+            try:
+                value = loader()
+                self.set(kind, key, value)
+                return value
+            finally:
+                with self._lock:
+                    self._key_locks.pop((kind, key), None)
+
+    def invalidate(self, kind: str | None = None, key: Hashable = _MISSING) -> None:
+        """清除缓存：不传参数清空全部，只传 kind 清除该类型，同时传 key 清除单个条目"""
+        with self._lock:
+            if kind is None:
+                self._data.clear()
+            elif key is not _MISSING:
+                self._data.pop((kind, key), None)
+            else:
+                for full_key in [k for k in self._data if k[0] == kind]:
+                    del self._data[full_key]
+
+    # ========================================
+    # 统计
+    # ========================================
+
+    def stats(self) -> dict[str, Any]:
+        """返回各数据类型的命中统计（loads 为实际触发上游请求的次数）"""
+        with self._lock:
+            by_kind = {}
+            for kind, counter in self._stats.items():
+                total = counter["hits"] + counter["misses"]
+                by_kind[kind] = {
+                    **counter,
+                    "hit_rate": round(counter["hits"] / total, 4) if total else 0.0,
+                }
+            return {"size": len(self._data), "maxsize": self.maxsize, "kinds": by_kind}
+
+    def reset_stats(self) -> None:
+        """清零命中统计"""
+        with self._lock:
+            self._stats.clear()
+
+    # ========================================
+    # 内部方法
+    # ========================================
+
+    def _lookup(self, kind: str, key: Hashable) -> Any:
+        """查找并计入命中统计"""
+        value = self._peek(kind, key)
+        self._count(kind, "misses" if value is _MISSING else "hits")
+        return value
+
+    def _count(self, kind: str, field: str) -> None:
+        with self._lock:
+            counter = self._stats.setdefault(kind, {"hits": 0, "misses": 0, "loads": 0})
+            counter[field] += 1
+
+    def _peek(self, kind: str, key: Hashable) -> Any:
+        """查找但不计入统计，顺带清理过期条目"""
+        full_key = (kind, key)
+        with self._lock:
+            entry = self._data.get(full_key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[full_key]
+                return _MISSING
+            self._data.move_to_end(full_key)
+            return value
+
+
+# 进程级共享缓存：同一进程内的所有工具、Agent 和 API 请求共用
+market_cache = TTLCache()
@@ -0,0 +1,161 @@
+"""
+截止时间与协作式取消
+一次请求从 API 入口开始携带一个 CancelToken（保存在 contextvar 中），
+经过 Agent、MCP 调用（_meta.deadline_ms 与 notifications/cancelled）传到调度器和工具实现。
+线程池通过 contextvars.copy_context 继承当前令牌，取数代码在访问上游前检查，
+令牌被取消或超过截止时间时抛出 Cancelled，线程尽快结束并释放。
+"""
+
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+
+class Cancelled(Exception):
+    """请求已取消或已超过截止时间"""
+
+
+class CancelToken:
+    """取消令牌：可以手动取消，也可以设置截止时间
+
+    子令牌的截止时间不晚于父令牌，父令牌取消时子令牌一并取消，
+    取消子令牌不影响父令牌。
+
+    Args:
+        timeout: 从现在起的剩余时间（秒），None 表示不限
+        parent: 父令牌
+    """
+
+    def __init__(self, timeout: float | None = None, parent: "CancelToken | None" = None):
+        deadlines = [time.monotonic() + timeout] if timeout is not None else []
+        if parent is not None and parent.deadline is not None:
+            deadlines.append(parent.deadline)
+        self.deadline = min(deadlines) if deadlines else None
+        self.reason: str | None = None
+        self._event = threading.Event()
+        self._children: weakref.WeakSet[CancelToken] = weakref.WeakSet()
+        self._lock = threading.Lock()
+        if parent is not None:
+            parent._adopt(self)
+
+    @property
+    def cancelled(self) -> bool:
+        """已被取消或已超过截止时间"""
+        return self._event.is_set() or self.expired
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def remaining(self) -> float | None:
+        """距截止时间的秒数，没有截止时间时返回 None"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str = "请求已取消") -> None:
+        """取消令牌及其所有子令牌，重复调用无效"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            children = list(self._children)
+        _count("cancelled")
+        for child in children:
+            child.cancel(reason)
+
+    def check(self) -> None:
+        """已取消或已超时时抛出 Cancelled"""
+        if self._event.is_set():
+            _count("aborted")
+            raise Cancelled(self.reason)
+        if self.expired:
+            _count("aborted")
+            raise Cancelled("已超过截止时间")
+
+    def sleep(self, seconds: float) -> None:
+        """可被取消打断的 sleep，被打断时抛出 Cancelled"""
+        remaining = self.remaining()
+        wait = seconds if remaining is None else min(seconds, remaining)
+        self._event.wait(wait)
+        if wait < seconds or self._event.is_set():
+            self.check()
+
+    def _adopt(self, child: "CancelToken") -> None:
+        with self._lock:
+            if not self._event.is_set():
+                self._children.add(child)
+                return
+        child.cancel(self.reason or "请求已取消")
+
+
+_current: ContextVar[CancelToken | None] = ContextVar("cancel_token", default=None)
+
+_lock = threading.Lock()
+_counts = {"cancelled": 0, "aborted": 0}
+
+
+def current() -> CancelToken | None:
+    """当前上下文的取消令牌"""
+    return _current.get()
+
+
+@contextmanager
+def scope(timeout: float | None = None) -> Iterator[CancelToken]:
+    """在当前令牌下创建子令牌并设为当前令牌，退出时恢复"""
+    token = CancelToken(timeout, parent=current())
+    with use(token):
+        yield token
+
+
+@contextmanager
+def use(token: CancelToken | None) -> Iterator[CancelToken | None]:
+    """把已有的令牌设为当前令牌，退出时恢复"""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def check() -> None:
+    """检查当前令牌，没有令牌时什么也不做"""
+    token = current()
+    if token is not None:
+        token.check()
+
+
+def remaining() -> float | None:
+    """当前令牌的剩余时间（秒），没有令牌或不限时返回 None"""
+    token = current()
+    return token.remaining() if token is not None else None
+
+
+def sleep(seconds: float) -> None:
+    """按当前令牌可被打断的 sleep"""
+    token = current()
+    if token is None:
+        time.sleep(seconds)
+    else:
+        token.sleep(seconds)
+
+
+def budget(default: float) -> float:
+    """default 与当前剩余时间中较小的一个，用作上游请求的超时"""
+    left = remaining()
+    return default if left is None else max(0.001, min(default, left))
+
+
+def stats() -> dict[str, Any]:
+    """被取消的令牌数，以及因取消或超时而中止的检查次数"""
+    with _lock:
+        return dict(_counts)
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _counts[name] += 1
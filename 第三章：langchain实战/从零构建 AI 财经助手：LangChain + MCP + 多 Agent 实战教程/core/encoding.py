@@ -0,0 +1,243 @@
+"""
+工具结果编码
+工具结果会作为 LLM 的输入，在 Agent 循环的每一步都重复占用上下文。
+TOOL_OUTPUT_FORMAT 选择编码方式：
+- pretty: 缩进 JSON、中文键、格式化字符串（默认，便于阅读）
+- compact: 无缩进 JSON，中文键换成稳定的英文短键，"3.21万亿"、"12.34%" 还原为数值，省略 N/A
+- table: 在 compact 的基础上，把字典列表（对比表、近期交易数据等）写成 CSV 文本
+"""
+
+import csv
+import io
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Any
+
+FORMATS = ("pretty", "compact", "table")
+
+TOOL_OUTPUT_FORMAT = os.getenv("TOOL_OUTPUT_FORMAT", "pretty")
+
+# 统计 token 使用的 tiktoken 编码
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+
+# 中文键 -> 英文短键，新增键时只追加，已有的映射保持不变
+KEY_MAP = {
+    "股票代码": "ticker",
+    "股票名称": "name",
+    "名称": "name",
+    "当前价格": "price",
+    "货币": "currency",
+    "前收盘价": "prev_close",
+    "开盘价": "open",
+    "日最高价": "day_high",
+    "日最低价": "day_low",
+    "52周最高": "high_52w",
+    "52周最低": "low_52w",
+    "52周涨跌": "change_52w",
+    "52周涨跌幅": "change_52w",
+    "52周涨幅": "change_52w",
+    "市值": "mcap",
+    "市盈率(TTM)": "pe_ttm",
+    "市盈率(前瞻)": "pe_fwd",
+    "市净率": "pb",
+    "每股收益(TTM)": "eps_ttm",
+    "每股收益": "eps",
+    "股息率": "div_yield",
+    "Beta": "beta",
+    "总营收": "revenue",
+    "营收增长": "rev_growth",
+    "利润率": "margin",
+    "负债率": "debt_ratio",
+    "行业": "industry",
+    "板块": "sector",
+    "公司简介": "about",
+    "基本信息": "basic",
+    "价格指标": "prices",
+    "估值指标": "valuation",
+    "财务指标": "financials",
+    "风险指标": "risk",
+    "汇总": "summary",
+    "查询周期": "period",
+    "数据起始": "start",
+    "数据截止": "end",
+    "起始价格": "start_price",
+    "最新价格": "last",
+    "平均价格": "avg_price",
+    "价格标准差": "price_std",
+    "期间涨跌": "change",
+    "期间最高": "period_high",
+    "期间最低": "period_low",
+    "平均成交量": "avg_volume",
+    "近期交易数据": "recent",
+    "日期": "date",
+    "收盘价": "close",
+    "最高价": "high",
+    "最低价": "low",
+    "成交量": "volume",
+    "标题": "title",
+    "摘要": "snippet",
+    "来源": "url",
+    "链接": "url",
+    "发布者": "publisher",
+    "推荐摘要": "consensus",
+    "推荐评级": "rating",
+    "目标均价": "target_mean",
+    "目标最高价": "target_high",
+    "目标最低价": "target_low",
+    "分析师数量": "analysts",
+    "最近推荐记录": "history",
+    "报表类型": "statement",
+    "报告频率": "freq",
+    "数据": "data",
+    "期间收益率": "return",
+    "年化波动率": "volatility",
+    "20日年化波动率": "volatility_20d",
+    "最大回撤": "max_drawdown",
+    "RSI(14)": "rsi14",
+    "ATR(14)": "atr14",
+    "ATR占比": "atr_ratio",
+    "基准": "benchmark",
+    "错误": "error",
+}
+
+# 这些键的值是代码或名称，即使形如数字也保持字符串
+_TEXT_KEYS = {"股票代码", "基准", "ticker", "symbol"}
+
+_MISSING_VALUES = ("N/A", "")
+
+_UNITS = {"万亿": 1e12, "亿": 1e8, "万": 1e4}
+
+_NUMBER = re.compile(r"^(-?(?:0|[1-9]\d*)(?:\.\d+)?)(万亿|亿|万|%)?$")
+
+
+def encode_result(result: Any, fmt: str | None = None) -> str:
+    """按 fmt（默认 TOOL_OUTPUT_FORMAT）把工具结果编码为文本"""
+    fmt = fmt or TOOL_OUTPUT_FORMAT
+    if fmt == "pretty":
+        return json.dumps(result, ensure_ascii=False, indent=2)
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的工具输出格式: {fmt}，请使用 {' / '.join(FORMATS)}")
+
+    value = compact_value(result)
+    if fmt == "table":
+        value = _tabulate(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def is_error_result(content: Any) -> bool:
+    """编码后的工具结果（文本或 MCP 文本块列表）是否为 {"success": false, ...} 形式的错误"""
+    content = getattr(content, "content", content)
+    if isinstance(content, list):
+        content = "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content)
+    # 各种编码下 success 都是第一个键，只看开头
+    head = str(content)[:32]
+    return '"success": false' in head or '"success":false' in head
+
+
+def compact_value(value: Any) -> Any:
+    """换成短键、还原数值并去掉缺失值
+
+    百分比还原为百分数数值（"12.34%" -> 12.34），键名加上 _pct 后缀；
+    "3.21万亿" 还原为 3210000000000。
+    """
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if item is None or (isinstance(item, str) and item in _MISSING_VALUES):
+                continue
+            short = KEY_MAP.get(key, key)
+            if key in _TEXT_KEYS or not isinstance(item, str):
+                result[short] = compact_value(item)
+                continue
+            number, is_pct = parse_number(item)
+            if number is None:
+                result[short] = item
+            elif is_pct:
+                result[f"{short}_pct"] = number
+            else:
+                result[short] = number
+        return result
+    if isinstance(value, list):
+        return [compact_value(item) for item in value]
+    return value
+
+
+def parse_number(text: str) -> tuple[int | float | None, bool]:
+    """把格式化后的数字还原为数值，返回 (数值, 是否百分比)，无法解析时数值为 None"""
+    match = _NUMBER.match(text.strip())
+    if not match:
+        return None, False
+    number, suffix = match.groups()
+    if suffix == "%":
+        return float(number), True
+    value = float(number) * _UNITS.get(suffix, 1)
+    if suffix or "." not in number:
+        # 带单位的数值精度只有两位小数，取整即可
+        return int(round(value)), False
+    return value, False
+
+
+def _tabulate(value: Any) -> Any:
+    """把字典列表写成 CSV 文本（首行为列名），其他结构原样递归"""
+    if isinstance(value, dict):
+        return {key: _tabulate(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) >= 2 and all(isinstance(item, dict) for item in value):
+            return to_csv(value)
+        return [_tabulate(item) for item in value]
+    return value
+
+
+def to_csv(rows: list[dict[str, Any]]) -> str:
+    """字典列表 -> CSV 文本，列为所有行键的并集，缺失的单元格留空"""
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(_cell(row.get(col)) for col in columns)
+    return buffer.getvalue().rstrip("\n")
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return value
+
+
+# ============================================================
+# token 统计
+# ============================================================
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    """tiktoken 编码器；未安装或无法加载编码文件（如离线环境）时返回 None"""
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        return None
+
+
+def tokenizer_name() -> str:
+    """count_tokens 实际使用的计数方式"""
+    return f"tiktoken:{TOKEN_ENCODING}" if _tokenizer() is not None else "estimate"
+
+
+def count_tokens(text: str) -> int:
+    """统计文本的 token 数
+
+    优先使用 tiktoken；不可用时按经验估算：每个中日韩字符约 1 个 token，
+    其余字符约 4 个 1 个 token。
+    """
+    encoder = _tokenizer()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    cjk = sum(1 for ch in text if "　" <= ch <= "鿿" or "＀" <= ch <= "￯")
+    return cjk + (len(text) - cjk + 3) // 4
@@ -0,0 +1,288 @@
+"""
+工具调度器
+在线程池中运行同步的工具函数，提供：
+- 全局并发上限与按工具的并发上限
+- 有界等待队列，排满时立即拒绝（背压），不再无限堆积
+- 超时后放弃仍在运行的线程并立即释放并发名额，放弃的线程数有上限
+- 遵守调用方的截止时间（core.deadline），超时或被取消时通知线程协作退出
+- 按工具统计排队深度、等待时间和运行时间
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from core import deadline
+
+
+class ToolRejected(Exception):
+    """调度器繁忙（队列已满或超时线程过多），调用未执行"""
+
+
+class ToolTimeout(Exception):
+    """调用超时，对应的线程已被放弃"""
+
+
+class _ToolStats:
+    """单个工具的运行统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.started = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.running = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    def snapshot(self) -> dict[str, Any]:
+        started = self.started
+        return {
+            "calls": self.calls,
+            "completed": self.completed,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "avg_wait_ms": round(self.wait_total / started * 1000, 2) if started else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 2),
+            "avg_run_ms": round(self.run_total / started * 1000, 2) if started else 0.0,
+            "max_run_ms": round(self.run_max * 1000, 2),
+            "wait_total_s": round(self.wait_total, 6),
+            "run_total_s": round(self.run_total, 6),
+        }
+
+
+class ToolScheduler:
+    """带并发限制、背压和超时放弃的工具调度器
+
+    Args:
+        pool_size: 同时运行的调用数上限
+        max_queue: 等待中的调用数上限，超过后新调用直接被拒绝
+        timeout: 单次调用超时时间（秒）
+        tool_limits: 工具名 -> 该工具的并发上限
+        max_abandoned: 超时后仍在运行、被放弃的线程数上限，达到后拒绝新调用
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 8,
+        max_queue: int = 64,
+        timeout: float = 30.0,
+        tool_limits: dict[str, int] | None = None,
+        max_abandoned: int | None = None,
+    ):
+        self.pool_size = pool_size
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.tool_limits = dict(tool_limits or {})
+        self.max_abandoned = pool_size if max_abandoned is None else max_abandoned
+        # 被放弃的线程仍占用线程，多留出 max_abandoned 个线程给正常调用
+        self._pool = ThreadPoolExecutor(
+            max_workers=pool_size + self.max_abandoned, thread_name_prefix="tool"
+        )
+        self._lock = threading.Lock()
+        self._abandoned = 0
+        self._queued = 0
+        self._stats: dict[str, _ToolStats] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._tool_slots: dict[str, asyncio.Semaphore] = {}
+
+    async def run(self, name: str, func: Callable[[], Any], timeout: float | None = None) -> Any:
+        """在线程池中执行 func 并返回结果
+
+        func 在当前取消令牌的子令牌下运行，超时时间取 timeout 与令牌剩余时间中较小的一个；
+        超时或调用方被取消时取消子令牌，func 中的 deadline.check() 随即抛出 Cancelled。
+
+        Raises:
+            ToolRejected: 队列已满或被放弃的线程过多
+            ToolTimeout: 排队或执行超时
+            deadline.Cancelled: 上级令牌已被取消
+        """
+        stats = self._stats.setdefault(name, _ToolStats())
+        stats.calls += 1
+        if self._queued >= self.max_queue:
+            stats.rejected += 1
+            raise ToolRejected(f"服务器繁忙：已有 {self._queued} 个请求在排队，请稍后重试")
+        if self._abandoned >= self.max_abandoned:
+            stats.rejected += 1
+            raise ToolRejected(f"服务器繁忙：{self._abandoned} 个超时任务仍未结束，请稍后重试")
+
+        slots, tool_slots = self._semaphores(name)
+        with deadline.scope() as token:
+            submitted = time.perf_counter()
+            await self._acquire(token, stats, tool_slots, slots)
+            # 排队期间其他调用可能已被放弃：放弃的线程达到上限后空闲线程不足 pool_size 个，
+            # 此时提交会在线程池内部排队（不计入排队统计，还消耗自己的超时），拿到名额后再检查一次
+            if self._abandoned >= self.max_abandoned:
+                for semaphore in (tool_slots, slots):
+                    if semaphore is not None:
+                        semaphore.release()
+                stats.rejected += 1
+                raise ToolRejected(f"服务器繁忙：{self._abandoned} 个超时任务仍未结束，请稍后重试")
+
+            started = time.perf_counter()
+            wait = started - submitted
+            stats.wait_total += wait
+            stats.wait_max = max(stats.wait_max, wait)
+            stats.started += 1
+            stats.running += 1
+
+            limit = self.timeout if timeout is None else timeout
+            if token.remaining() is not None:
+                limit = min(limit, token.remaining())
+            # 在子令牌的上下文中运行，线程里的 deadline.check() 看到的就是它
+            future = self._pool.submit(contextvars.copy_context().run, func)
+            try:
+                try:
+                    result = await asyncio.wait_for(
+                        asyncio.shield(asyncio.wrap_future(future)),
+                        timeout=limit,
+                    )
+                except asyncio.TimeoutError:
+                    if not future.done():
+                        raise ToolTimeout(f"执行超时（{limit:.3g}秒）") from None
+                    # 超时的同时恰好执行完（包括工具函数自身抛出的 TimeoutError）：以实际结果为准
+                    result = future.result()
+            except asyncio.CancelledError:
+                token.cancel("调用方已取消")
+                self._abandon(future)
+                stats.cancelled += 1
+                raise
+            except ToolTimeout:
+                token.cancel("执行超时")
+                self._abandon(future)
+                stats.timeouts += 1
+                raise
+            except deadline.Cancelled:
+                # 线程在检查点发现截止时间已到或上级已取消，自行退出
+                if token.expired:
+                    stats.timeouts += 1
+                    raise ToolTimeout(f"执行超时（{limit:.3g}秒）") from None
+                stats.cancelled += 1
+                raise
+            except Exception:
+                stats.errors += 1
+                raise
+            else:
+                stats.completed += 1
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                stats.run_total += elapsed
+                stats.run_max = max(stats.run_max, elapsed)
+                stats.running -= 1
+                for semaphore in (tool_slots, slots):
+                    if semaphore is not None:
+                        semaphore.release()
+
+    async def _acquire(
+        self, token: deadline.CancelToken, stats: _ToolStats, *semaphores: asyncio.Semaphore | None
+    ) -> None:
+        """按顺序占用名额，排队时间计入截止时间；失败时归还已占用的名额"""
+        self._queued += 1
+        stats.queued += 1
+        stats.max_queued = max(stats.max_queued, stats.queued)
+        acquired = []
+        try:
+            # 先占工具名额再占全局名额，等待工具名额时不占用全局并发
+            async with asyncio.timeout(token.remaining()):
+                for semaphore in semaphores:
+                    if semaphore is not None:
+                        await semaphore.acquire()
+                        acquired.append(semaphore)
+        except BaseException as e:
+            for semaphore in acquired:
+                semaphore.release()
+            if isinstance(e, TimeoutError):
+                stats.timeouts += 1
+                raise ToolTimeout("排队等待超过截止时间") from None
+            if isinstance(e, asyncio.CancelledError):
+                stats.cancelled += 1
+            raise
+        finally:
+            self._queued -= 1
+            stats.queued -= 1
+
+    def stats(self) -> dict[str, Any]:
+        """返回调度器整体状态和按工具的统计"""
+        return {
+            "pool_size": self.pool_size,
+            "max_queue": self.max_queue,
+            "queued": self._queued,
+            "abandoned": self._abandoned,
+            "tools": {name: s.snapshot() for name, s in self._stats.items()},
+        }
+
+    def _abandon(self, future) -> None:
+        """放弃仍在运行的线程：立即释放并发名额，线程结束后再归还放弃计数"""
+        if future.cancel() or future.done():
+            return
+        with self._lock:
+            self._abandoned += 1
+        future.add_done_callback(self._release_abandoned)
+
+    def _release_abandoned(self, _future) -> None:
+        with self._lock:
+            self._abandoned -= 1
+
+    def _semaphores(self, name: str) -> tuple[asyncio.Semaphore, asyncio.Semaphore | None]:
+        """信号量绑定事件循环，换了事件循环（如多次 asyncio.run）时重新创建"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.pool_size)
+            self._tool_slots = {}
+        limit = self.tool_limits.get(name)
+        if limit is None:
+            return self._slots, None
+        if name not in self._tool_slots:
+            self._tool_slots[name] = asyncio.Semaphore(limit)
+        return self._slots, self._tool_slots[name]
+
+
+def parse_tool_limits(spec: str) -> dict[str, int]:
+    """解析 "tool_a=2,tool_b=4" 形式的按工具并发上限"""
+    limits = {}
+    for item in spec.split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip() and value.strip().isdigit():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+def scheduler_from_env(default_tool_limits: dict[str, int] | None = None) -> ToolScheduler:
+    """按环境变量创建调度器
+
+    MCP_POOL_SIZE: 并发上限（默认 8）
+    MCP_QUEUE_SIZE: 等待队列上限（默认 64）
+    MCP_TOOL_TIMEOUT: 单次调用超时秒数（默认 30）
+    MCP_MAX_ABANDONED: 被放弃线程数上限（默认与 MCP_POOL_SIZE 相同）
+    MCP_TOOL_CONCURRENCY: 按工具的并发上限，如 "search_financial_news=2"，覆盖默认值
+    """
+    pool_size = int(os.getenv("MCP_POOL_SIZE", "8"))
+    max_abandoned = os.getenv("MCP_MAX_ABANDONED")
+    tool_limits = dict(default_tool_limits or {})
+    tool_limits.update(parse_tool_limits(os.getenv("MCP_TOOL_CONCURRENCY", "")))
+    return ToolScheduler(
+        pool_size=pool_size,
+        max_queue=int(os.getenv("MCP_QUEUE_SIZE", "64")),
+        timeout=float(os.getenv("MCP_TOOL_TIMEOUT", "30")),
+        tool_limits=tool_limits,
+        max_abandoned=int(max_abandoned) if max_abandoned else None,
+    )
@@ -0,0 +1,246 @@
+"""
+技术指标引擎
+多只股票按日期对齐成 (交易日 × 股票) 的二维数组，一次性向量化计算
+收益率、波动率、最大回撤、均线、RSI、ATR 和相对基准的 Beta
+"""
+
+from functools import partial
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from core import batch, market_data
+
+TRADING_DAYS = 252
+MA_WINDOWS = (5, 20, 60)
+
+
+# ============================================================
+# 向量化计算
+# ============================================================
+
+
+def compute_indicators(
+    close: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    volume: np.ndarray,
+    benchmark_close: np.ndarray | None = None,
+    vol_window: int = 20,
+    rsi_period: int = 14,
+    atr_period: int = 14,
+) -> dict[str, np.ndarray]:
+    """计算每只股票最新一期的技术指标
+
+    Args:
+        close / high / low / volume: 形状为 (T, N) 的数组，缺失值为 NaN
+        benchmark_close: 形状为 (T,) 的基准收盘价，与 close 按行对齐
+        vol_window: 滚动波动率窗口
+        rsi_period: RSI 周期
+        atr_period: ATR 周期
+
+    Returns:
+        指标名 -> 形状为 (N,) 的数组
+    """
+    close, high, low, volume = (np.asarray(a, dtype=float) for a in (close, high, low, volume))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = close[1:] / close[:-1] - 1
+        first = _first_valid(close)
+        last = _last_valid(close)
+
+        result = {
+            "last_close": last,
+            "period_return": last / first - 1,
+            "volatility": np.nanstd(returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS),
+            "rolling_volatility": _rolling_std(returns, vol_window) * np.sqrt(TRADING_DAYS),
+            "max_drawdown": np.nanmin(close / np.fmax.accumulate(_ffill(close), axis=0) - 1, axis=0),
+            "rsi": _rsi(close, rsi_period),
+            "atr": _atr(high, low, close, atr_period),
+            "avg_volume": np.nanmean(volume, axis=0),
+        }
+        for window in MA_WINDOWS:
+            result[f"ma{window}"] = _rolling_mean(close, window)
+        result["atr_pct"] = result["atr"] / last
+
+        if benchmark_close is not None:
+            bench = np.asarray(benchmark_close, dtype=float)
+            bench_returns = bench[1:] / bench[:-1] - 1
+            result["beta"] = _beta(returns, bench_returns)
+
+    return result
+
+
+def _ffill(x: np.ndarray) -> np.ndarray:
+    """按列前向填充 NaN"""
+    mask = np.isnan(x)
+    idx = np.where(~mask, np.arange(len(x))[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return x[idx, np.arange(x.shape[1])]
+
+
+def _first_valid(x: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(x)
+    rows = np.argmax(valid, axis=0)
+    return np.where(valid.any(axis=0), x[rows, np.arange(x.shape[1])], np.nan)
+
+
+def _last_valid(x: np.ndarray) -> np.ndarray:
+    return _first_valid(x[::-1])
+
+
+def _rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """最近 window 个值的均值，数据不足时为 NaN"""
+    if len(x) < window:
+        return np.full(x.shape[1], np.nan)
+    return np.nanmean(x[-window:], axis=0)
+
+
+def _rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    """最近 window 个值的样本标准差"""
+    if len(x) < window:
+        return np.full(x.shape[1], np.nan)
+    return np.nanstd(x[-window:], axis=0, ddof=1)
+
+
+def _wilder(x: np.ndarray, period: int) -> np.ndarray:
+    """Wilder 平滑（alpha = 1/period），沿时间轴递推、按股票向量化，返回最后一期的值"""
+    smoothed = np.full(x.shape[1], np.nan)
+    seen = np.zeros(x.shape[1], dtype=int)
+    for row in x:
+        valid = ~np.isnan(row)
+        seen += valid
+        warm = valid & (seen <= period)
+        # 前 period 个值用简单平均作为初值，之后递推
+        smoothed = np.where(warm, np.where(seen == 1, row, smoothed + (row - smoothed) / seen), smoothed)
+        steady = valid & (seen > period)
+        smoothed = np.where(steady, smoothed + (row - smoothed) / period, smoothed)
+    return np.where(seen >= period, smoothed, np.nan)
+
+
+def _rsi(close: np.ndarray, period: int) -> np.ndarray:
+    delta = np.diff(close, axis=0)
+    gain = _wilder(np.where(np.isnan(delta), np.nan, np.clip(delta, 0, None)), period)
+    loss = _wilder(np.where(np.isnan(delta), np.nan, np.clip(-delta, 0, None)), period)
+    rsi = 100 - 100 / (1 + gain / loss)
+    return np.where(loss == 0, 100.0, rsi)
+
+
+def _atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> np.ndarray:
+    prev_close = close[:-1]
+    true_range = np.fmax.reduce([
+        high[1:] - low[1:],
+        np.abs(high[1:] - prev_close),
+        np.abs(low[1:] - prev_close),
+    ])
+    return _wilder(true_range, period)
+
+
+def _beta(returns: np.ndarray, bench_returns: np.ndarray) -> np.ndarray:
+    """各股票收益率相对基准的 Beta，只使用两者都有数据的交易日"""
+    bench = np.broadcast_to(bench_returns[:, None], returns.shape)
+    mask = ~np.isnan(returns) & ~np.isnan(bench)
+    count = mask.sum(axis=0)
+    r = np.where(mask, returns, 0.0)
+    b = np.where(mask, bench, 0.0)
+    r_mean = r.sum(axis=0) / count
+    b_mean = b.sum(axis=0) / count
+    cov = np.where(mask, (r - r_mean) * (b - b_mean), 0.0).sum(axis=0)
+    var = np.where(mask, (b - b_mean) ** 2, 0.0).sum(axis=0)
+    return np.where(count > 2, cov / var, np.nan)
+
+
+# ============================================================
+# 取数 + 汇总
+# ============================================================
+
+
+def align_histories(histories: dict[str, pd.DataFrame], field: str) -> np.ndarray:
+    """把多只股票的某一列按日期外连接对齐，返回 (T, N) 数组"""
+    frame = pd.concat(
+        {symbol: _by_date(hist[field]) for symbol, hist in histories.items()},
+        axis=1,
+    ).sort_index()
+    return frame.to_numpy(dtype=float)
+
+
+def technical_summary(
+    tickers: list[str],
+    period: str = "6mo",
+    benchmark: str | None = "^GSPC",
+) -> list[dict[str, Any]]:
+    """获取多只股票的历史数据并计算技术指标，返回每只股票一行的汇总
+
+    Args:
+        tickers: 股票代码列表
+        period: 历史区间
+        benchmark: 计算 Beta 使用的基准指数，None 表示不计算
+    """
+    symbols = batch.unique_symbols(tickers)
+    wanted = symbols + ([market_data.normalize_ticker(benchmark)] if benchmark else [])
+
+    histories, errors = {}, {}
+    for symbol, hist, error in batch.iter_fetch(wanted, partial(market_data.get_history, period=period)):
+        if error is not None:
+            errors[symbol] = str(error)
+        elif hist is None or hist.empty:
+            errors[symbol] = f"未找到 {symbol} 的历史数据"
+        else:
+            histories[symbol] = hist
+
+    valid = [s for s in symbols if s in histories]
+    rows = {s: {"股票代码": s, "错误": errors.get(s, "无数据")} for s in symbols if s not in histories}
+    if valid:
+        bench_symbol = market_data.normalize_ticker(benchmark) if benchmark else None
+        bench_hist = histories.get(bench_symbol) if bench_symbol else None
+        frames = {s: histories[s] for s in valid}
+        if bench_hist is not None:
+            frames["__benchmark__"] = bench_hist
+
+        matrices = {field: align_histories(frames, field) for field in ("Close", "High", "Low", "Volume")}
+        bench_close = None
+        if bench_hist is not None:
+            bench_close = matrices["Close"][:, -1]
+            matrices = {field: m[:, :-1] for field, m in matrices.items()}
+
+        ind = compute_indicators(
+            matrices["Close"], matrices["High"], matrices["Low"], matrices["Volume"],
+            benchmark_close=bench_close,
+        )
+        for i, symbol in enumerate(valid):
+            rows[symbol] = {
+                "股票代码": symbol,
+                "查询周期": period,
+                "最新价格": _num(ind["last_close"][i]),
+                "期间收益率": _pct(ind["period_return"][i]),
+                "年化波动率": _pct(ind["volatility"][i]),
+                "20日年化波动率": _pct(ind["rolling_volatility"][i]),
+                "最大回撤": _pct(ind["max_drawdown"][i]),
+                "MA5": _num(ind["ma5"][i]),
+                "MA20": _num(ind["ma20"][i]),
+                "MA60": _num(ind["ma60"][i]),
+                "RSI(14)": _num(ind["rsi"][i]),
+                "ATR(14)": _num(ind["atr"][i]),
+                "ATR占比": _pct(ind["atr_pct"][i]),
+                "Beta": _num(ind["beta"][i]) if "beta" in ind else "N/A",
+                "基准": bench_symbol if "beta" in ind else "N/A",
+                "平均成交量": int(ind["avg_volume"][i]) if np.isfinite(ind["avg_volume"][i]) else "N/A",
+            }
+
+    return [rows[s] for s in symbols]
+
+
+def _by_date(series: pd.Series) -> pd.Series:
+    """不同市场的时间戳时区不同，统一按交易日期对齐"""
+    index = series.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    return pd.Series(series.to_numpy(), index=index.normalize())
+
+
+def _num(value, n=2):
+    return round(float(value), n) if np.isfinite(value) else "N/A"
+
+
+def _pct(value):
+    return f"{value * 100:.2f}%" if np.isfinite(value) else "N/A"
@@ -0,0 +1,43 @@
+"""
+延迟导入
+pandas、yfinance 等依赖导入耗时较长，服务启动时只需要工具定义，用不到它们。
+lazy_import 返回的模块在第一次访问属性时才真正执行导入，之后与普通导入完全相同。
+"""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """返回延迟加载的模块，已导入过的模块直接返回
+
+    Raises:
+        ModuleNotFoundError: 模块不存在（与普通 import 一样在导入处报错）
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    # 与普通导入一致：子模块同时作为父包的属性
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def preload(*names: str) -> None:
+    """真正导入这些模块（用于启动后在后台预热，避免第一次调用时才加载）"""
+    for name in names:
+        module = importlib.import_module(name)
+        # 访问一次属性，触发延迟模块的实际导入
+        getattr(module, "__name__")
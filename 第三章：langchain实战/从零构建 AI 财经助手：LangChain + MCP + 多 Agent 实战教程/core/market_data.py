@@ -0,0 +1,190 @@
+"""
+行情数据访问层
+所有基于 yfinance 的工具统一从这里取数（上游调用经过 core.provider），共享进程级缓存，
+同一问题里多次查询同一只股票只会触发一次上游请求
+"""
+
+from datetime import date, datetime, timezone
+from typing import Any
+
+from core import deadline
+from core.cache import market_cache
+from core.price_store import price_store
+from core.provider import data_provider
+
+# (报表类型, 是否季度) -> yfinance 属性名
+STATEMENT_ATTRS = {
+    ("income", False): "financials",
+    ("balance", False): "balance_sheet",
+    ("cashflow", False): "cashflow",
+    ("income", True): "quarterly_financials",
+    ("balance", True): "quarterly_balance_sheet",
+    ("cashflow", True): "quarterly_cashflow",
+}
+
+
+def normalize_ticker(ticker: str) -> str:
+    """统一股票代码格式，作为缓存键"""
+    return ticker.strip().upper()
+
+
+def get_info(ticker: str) -> dict[str, Any]:
+    """获取股票快照与基本面（stock.info）"""
+    symbol = normalize_ticker(ticker)
+    return market_cache.get_or_load("info", symbol, lambda: data_provider.ticker_attr(symbol, "info"))
+
+
+def get_history(ticker: str, period: str = "1mo"):
+    """获取历史价格，由本地增量行情库按 period 切片返回"""
+    symbol = normalize_ticker(ticker)
+    return market_cache.get_or_load(
+        "history", (symbol, period), lambda: price_store.history(symbol, period)
+    )
+
+
+def get_news(ticker: str) -> list[dict[str, Any]]:
+    """获取个股新闻（stock.news）"""
+    symbol = normalize_ticker(ticker)
+    return market_cache.get_or_load("news", symbol, lambda: data_provider.ticker_attr(symbol, "news"))
+
+
+def get_recommendations(ticker: str):
+    """获取分析师推荐记录（stock.recommendations）"""
+    symbol = normalize_ticker(ticker)
+    return market_cache.get_or_load(
+        "recommendations", symbol, lambda: data_provider.ticker_attr(symbol, "recommendations")
+    )
+
+
+def get_statement(ticker: str, statement_type: str, quarterly: bool = False):
+    """获取财务报表
+
+    缓存键包含最新报告期（来自 info 的 mostRecentQuarter / lastFiscalYearEnd），
+    只有出现新的报告期时才会重新拉取。报告期已变但新报表尚未披露时，只按天缓存。
+    同一张报表的并发冷请求共享一次上游拉取。
+
+    Args:
+        ticker: 股票代码
+        statement_type: income / balance / cashflow
+        quarterly: 是否获取季度报表
+    """
+    symbol = normalize_ticker(ticker)
+    attr = STATEMENT_ATTRS[(statement_type, quarterly)]
+    latest = latest_fiscal_period(symbol, quarterly)
+    period_key = (symbol, statement_type, quarterly, latest)
+    day_key = (symbol, statement_type, quarterly, f"day:{date.today().isoformat()}")
+
+    if latest is None:
+        return market_cache.get_or_load("statements", day_key, lambda: data_provider.ticker_attr(symbol, attr))
+
+    def load():
+        # 在报告期键的加载锁内执行：并发的冷请求只有一个拉取，其余等它写入后直接读取
+        df = market_cache.get("statements", day_key)
+        if df is None:
+            df = data_provider.ticker_attr(symbol, attr)
+            if _newest_period(df) >= latest:
+                return df
+            market_cache.set("statements", day_key, df)
+        # 新报表尚未披露：只按天缓存，不写入报告期的键
+        raise _StatementPending(df)
+
+    try:
+        return market_cache.get_or_load("statements", period_key, load)
+    except _StatementPending as pending:
+        return pending.df
+
+
+def latest_fiscal_period(ticker: str, quarterly: bool = False) -> str | None:
+    """最新报告期的截止日期（ISO 格式），取不到时返回 None"""
+    try:
+        info = get_info(ticker)
+    except deadline.Cancelled:
+        raise
+    except Exception:
+        return None
+    stamp = info.get("mostRecentQuarter" if quarterly else "lastFiscalYearEnd")
+    if not stamp:
+        return None
+    return datetime.fromtimestamp(stamp, tz=timezone.utc).date().isoformat()
+
+
+class _StatementPending(Exception):
+    """拉取到的报表还不含最新报告期（get_or_load 不缓存异常，借此跳过报告期的键）"""
+
+    def __init__(self, df):
+        super().__init__("statement pending")
+        self.df = df
+
+
+def _newest_period(df) -> str:
+    if df is None or df.empty:
+        return ""
+    return max(df.columns).date().isoformat()
+
+
+# ============================================================
+# 结果格式化（Agent 工具与 MCP 工具共用）
+# ============================================================
+
+# 近期交易数据的列 -> 输出字段名
+_RECENT_COLUMNS = {"Close": "收盘价", "High": "最高价", "Low": "最低价", "Volume": "成交量"}
+
+
+def format_number(value) -> str:
+    """格式化数字为可读形式（万 / 亿 / 万亿）"""
+    if value is None:
+        return "N/A"
+    abs_val = abs(value)
+    sign = "-" if value < 0 else ""
+    if abs_val >= 1e12:
+        return f"{sign}{abs_val / 1e12:.2f}万亿"
+    elif abs_val >= 1e8:
+        return f"{sign}{abs_val / 1e8:.2f}亿"
+    elif abs_val >= 1e4:
+        return f"{sign}{abs_val / 1e4:.2f}万"
+    else:
+        return f"{sign}{abs_val:.2f}"
+
+
+def round_or_na(value, n: int = 2):
+    """保留小数位，缺失时返回 N/A"""
+    if value is None:
+        return "N/A"
+    return round(value, n)
+
+
+def format_pct(value) -> str:
+    """格式化百分比"""
+    if value is None:
+        return "N/A"
+    return f"{value * 100:.2f}%"
+
+
+def compare_row(symbol: str, info: dict[str, Any]) -> dict[str, Any]:
+    """多股对比表中的单行数据"""
+    price = info.get("currentPrice")
+    low = info.get("fiftyTwoWeekLow")
+    return {
+        "股票代码": symbol,
+        "名称": info.get("shortName", "N/A"),
+        "当前价格": price or info.get("regularMarketPrice", "N/A"),
+        "市值": format_number(info.get("marketCap")),
+        "市盈率(TTM)": round_or_na(info.get("trailingPE")),
+        "市盈率(前瞻)": round_or_na(info.get("forwardPE")),
+        "市净率": round_or_na(info.get("priceToBook")),
+        "每股收益": round_or_na(info.get("trailingEps")),
+        "股息率": format_pct(info.get("dividendYield")),
+        "营收增长": format_pct(info.get("revenueGrowth")),
+        "利润率": format_pct(info.get("profitMargins")),
+        "ROE": format_pct(info.get("returnOnEquity")),
+        "Beta": round_or_na(info.get("beta")),
+        "52周涨幅": format_pct(price / low - 1 if price and low else None),
+    }
+
+
+def recent_bars(hist, n: int = 5) -> list[dict[str, Any]]:
+    """最近 n 个交易日的收盘价、最高价、最低价和成交量（按列整体计算，不逐行遍历）"""
+    recent = hist.tail(n)
+    table = recent[list(_RECENT_COLUMNS)].round(2).astype({"Volume": "int64"}).rename(columns=_RECENT_COLUMNS)
+    table.insert(0, "日期", recent.index.strftime("%Y-%m-%d"))
+    return table.to_dict("records")
@@ -0,0 +1,278 @@
+"""
+进程内指标
+计数器、仪表盘和直方图在进程内聚合，按 Prometheus 文本格式输出，不依赖 prometheus_client。
+每次观测只是一次加锁的加法（直方图再加一次二分查找），可以放在请求路径上。
+
+另外提供 server_stats_metrics：把 MCP Server 的运行统计（调度器、请求合并、行情缓存）
+转换为同样格式的指标，Web 服务和共享 MCP Server 的 /metrics 共用。
+"""
+
+import bisect
+import math
+import threading
+from typing import Any, Iterable
+
+# 默认的耗时分桶（秒）：覆盖缓存命中的毫秒级到 LLM 多轮调用的分钟级
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 一个指标族：(名称, 类型, 说明, [(标签, 数值[, 名称后缀]), ...])
+Family = tuple[str, str, str, list[tuple]]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: dict[tuple[str, ...], Any] = {}
+
+    def _key(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 的标签应为 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: tuple[str, ...]) -> dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def families(self) -> list[Family]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def families(self) -> list[Family]:
+        with self._lock:
+            samples = [(self._labels(key), value) for key, value in self._values.items()]
+        return [(self.name, self.kind, self.help, samples)]
+
+
+class Gauge(_Metric):
+    """可增可减的当前值"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def families(self) -> list[Family]:
+        with self._lock:
+            samples = [(self._labels(key), value) for key, value in self._values.items()]
+        return [(self.name, self.kind, self.help, samples)]
+
+
+class Histogram(_Metric):
+    """分桶直方图：记录每个桶的计数、总和与总数"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各桶计数（最后一个为 +Inf）, 总和]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def families(self) -> list[Family]:
+        with self._lock:
+            snapshot = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+
+        samples = []
+        for key, counts, total in snapshot:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                samples.append(({**labels, "le": _format_value(bound)}, cumulative, "_bucket"))
+            samples.append((labels, total, "_sum"))
+            samples.append((labels, cumulative, "_count"))
+        return [(self.name, self.kind, self.help, samples)]
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self, extra: Iterable[Family] = ()) -> str:
+        """输出所有指标（以及 extra 中的指标族）的 Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        families = [family for metric in metrics for family in metric.families()]
+        return render(families + list(extra))
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # 重复导入模块时返回已有的指标
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"指标 {metric.name} 已以不同的定义注册")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+
+# 进程内默认的注册表
+REGISTRY = Registry()
+
+
+def render(families: Iterable[Family]) -> str:
+    """指标族 -> Prometheus 文本格式"""
+    lines = []
+    for name, kind, help, samples in families:
+        lines.append(f"# HELP {name} {_escape_help(help)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample in samples:
+            labels, value = sample[0], sample[1]
+            suffix = sample[2] if len(sample) > 2 else ""
+            lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+    return "{" + pairs + "}"
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# ============================================================
+# MCP Server 运行统计
+# ============================================================
+
+# 调度器按工具统计中的计数器字段 -> (指标名, 说明)
+_TOOL_COUNTERS = {
+    "calls": ("finance_mcp_tool_calls_total", "MCP Server 收到的工具调用数"),
+    "completed": ("finance_mcp_tool_completed_total", "执行完成的工具调用数"),
+    "errors": ("finance_mcp_tool_errors_total", "抛出异常的工具调用数"),
+    "timeouts": ("finance_mcp_tool_timeouts_total", "排队或执行超时的工具调用数"),
+    "cancelled": ("finance_mcp_tool_cancelled_total", "被调用方取消的工具调用数"),
+    "rejected": ("finance_mcp_tool_rejected_total", "队列已满被拒绝的工具调用数"),
+    "wait_total_s": ("finance_mcp_tool_wait_seconds_total", "工具调用排队等待的累计时间（秒）"),
+    "run_total_s": ("finance_mcp_tool_run_seconds_total", "工具调用执行的累计时间（秒）"),
+}
+
+_TOOL_GAUGES = {
+    "queued": ("finance_mcp_tool_queued", "正在排队的工具调用数"),
+    "running": ("finance_mcp_tool_running", "正在执行的工具调用数"),
+}
+
+_SINGLE_FLIGHT = {
+    "executed": ("finance_mcp_single_flight_executed_total", "实际执行的工具调用数"),
+    "coalesced": ("finance_mcp_single_flight_coalesced_total", "合并到进行中调用的工具调用数"),
+    "cached": ("finance_mcp_single_flight_cached_total", "命中短期结果缓存的工具调用数"),
+    "shared": ("finance_mcp_single_flight_shared_total", "其中命中跨进程共享缓存的工具调用数"),
+}
+
+
+def server_stats_metrics(stats: dict[str, Any]) -> list[Family]:
+    """把 mcp_server.server_stats() 的结果转换为指标族"""
+    families: list[Family] = []
+    scheduler = stats.get("scheduler", {})
+    tools = scheduler.get("tools", {})
+
+    families.append(("finance_mcp_queue_depth", "gauge", "调度器中正在排队的工具调用总数",
+                     [({}, scheduler.get("queued", 0))]))
+    families.append(("finance_mcp_queue_capacity", "gauge", "调度器排队上限",
+                     [({}, scheduler.get("max_queue", 0))]))
+    families.append(("finance_mcp_pool_size", "gauge", "同时执行的工具调用上限",
+                     [({}, scheduler.get("pool_size", 0))]))
+    families.append(("finance_mcp_abandoned_threads", "gauge", "已超时放弃但仍在运行的线程数",
+                     [({}, scheduler.get("abandoned", 0))]))
+
+    for fields, kind in ((_TOOL_COUNTERS, "counter"), (_TOOL_GAUGES, "gauge")):
+        for field, (name, help) in fields.items():
+            samples = [({"tool": tool}, snapshot.get(field, 0)) for tool, snapshot in tools.items()]
+            families.append((name, kind, help, samples))
+
+    single_flight = stats.get("single_flight", {})
+    for field, (name, help) in _SINGLE_FLIGHT.items():
+        families.append((name, "counter", help, [({}, single_flight.get(field, 0))]))
+
+    kinds = stats.get("market_cache", {}).get("kinds", {})
+    for field in ("hits", "misses", "loads"):
+        families.append((
+            f"finance_mcp_cache_{field}_total", "counter", f"行情缓存的 {field} 次数（按数据类型）",
+            [({"kind": kind}, counter.get(field, 0)) for kind, counter in kinds.items()],
+        ))
+    families.append((
+        "finance_mcp_cache_hit_ratio", "gauge", "行情缓存命中率（按数据类型，自进程启动起）",
+        [({"kind": kind}, counter.get("hit_rate", 0.0)) for kind, counter in kinds.items()],
+    ))
+
+    cancel = stats.get("deadline", {})
+    families.append(("finance_mcp_cancel_tokens_cancelled_total", "counter", "被取消的取消令牌数",
+                     [({}, cancel.get("cancelled", 0))]))
+    families.append(("finance_mcp_cancel_checks_aborted_total", "counter", "因取消或超时而中止的检查次数",
+                     [({}, cancel.get("aborted", 0))]))
+    return families
@@ -0,0 +1,278 @@
+"""
+本地增量 OHLCV 行情库
+每只股票、每个周期一份内存映射的 NumPy 文件，首次查询时下载所需区间，
+之后只补齐最后一根 K 线以来的新数据，任意 period 都从本地切片返回
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.provider import data_provider
+
+# 存储目录，默认放在项目根目录下的 .data/prices
+PRICE_STORE_DIR = os.getenv(
+    "PRICE_STORE_DIR",
+    str(Path(__file__).parent.parent / ".data" / "prices"),
+)
+
+# 距上次检查超过该时间（秒）才去上游补数据
+PRICE_REFRESH_SECONDS = float(os.getenv("PRICE_REFRESH_SECONDS", "600"))
+
+BAR_DTYPE = np.dtype([
+    ("ts", "i8"),        # UTC 纳秒时间戳
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "f8"),
+])
+
+_COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+
+class PriceStore:
+    """按 (股票代码, 周期) 持久化的增量行情库
+
+    Args:
+        root: 存储目录
+        refresh_seconds: 增量更新的最小间隔（秒）
+    """
+
+    def __init__(self, root: str = PRICE_STORE_DIR, refresh_seconds: float = PRICE_REFRESH_SECONDS):
+        self.root = Path(root)
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple[str, str], threading.Lock] = {}
+
+    def history(self, symbol: str, period: str = "1mo", interval: str = "1d") -> pd.DataFrame:
+        """返回与 yf.Ticker(symbol).history(period=...) 同结构的 DataFrame
+
+        Args:
+            symbol: 规范化后的股票代码
+            period: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max
+            interval: K 线周期，如 1d, 1wk
+        """
+        need_start = _period_start(period)
+        with self._key_lock(symbol, interval):
+            bars, meta = self._load(symbol, interval)
+            plan = self._plan(bars, meta, need_start)
+            if plan is not None:
+                extend, start = plan
+                hist = data_provider.history(symbol, interval=interval, start=start)
+                bars, meta = self._apply(symbol, interval, bars, meta, extend, need_start, hist)
+            return _slice(_to_frame(bars, meta), period, need_start) if bars is not None else pd.DataFrame()
+
+    def histories(self, symbols: list[str], period: str = "1mo", interval: str = "1d") -> dict[str, pd.DataFrame]:
+        """多只股票的 history()：本地数据不够或需要更新的股票批量下载，写入方式与 history() 相同
+
+        需要下载的股票按（下载起点, 交易所）分组，每组一次 data_provider.histories；
+        同一交易所的股票时区相同，yf.download 保留交易所时区，与单只下载的数据一致。
+
+        Raises:
+            批量下载的异常原样抛出，调用方可以退回逐只获取
+        """
+        need_start = _period_start(period)
+        plans: dict[str, tuple[bool, datetime | None]] = {}
+        groups: dict[tuple[datetime | None, str], list[str]] = {}
+        for symbol in symbols:
+            # 文件整体原子替换，不加锁读取也是一致的；写入前在锁内重新读取
+            bars, meta = self._load(symbol, interval)
+            plan = self._plan(bars, meta, need_start)
+            if plan is not None:
+                plans[symbol] = plan
+                groups.setdefault((plan[1], _exchange(symbol)), []).append(symbol)
+
+        for (start, _), group in groups.items():
+            frames = data_provider.histories(group, interval=interval, start=start)
+            for symbol in group:
+                with self._key_lock(symbol, interval):
+                    bars, meta = self._load(symbol, interval)
+                    self._apply(symbol, interval, bars, meta, plans[symbol][0], need_start, frames.get(symbol))
+
+        result = {}
+        for symbol in symbols:
+            bars, meta = self._load(symbol, interval)
+            result[symbol] = _slice(_to_frame(bars, meta), period, need_start) if bars is not None else pd.DataFrame()
+        return result
+
+    def _plan(
+        self, bars: np.ndarray | None, meta: dict, need_start: datetime | None
+    ) -> tuple[bool, datetime | None] | None:
+        """是否需要下载：返回 (是否扩展区间, 下载起点)，不需要时返回 None"""
+        if bars is None or not _covers(meta, need_start):
+            # 本地数据不够覆盖所需区间：下载该区间并与已有数据合并
+            return True, need_start
+        if time.time() - meta.get("checked_at", 0) > self.refresh_seconds:
+            # 增量更新：从最后一根 K 线当天开始补（顺带刷新盘中未收盘的那根）
+            return False, pd.Timestamp(int(bars["ts"][-1]), tz="UTC").to_pydatetime()
+        return None
+
+    def _apply(
+        self,
+        symbol: str,
+        interval: str,
+        bars: np.ndarray | None,
+        meta: dict,
+        extend: bool,
+        need_start: datetime | None,
+        hist: pd.DataFrame | None,
+    ) -> tuple[np.ndarray | None, dict]:
+        """把下载的数据合并进本地数据并保存，返回合并后的 (bars, meta)"""
+        fresh = _to_bars(hist)
+        if extend:
+            if fresh is None:
+                return bars, meta
+            meta["tz"] = fresh["tz"]
+            meta["full"] = meta.get("full", False) or need_start is None
+            if need_start is not None:
+                old_start = meta.get("start")
+                meta["start"] = need_start.isoformat() if old_start is None else min(
+                    old_start, need_start.isoformat()
+                )
+        if fresh is not None:
+            bars = _merge(bars, fresh["bars"])
+        meta["checked_at"] = time.time()
+        self._save(symbol, interval, bars, meta)
+        return bars, meta
+
+    # ========================================
+    # 文件读写
+    # ========================================
+
+    def _paths(self, symbol: str, interval: str) -> tuple[Path, Path]:
+        name = f"{symbol.replace('/', '_')}_{interval}"
+        return self.root / f"{name}.npy", self.root / f"{name}.json"
+
+    def _load(self, symbol: str, interval: str) -> tuple[np.ndarray | None, dict]:
+        data_path, meta_path = self._paths(symbol, interval)
+        if not data_path.exists() or not meta_path.exists():
+            return None, {}
+        try:
+            bars = np.load(data_path, mmap_mode="r")
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None, {}
+        if bars.dtype != BAR_DTYPE or len(bars) == 0:
+            return None, {}
+        return bars, meta
+
+    def _save(self, symbol: str, interval: str, bars: np.ndarray, meta: dict) -> None:
+        """先写临时文件再原子替换，读者不会看到写了一半的文件"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        data_path, meta_path = self._paths(symbol, interval)
+        tmp_data = data_path.with_suffix(".tmp.npy")
+        tmp_meta = meta_path.with_suffix(".tmp.json")
+        np.save(tmp_data, np.ascontiguousarray(bars))
+        tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_data, data_path)
+        os.replace(tmp_meta, meta_path)
+
+    def _key_lock(self, symbol: str, interval: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault((symbol, interval), threading.Lock())
+
+
+# ============================================================
+# 辅助函数
+# ============================================================
+
+
+def _period_start(period: str, now: datetime | None = None) -> datetime | None:
+    """period 对应的起始时间（UTC），max 返回 None
+
+    按交易日计数的 Nd 会多留出周末和节假日的余量，切片时再取最后 N 根。
+    """
+    now = now or datetime.now(timezone.utc)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "max":
+        return None
+    if period == "ytd":
+        return today.replace(month=1, day=1)
+    if period.endswith("mo"):
+        return (pd.Timestamp(today) - pd.DateOffset(months=int(period[:-2]))).to_pydatetime()
+    if period.endswith("y"):
+        return (pd.Timestamp(today) - pd.DateOffset(years=int(period[:-1]))).to_pydatetime()
+    days = _trading_days(period)
+    if days is not None:
+        return today - timedelta(days=days * 2 + 7)
+    raise ValueError(f"不支持的 period: {period}")
+
+
+def _covers(meta: dict, need_start: datetime | None) -> bool:
+    """本地数据是否已覆盖所需起点"""
+    if meta.get("full"):
+        return True
+    if need_start is None or meta.get("start") is None:
+        return False
+    return meta["start"] <= need_start.isoformat()
+
+
+def _exchange(symbol: str) -> str:
+    """交易所后缀（如 HK、SS），美股等没有后缀的返回空字符串"""
+    _, dot, suffix = symbol.rpartition(".")
+    return suffix if dot and len(suffix) <= 2 and not suffix.isdigit() else ""
+
+
+def _to_bars(hist: pd.DataFrame | None) -> dict | None:
+    """下载的 DataFrame 转换为结构化数组，无数据时返回 None"""
+    if hist is None or hist.empty:
+        return None
+
+    index = hist.index
+    tz = str(index.tz) if index.tz is not None else "UTC"
+    if index.tz is None:
+        index = index.tz_localize("UTC")
+
+    bars = np.empty(len(hist), dtype=BAR_DTYPE)
+    bars["ts"] = index.tz_convert("UTC").as_unit("ns").asi8
+    for field, column in _COLUMNS.items():
+        bars[field] = hist[column].to_numpy(dtype="f8")
+    return {"bars": bars, "tz": tz}
+
+
+def _merge(old: np.ndarray | None, new: np.ndarray) -> np.ndarray:
+    """合并新旧数据：重叠部分以新数据为准"""
+    if old is None or len(old) == 0:
+        return new
+    if len(new) == 0:
+        return np.array(old)
+    head = old[old["ts"] < new["ts"][0]]
+    tail = old[old["ts"] > new["ts"][-1]]
+    return np.concatenate([head, new, tail])
+
+
+def _to_frame(bars: np.ndarray, meta: dict) -> pd.DataFrame:
+    index = pd.DatetimeIndex(pd.to_datetime(bars["ts"], unit="ns", utc=True))
+    index = index.tz_convert(meta.get("tz", "UTC"))
+    index.name = "Date"
+    return pd.DataFrame(
+        {column: np.asarray(bars[field]) for field, column in _COLUMNS.items()},
+        index=index,
+    )
+
+
+def _trading_days(period: str) -> int | None:
+    """Nd 形式的 period 返回 N，其余返回 None"""
+    if period.endswith("d") and period[:-1].isdigit():
+        return int(period[:-1])
+    return None
+
+
+def _slice(frame: pd.DataFrame, period: str, need_start: datetime | None) -> pd.DataFrame:
+    if need_start is None:
+        return frame
+    days = _trading_days(period)
+    if days is not None:
+        return frame.tail(days)
+    return frame[frame.index >= pd.Timestamp(need_start)]
+
+
+# 进程级共享实例
+price_store = PriceStore()
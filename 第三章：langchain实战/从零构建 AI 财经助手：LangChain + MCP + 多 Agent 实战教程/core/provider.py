@@ -0,0 +1,289 @@
+"""
+上游数据提供者
+所有 yfinance 和 DuckDuckGo 调用都经过这里，支持三种模式：
+- live: 直接请求上游（默认）
+- record: 请求上游，同时把结果写入本地回放数据
+- replay: 只读本地回放数据，按配置模拟网络延迟，完全离线
+
+回放数据是 gzip 压缩的 pickle 文件，只加载自己录制的数据目录。
+
+每次访问上游前检查当前请求的取消令牌（core.deadline），支持超时参数的上游请求
+把超时限制在剩余时间以内，回放延迟也可以被取消打断。
+已经发出的 yfinance / DuckDuckGo 请求不会被中途打断（它们共用库内部的会话，关闭会影响其他请求），
+取消后最多再等待一次请求的超时时间（FETCH_HTTP_TIMEOUT 与剩余时间中较小的一个），结果随即丢弃。
+"""
+
+import gzip
+import hashlib
+import os
+import pickle
+import random
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+import pandas as pd
+
+from core import deadline
+from core.lazy import lazy_import
+
+# yfinance / duckduckgo_search 导入较慢，第一次访问上游时才加载（replay 模式不会加载）
+yf = lazy_import("yfinance")
+duckduckgo_search = lazy_import("duckduckgo_search")
+
+MODES = ("live", "record", "replay")
+
+_MISSING = object()
+
+# 运行模式：live / record / replay
+FINANCE_DATA_MODE = os.getenv("FINANCE_DATA_MODE", "live")
+
+# 回放数据目录，默认放在项目根目录下的 .data/fixtures
+FINANCE_FIXTURE_DIR = os.getenv(
+    "FINANCE_FIXTURE_DIR",
+    str(Path(__file__).parent.parent / ".data" / "fixtures"),
+)
+
+# 回放时模拟的延迟（毫秒）：固定值 "50"，或区间 "20-80"
+FINANCE_REPLAY_LATENCY_MS = os.getenv("FINANCE_REPLAY_LATENCY_MS", "0")
+
+# 单次上游 HTTP 请求的超时（秒），不超过当前请求的剩余时间
+FETCH_HTTP_TIMEOUT = float(os.getenv("FETCH_HTTP_TIMEOUT", "10"))
+
+
+class FixtureMissing(LookupError):
+    """回放模式下没有对应的录制数据"""
+
+
+class DataProvider:
+    """yfinance / DuckDuckGo 的统一入口
+
+    Args:
+        mode: live / record / replay
+        fixture_dir: 回放数据目录
+        latency_ms: 回放延迟（毫秒），"50" 或 "20-80"
+    """
+
+    def __init__(
+        self,
+        mode: str = FINANCE_DATA_MODE,
+        fixture_dir: str = FINANCE_FIXTURE_DIR,
+        latency_ms: str | float = FINANCE_REPLAY_LATENCY_MS,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"不支持的数据模式: {mode}，请使用 {' / '.join(MODES)}")
+        self.mode = mode
+        self.root = Path(fixture_dir)
+        self.latency = _parse_latency(latency_ms)
+        self._lock = threading.Lock()
+        self._history_lock = threading.Lock()
+        self._counts = {"live": 0, "recorded": 0, "replayed": 0, "missing": 0}
+
+    # ========================================
+    # 数据接口
+    # ========================================
+
+    def ticker_attr(self, symbol: str, attr: str) -> Any:
+        """yf.Ticker(symbol) 的属性，如 info / news / recommendations / financials"""
+        return self._call(
+            "ticker", (symbol, attr), lambda: getattr(yf.Ticker(symbol), attr)
+        )
+
+    def history(self, symbol: str, interval: str = "1d", start: datetime | None = None) -> pd.DataFrame:
+        """历史 K 线：start 为 None 时取全部历史，否则从 start 当天开始
+
+        录制时每只股票每个周期只保存一份合并后的数据，
+        回放时再按 start 截取，不依赖录制时的具体日期。
+        """
+        def live():
+            ticker = yf.Ticker(symbol)
+            timeout = deadline.budget(FETCH_HTTP_TIMEOUT)
+            if start is None:
+                return ticker.history(period="max", interval=interval, timeout=timeout)
+            return ticker.history(start=start.strftime("%Y-%m-%d"), interval=interval, timeout=timeout)
+
+        key = (symbol, interval)
+        if self.mode == "live":
+            return self._live(live)
+        if self.mode == "record":
+            hist = self._live(live)
+            self._record_history(key, hist)
+            return hist
+        return _since(self._replay("history", key), start)
+
+    def histories(
+        self, symbols: list[str], interval: str = "1d", start: datetime | None = None
+    ) -> dict[str, pd.DataFrame]:
+        """多只股票的历史 K 线，live 模式用一次 yf.download 批量下载
+
+        录制和回放按股票拆分，与 history() 使用同一份数据；没有数据的股票不在结果中。
+        同一次调用的股票应属于同一个交易所：时区不同时 yf.download 会把时间统一转换为 UTC。
+        """
+        def live():
+            span = {"period": "max"} if start is None else {"start": start.strftime("%Y-%m-%d")}
+            data = yf.download(
+                symbols, interval=interval, group_by="ticker", auto_adjust=True, ignore_tz=False,
+                threads=True, progress=False, timeout=deadline.budget(FETCH_HTTP_TIMEOUT), **span,
+            )
+            return _split_download(data, symbols)
+
+        if self.mode == "replay":
+            return self._replay_histories(symbols, interval, start)
+        frames = self._live(live)
+        if self.mode == "record":
+            for symbol, hist in frames.items():
+                self._record_history((symbol, interval), hist)
+        return frames
+
+    def search_text(self, query: str, max_results: int = 6) -> list[dict[str, Any]]:
+        """DuckDuckGo 文本搜索"""
+        def live():
+            with duckduckgo_search.DDGS(timeout=deadline.budget(FETCH_HTTP_TIMEOUT)) as ddgs:
+                return list(ddgs.text(query, max_results=max_results))
+
+        return self._call("search", (query, max_results), live)
+
+    def save_fixture(self, namespace: str, key: tuple, value: Any) -> None:
+        """直接写入一条回放数据（用于生成合成数据），键与上面各接口一致：
+        ticker: (symbol, attr)；history: (symbol, interval)；search: (query, max_results)
+        """
+        self._save(namespace, key, value)
+
+    def stats(self) -> dict[str, Any]:
+        """各模式下的调用次数"""
+        return {"mode": self.mode, **self._counts}
+
+    # ========================================
+    # 模式分发
+    # ========================================
+
+    def _call(self, namespace: str, key: tuple, live: Callable[[], Any]) -> Any:
+        if self.mode == "live":
+            return self._live(live)
+        if self.mode == "record":
+            value = self._live(live)
+            self._save(namespace, key, value)
+            return value
+        return self._replay(namespace, key)
+
+    def _live(self, live: Callable[[], Any]) -> Any:
+        deadline.check()
+        self._count("live")
+        return live()
+
+    def _record_history(self, key: tuple, hist: pd.DataFrame | None) -> None:
+        """录制的 K 线与已有数据合并后保存，重叠部分以新数据为准"""
+        if hist is None or hist.empty:
+            return
+        with self._history_lock:
+            old = self._load("history", key)
+            if old is not _MISSING and not old.empty:
+                hist_all = pd.concat([old, hist])
+                hist_all = hist_all[~hist_all.index.duplicated(keep="last")].sort_index()
+            else:
+                hist_all = hist
+            self._save("history", key, hist_all)
+
+    def _replay_histories(
+        self, symbols: list[str], interval: str, start: datetime | None
+    ) -> dict[str, pd.DataFrame]:
+        """批量回放：逐只读取录制数据，只模拟一次网络延迟"""
+        deadline.check()
+        frames = {}
+        for symbol in symbols:
+            hist = self._load("history", (symbol, interval))
+            if hist is _MISSING:
+                self._count("missing")
+                continue
+            self._count("replayed")
+            frames[symbol] = _since(hist, start)
+        low, high = self.latency
+        if high > 0:
+            delay = random.Random(self._digest("histories", (tuple(symbols), interval))).uniform(low, high)
+            deadline.sleep(delay / 1000)
+        return frames
+
+    def _replay(self, namespace: str, key: tuple) -> Any:
+        deadline.check()
+        value = self._load(namespace, key)
+        if value is _MISSING:
+            self._count("missing")
+            raise FixtureMissing(f"回放数据中没有 {namespace} {key}，请先用 record 模式录制")
+        self._count("replayed")
+        low, high = self.latency
+        if high > 0:
+            # 同一个键的延迟固定，多次压测结果可比
+            delay = random.Random(self._digest(namespace, key)).uniform(low, high)
+            deadline.sleep(delay / 1000)
+        return value
+
+    # ========================================
+    # 文件读写
+    # ========================================
+
+    def _path(self, namespace: str, key: tuple) -> Path:
+        return self.root / namespace / f"{self._digest(namespace, key)}.pkl.gz"
+
+    @staticmethod
+    def _digest(namespace: str, key: tuple) -> str:
+        return hashlib.sha1(repr((namespace, key)).encode("utf-8")).hexdigest()[:20]
+
+    def _load(self, namespace: str, key: tuple) -> Any:
+        path = self._path(namespace, key)
+        if not path.exists():
+            return _MISSING
+        with gzip.open(path, "rb") as f:
+            return pickle.load(f)
+
+    def _save(self, namespace: str, key: tuple, value: Any) -> None:
+        """先写临时文件再原子替换"""
+        self._count("recorded")
+        path = self._path(namespace, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+
+def _since(hist: pd.DataFrame, start: datetime | None) -> pd.DataFrame:
+    """截取 start 当天及以后的数据"""
+    if start is None or hist.empty:
+        return hist
+    return hist[hist.index >= pd.Timestamp(start.strftime("%Y-%m-%d"), tz=hist.index.tz)]
+
+
+def _split_download(data: pd.DataFrame | None, symbols: list[str]) -> dict[str, pd.DataFrame]:
+    """把 yf.download(group_by="ticker") 的结果按股票拆开，去掉该股票没有数据的行"""
+    if data is None or data.empty:
+        return {}
+    if not isinstance(data.columns, pd.MultiIndex):
+        # 只有一只股票时部分 yfinance 版本不带股票代码这一层
+        parts = {symbols[0]: data} if len(symbols) == 1 else {}
+    else:
+        tickers = set(data.columns.get_level_values(0))
+        parts = {symbol: data[symbol] for symbol in symbols if symbol in tickers}
+    frames = {}
+    for symbol, hist in parts.items():
+        hist = hist.dropna(how="all")
+        if not hist.empty:
+            frames[symbol] = hist
+    return frames
+
+
+def _parse_latency(value: str | float) -> tuple[float, float]:
+    """"50" -> (50, 50)，"20-80" -> (20, 80)"""
+    if isinstance(value, (int, float)):
+        return float(value), float(value)
+    low, _, high = str(value).partition("-")
+    low = float(low or 0)
+    return low, float(high) if high else low
+
+
+# 进程级共享实例
+data_provider = DataProvider()
@@ -0,0 +1,166 @@
+"""
+多进程共享缓存
+多 worker 部署时每个进程都有自己的内存缓存，同一个问题在不同 worker 上要各算一遍。
+这里用本机的 SQLite 文件（WAL 模式）作为各进程共享的第二级缓存：
+
+- WAL 模式下读写互不阻塞，多个进程可以同时读，写入只短暂加锁
+- 值以 JSON 保存，带绝对过期时间（Unix 时间戳），读到过期条目视为未命中
+- 每个进程、每个线程各用一个连接（连接不能跨 fork 使用，按进程号重建）
+- 缓存出错（如磁盘满、文件被删）时按未命中处理，不影响请求
+
+设置 SHARED_CACHE_PATH 启用，api.serve 的多 worker 模式默认启用。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+# 共享缓存文件路径，留空不启用
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+
+# 每写入多少次清理一次过期条目
+_PURGE_EVERY = 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID
+"""
+
+
+class SharedStore:
+    """基于 SQLite（WAL 模式）的跨进程键值缓存
+
+    Args:
+        path: 数据库文件路径，不存在时自动创建
+        busy_timeout: 等待其他进程写锁的最长时间（秒）
+    """
+
+    def __init__(self, path: str | Path, busy_timeout: float = 2.0):
+        self.path = Path(path)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+    # ========================================
+    # 读写
+    # ========================================
+
+    def get(self, namespace: str, key: str) -> Any:
+        """读取未过期的值，不存在、已过期或出错时返回 None"""
+        try:
+            row = self._conn().execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        except (sqlite3.Error, OSError):
+            self._count("errors")
+            return None
+        if row is None or row[1] <= time.time():
+            self._count("misses")
+            return None
+        self._count("hits")
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, expires_at: float) -> bool:
+        """写入值，expires_at 为过期时间（Unix 时间戳）；出错时返回 False"""
+        data = json.dumps(value, ensure_ascii=False)
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, data, expires_at),
+                )
+        except (sqlite3.Error, OSError):
+            self._count("errors")
+            return False
+        self._count("writes")
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % _PURGE_EVERY == 0
+        if purge:
+            self.purge()
+        return True
+
+    def delete(self, namespace: str, key: str) -> None:
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        except (sqlite3.Error, OSError):
+            self._count("errors")
+
+    def purge(self) -> int:
+        """删除已过期的条目，返回删除的条数"""
+        try:
+            conn = self._conn()
+            with conn:
+                return conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+        except (sqlite3.Error, OSError):
+            self._count("errors")
+            return 0
+
+    def clear(self, namespace: str | None = None) -> None:
+        """清空某个命名空间（不指定时清空全部）"""
+        try:
+            conn = self._conn()
+            with conn:
+                if namespace is None:
+                    conn.execute("DELETE FROM entries")
+                else:
+                    conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+        except (sqlite3.Error, OSError):
+            self._count("errors")
+
+    # ========================================
+    # 统计
+    # ========================================
+
+    def stats(self) -> dict[str, Any]:
+        """本进程的读写统计和各命名空间的条目数（含尚未清理的过期条目）"""
+        with self._lock:
+            stats = dict(self._stats)
+        try:
+            rows = self._conn().execute("SELECT namespace, COUNT(*) FROM entries GROUP BY namespace").fetchall()
+        except (sqlite3.Error, OSError):
+            rows = []
+        return {"path": str(self.path), **stats, "entries": dict(rows)}
+
+    # ========================================
+    # 内部方法
+    # ========================================
+
+    def _conn(self) -> sqlite3.Connection:
+        """当前线程的连接；fork 之后的子进程重新连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL 模式下 NORMAL 只在检查点同步磁盘，缓存数据断电丢失也无妨
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self._stats[field] += 1
+
+
+def shared_store_from_env() -> SharedStore | None:
+    """按 SHARED_CACHE_PATH 创建共享缓存，未设置时返回 None"""
+    return SharedStore(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None
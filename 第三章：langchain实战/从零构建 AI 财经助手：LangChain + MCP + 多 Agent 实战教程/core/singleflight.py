@@ -0,0 +1,136 @@
+"""
+请求合并（single-flight）
+相同键的并发异步调用只执行一次，其余调用方等待同一个 future；
+成功结果写入短期缓存，紧随其后的重复请求直接命中；
+执行方因自身的取消或截止时间而失败时，结果只返回给执行方，等待方重新执行；
+配置了共享缓存（core.shared_store）时结果同时写入共享缓存，其他进程的相同请求也能命中
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+from core.cache import TTLCache
+from core.shared_store import SharedStore
+
+
+class PrivateResult(Exception):
+    """只属于执行方的结果（如执行方的请求已取消或超过截止时间）
+
+    fn 抛出它时 do() 把 result 返回给执行方，不缓存，也不交给等待方：
+    等待方各自按自己的取消令牌和截止时间重新执行。
+    """
+
+    def __init__(self, result: Any):
+        super().__init__(result)
+        self.result = result
+
+
+class SingleFlight:
+    """按键合并并发调用
+
+    Args:
+        ttl: 结果缓存时间（秒），0 表示只合并不缓存
+        maxsize: 结果缓存的最大条目数
+        store: 跨进程共享的结果缓存（键须为字符串、结果须可 JSON 序列化），None 表示只用进程内缓存
+        namespace: 在共享缓存中使用的命名空间
+    """
+
+    def __init__(
+        self,
+        ttl: float = 10.0,
+        maxsize: int = 512,
+        store: SharedStore | None = None,
+        namespace: str = "result",
+    ):
+        self.ttl = ttl
+        self.store = store
+        self.namespace = namespace
+        self._results = TTLCache(ttls={"result": ttl}, maxsize=maxsize)
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.executed = 0    # 实际执行次数
+        self.coalesced = 0   # 等待进行中请求的次数
+        self.cached = 0      # 命中结果缓存的次数（含共享缓存）
+        self.shared = 0      # 其中命中共享缓存的次数
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] | None = None,
+    ) -> Any:
+        """执行 fn 并返回结果；同一个键已有进行中的调用时直接等待其结果
+
+        Args:
+            key: 合并键
+            fn: 实际执行的协程函数，抛出 PrivateResult 表示结果不与等待方共享
+            cacheable: 判断结果是否可以缓存，默认全部缓存
+        """
+        if self.ttl > 0:
+            cached = self._results.get("result", key)
+            if cached is None and self.store is not None:
+                # 共享缓存读写是本机文件操作，耗时在毫秒以下，直接在事件循环中执行
+                cached = self.store.get(self.namespace, key)
+                if cached is not None:
+                    self.shared += 1
+                    self._results.set("result", key, cached)
+            if cached is not None:
+                self.cached += 1
+                return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                # shield：某个等待方被取消时不影响共享的执行
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if inflight.cancelled() and not asyncio.current_task().cancelling():
+                    # 执行方被取消（如它的客户端断开），自己并未被取消：重新执行
+                    return await self.do(key, fn, cacheable)
+                raise
+            except PrivateResult:
+                # 执行方自己的请求已取消或超时，它的失败不代表这次调用的结果：重新执行
+                return await self.do(key, fn, cacheable)
+
+        future = asyncio.get_running_loop().create_future()
+        # 没有等待方时也要取走异常，避免 "exception was never retrieved" 警告
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self.executed += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except PrivateResult as e:
+            future.set_exception(e)
+            return e.result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        if self.ttl > 0 and (cacheable is None or cacheable(result)):
+            self._results.set("result", key, result)
+            if self.store is not None:
+                self.store.set(self.namespace, key, result, time.time() + self.ttl)
+        future.set_result(result)
+        return result
+
+    def clear(self) -> None:
+        """清空结果缓存（含共享缓存中的本命名空间），进行中的调用不受影响"""
+        self._results.invalidate()
+        if self.store is not None:
+            self.store.clear(self.namespace)
+
+    def stats(self) -> dict[str, Any]:
+        """返回合并统计"""
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "cached": self.cached,
+            "shared": self.shared,
+            "inflight": len(self._inflight),
+        }
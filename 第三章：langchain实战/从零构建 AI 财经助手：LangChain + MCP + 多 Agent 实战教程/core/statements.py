@@ -0,0 +1,44 @@
+"""
+财务报表转换
+按列整体处理报表：一次性计算缺失值掩码和单位换算，
+不再逐个单元格 df.loc 取值和 str(val) 判断
+"""
+
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+STATEMENT_TITLES = {
+    "income": "利润表",
+    "balance": "资产负债表",
+    "cashflow": "现金流量表",
+}
+
+_UNITS = ((1e12, "万亿"), (1e8, "亿"), (1e4, "万"))
+
+
+def format_numbers(values: np.ndarray) -> np.ndarray:
+    """向量化版本的 _format_number：按量级换算为 万亿 / 亿 / 万"""
+    values = np.asarray(values, dtype=float)
+    magnitude = np.abs(values)
+    conditions = [magnitude >= scale for scale, _ in _UNITS]
+    scales = np.select(conditions, [scale for scale, _ in _UNITS], 1.0)
+    suffixes = np.select(conditions, [suffix for _, suffix in _UNITS], "")
+    return np.char.add(np.char.mod("%.2f", values / scales), suffixes)
+
+
+def statement_periods(df: pd.DataFrame, periods: int = 2) -> dict[str, dict[str, Any]]:
+    """取最近 periods 期报表，转换为 {报告期: {科目: 格式化数值}}"""
+    recent = df.iloc[:, :max(periods, 1)]
+    values = recent.to_numpy(dtype=float, na_value=np.nan)
+    present = ~np.isnan(values)
+    formatted = format_numbers(np.where(present, values, 0.0))
+    items = np.asarray(recent.index.astype(str))
+
+    result = {}
+    for j, column in enumerate(recent.columns):
+        mask = present[:, j]
+        label = str(column.date()) if hasattr(column, "date") else str(column)
+        result[label] = dict(zip(items[mask].tolist(), formatted[mask, j].tolist()))
+    return result
@@ -30,14 +30,18 @@ async def demo_mcp_client():
 
     print("🚀 创建 MCP Client，连接到我们的财经 MCP Server...\n")
 
-    # 创建 MCP 客户端
-    client = MultiServerMCPClient({
-        "finance": {
+    # 创建 MCP 客户端：设置了 MCP_URL 时连接常驻的共享 MCP Server
+    # （python agents/mcp_server.py --transport http），否则启动一个 stdio 子进程
+    mcp_url = os.getenv("MCP_URL")
+    if mcp_url:
+        connection = {"transport": "streamable_http", "url": mcp_url}
+    else:
+        connection = {
             "transport": "stdio",
             "command": "python",
-            "args": [str(Path(__file__).parent / "mcp_server.py")],
-        },
-    })
+            "args": [str(Path(__file__).parent.parent / "agents" / "mcp_server.py")],
+        }
+    client = MultiServerMCPClient({"finance": connection})
 
     try:
         # 获取所有工具
@@ -48,7 +52,7 @@ async def demo_mcp_client():
 
         # 创建 LLM
         print("\n📝 创建 Agent...")
-        from finance_agent import ZHIPU_API_KEY, ZHIPU_BASE_URL, MODEL_NAME
+        from config import ZHIPU_API_KEY, ZHIPU_BASE_URL, MODEL_NAME
 
         model = ChatOpenAI(
             model=MODEL_NAME,
@@ -76,7 +80,7 @@ async def demo_mcp_client():
 
         print("\n✅ MCP Client 演示完成！")
         print("\n💡 这个例子展示了：")
-        print("   1. 如何连接 MCP Server（stdio 模式）")
+        print("   1. 如何连接 MCP Server（stdio 子进程或共享的 HTTP 服务）")
         print("   2. 如何获取 MCP Server 提供的工具")
         print("   3. 如何在 LangChain Agent 中使用这些工具")
         print("\n📌 实际应用场景：")
@@ -10,21 +10,20 @@ warnings.filterwarnings("ignore")
 import json
 from datetime import datetime, timedelta
 
-import yfinance as yf
-from duckduckgo_search import DDGS
 from langchain_openai import ChatOpenAI
 from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain.agents import create_agent
 
+from core import batch, indicators, market_data, statements
+from core.encoding import encode_result
+from core.provider import data_provider
+from config import ZHIPU_API_KEY, ZHIPU_BASE_URL, MODEL_NAME, SYSTEM_PROMPT
+
 # ============================================================
-# 智谱 GLM 模型配置
+# 智谱 GLM 模型配置（见 config.py）
 # ============================================================
 
-ZHIPU_API_KEY = "ccb9818e987149dd8cc2541ff7c9df57.AMe31g7tJHwgPo9q"
-ZHIPU_BASE_URL = "https://open.bigmodel.cn/api/paas/v4/"
-MODEL_NAME = "glm-5"
-
 llm = ChatOpenAI(
     model=MODEL_NAME,
     openai_api_key=ZHIPU_API_KEY,
@@ -45,8 +44,7 @@ def get_stock_info(ticker: str) -> str:
         ticker: 股票代码，如 AAPL, MSFT, 600519.SS (贵州茅台), 000001.SZ (平安银行)
     """
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = market_data.get_info(ticker)
 
         # 提取关键信息
         result = {
@@ -60,20 +58,20 @@ def get_stock_info(ticker: str) -> str:
             "日最低价": info.get("dayLow", "N/A"),
             "52周最高": info.get("fiftyTwoWeekHigh", "N/A"),
             "52周最低": info.get("fiftyTwoWeekLow", "N/A"),
-            "市值": _format_number(info.get("marketCap")),
-            "市盈率(TTM)": _round(info.get("trailingPE")),
-            "市盈率(前瞻)": _round(info.get("forwardPE")),
-            "每股收益(TTM)": _round(info.get("trailingEps")),
-            "股息率": _format_pct(info.get("dividendYield")),
-            "Beta": _round(info.get("beta")),
-            "总营收": _format_number(info.get("totalRevenue")),
-            "利润率": _format_pct(info.get("profitMargins")),
+            "市值": market_data.format_number(info.get("marketCap")),
+            "市盈率(TTM)": market_data.round_or_na(info.get("trailingPE")),
+            "市盈率(前瞻)": market_data.round_or_na(info.get("forwardPE")),
+            "每股收益(TTM)": market_data.round_or_na(info.get("trailingEps")),
+            "股息率": market_data.format_pct(info.get("dividendYield")),
+            "Beta": market_data.round_or_na(info.get("beta")),
+            "总营收": market_data.format_number(info.get("totalRevenue")),
+            "利润率": market_data.format_pct(info.get("profitMargins")),
             "行业": info.get("industry", "N/A"),
             "板块": info.get("sector", "N/A"),
             "公司简介": (info.get("longBusinessSummary") or "N/A")[:200],
         }
 
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        return encode_result(result)
     except Exception as e:
         return f"获取 {ticker} 信息时出错: {str(e)}"
 
@@ -87,8 +85,7 @@ def get_stock_history(ticker: str, period: str = "1mo") -> str:
         period: 时间范围，可选值: 1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, ytd, max
     """
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period=period)
+        hist = market_data.get_history(ticker, period)
 
         if hist.empty:
             return f"未找到 {ticker} 的历史数据"
@@ -108,29 +105,41 @@ def get_stock_history(ticker: str, period: str = "1mo") -> str:
         }
 
         # 最近5个交易日数据
-        recent = hist.tail(5)
-        recent_data = []
-        for date, row in recent.iterrows():
-            recent_data.append({
-                "日期": str(date.date()),
-                "收盘价": round(row['Close'], 2),
-                "最高价": round(row['High'], 2),
-                "最低价": round(row['Low'], 2),
-                "成交量": int(row['Volume']),
-            })
+        recent_data = market_data.recent_bars(hist)
 
         result = {
             "汇总": summary,
             "近期交易数据": recent_data,
         }
 
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        return encode_result(result)
     except Exception as e:
         return f"获取 {ticker} 历史数据时出错: {str(e)}"
 
 
 @tool
-def get_financial_statement(ticker: str, statement_type: str = "income") -> str:
+def get_technical_indicators(tickers: str, period: str = "6mo", benchmark: str = "^GSPC") -> str:
+    """计算股票的技术与风险指标：收益率、波动率、最大回撤、均线、RSI、ATR 和 Beta。
+
+    Args:
+        tickers: 逗号分隔的股票代码列表，如 "AAPL,MSFT"，单只股票也可以
+        period: 时间范围，可选值: 1mo, 3mo, 6mo, 1y, 2y, 5y, ytd, max
+        benchmark: 计算 Beta 的基准指数，如 ^GSPC (标普500)、000300.SS (沪深300)
+    """
+    try:
+        result = indicators.technical_summary(tickers.split(","), period, benchmark or None)
+        return encode_result(result)
+    except Exception as e:
+        return f"计算技术指标时出错: {str(e)}"
+
+
+@tool
+def get_financial_statement(
+    ticker: str,
+    statement_type: str = "income",
+    quarterly: bool = False,
+    periods: int = 2,
+) -> str:
     """获取公司财务报表数据。
 
     Args:
@@ -139,36 +148,27 @@ def get_financial_statement(ticker: str, statement_type: str = "income") -> str:
             - income: 利润表
             - balance: 资产负债表
             - cashflow: 现金流量表
+        quarterly: 是否获取季度报表，默认为年度报表
+        periods: 返回最近几期数据，默认 2 期
     """
     try:
-        stock = yf.Ticker(ticker)
-
-        if statement_type == "income":
-            df = stock.financials
-            title = "利润表"
-        elif statement_type == "balance":
-            df = stock.balance_sheet
-            title = "资产负债表"
-        elif statement_type == "cashflow":
-            df = stock.cashflow
-            title = "现金流量表"
-        else:
+        title = statements.STATEMENT_TITLES.get(statement_type)
+        if title is None:
             return f"不支持的报表类型: {statement_type}，请使用 income/balance/cashflow"
 
+        df = market_data.get_statement(ticker, statement_type, quarterly)
         if df is None or df.empty:
             return f"未找到 {ticker} 的{title}数据"
 
-        # 取最近2期数据进行对比
-        result = {"股票代码": ticker.upper(), "报表类型": title, "数据": {}}
-        for col in df.columns[:2]:
-            period_data = {}
-            for idx in df.index:
-                val = df.loc[idx, col]
-                if val is not None and str(val) != "nan":
-                    period_data[str(idx)] = _format_number(float(val))
-            result["数据"][str(col.date())] = period_data
-
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        # 取最近几期数据进行对比
+        result = {
+            "股票代码": ticker.upper(),
+            "报表类型": title,
+            "报告频率": "季度" if quarterly else "年度",
+            "数据": statements.statement_periods(df, periods),
+        }
+
+        return encode_result(result)
     except Exception as e:
         return f"获取 {ticker} 财务报表时出错: {str(e)}"
 
@@ -181,8 +181,7 @@ def get_stock_news(ticker: str) -> str:
         ticker: 股票代码
     """
     try:
-        stock = yf.Ticker(ticker)
-        news = stock.news
+        news = market_data.get_news(ticker)
 
         if not news:
             return f"未找到 {ticker} 的相关新闻"
@@ -197,7 +196,7 @@ def get_stock_news(ticker: str) -> str:
                         or item.get("link", "N/A"),
             })
 
-        return json.dumps(news_list, ensure_ascii=False, indent=2)
+        return encode_result(news_list)
     except Exception as e:
         return f"获取 {ticker} 新闻时出错: {str(e)}"
 
@@ -210,10 +209,8 @@ def get_recommendations(ticker: str) -> str:
         ticker: 股票代码
     """
     try:
-        stock = yf.Ticker(ticker)
-
         # 获取推荐
-        rec = stock.recommendations
+        rec = market_data.get_recommendations(ticker)
         if rec is not None and not rec.empty:
             recent_rec = rec.tail(10)
             rec_data = []
@@ -227,7 +224,7 @@ def get_recommendations(ticker: str) -> str:
             rec_data = "暂无分析师推荐数据"
 
         # 获取推荐摘要
-        info = stock.info
+        info = market_data.get_info(ticker)
         rec_summary = {
             "推荐评级": info.get("recommendationKey", "N/A"),
             "目标均价": info.get("targetMeanPrice", "N/A"),
@@ -241,7 +238,7 @@ def get_recommendations(ticker: str) -> str:
             "推荐摘要": rec_summary,
             "最近推荐记录": rec_data,
         }
-        return json.dumps(result, ensure_ascii=False, indent=2)
+        return encode_result(result)
     except Exception as e:
         return f"获取 {ticker} 推荐数据时出错: {str(e)}"
 
@@ -254,32 +251,18 @@ def compare_stocks(tickers: str) -> str:
         tickers: 逗号分隔的股票代码列表，如 "AAPL,MSFT,GOOGL"
     """
     try:
-        ticker_list = [t.strip() for t in tickers.split(",")]
-        comparison = []
-
-        for ticker in ticker_list:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            comparison.append({
-                "股票代码": ticker.upper(),
-                "名称": info.get("shortName", "N/A"),
-                "当前价格": info.get("currentPrice") or info.get("regularMarketPrice", "N/A"),
-                "市值": _format_number(info.get("marketCap")),
-                "市盈率(TTM)": _round(info.get("trailingPE")),
-                "市盈率(前瞻)": _round(info.get("forwardPE")),
-                "每股收益": _round(info.get("trailingEps")),
-                "股息率": _format_pct(info.get("dividendYield")),
-                "营收增长": _format_pct(info.get("revenueGrowth")),
-                "利润率": _format_pct(info.get("profitMargins")),
-                "Beta": _round(info.get("beta")),
-                "52周涨跌": _format_pct(
-                    (info.get("currentPrice", 0) / info.get("fiftyTwoWeekLow", 1) - 1)
-                    if info.get("currentPrice") and info.get("fiftyTwoWeekLow")
-                    else None
-                ),
-            })
-
-        return json.dumps(comparison, ensure_ascii=False, indent=2)
+        ticker_list = tickers.split(",")
+
+        # 并发获取，按完成顺序生成每一行，单只失败不影响整体
+        rows = {}
+        for symbol, info, error in batch.iter_infos(ticker_list):
+            if error is not None:
+                rows[symbol] = {"股票代码": symbol, "错误": str(error)}
+            else:
+                rows[symbol] = market_data.compare_row(symbol, info)
+
+        comparison = [rows[symbol] for symbol in batch.unique_symbols(ticker_list)]
+        return encode_result(comparison)
     except Exception as e:
         return f"对比股票时出错: {str(e)}"
 
@@ -292,8 +275,7 @@ def search_financial_news(query: str) -> str:
         query: 搜索关键词，如"苹果公司财报"、"A股市场行情"
     """
     try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=6))
+        results = data_provider.search_text(query, max_results=6)
 
         if not results:
             return f"未找到关于 '{query}' 的搜索结果"
@@ -306,7 +288,7 @@ def search_financial_news(query: str) -> str:
                 "来源": r.get("href", ""),
             })
 
-        return json.dumps(news_list, ensure_ascii=False, indent=2)
+        return encode_result(news_list)
     except Exception as e:
         return f"搜索时出错: {str(e)}"
 
@@ -327,113 +309,6 @@ def think(reflection: str) -> str:
     return f"思考已记录: {reflection}"
 
 
-# ============================================================
-# 辅助函数
-# ============================================================
-
-
-def _format_number(value):
-    if value is None:
-        return "N/A"
-    abs_val = abs(value)
-    sign = "-" if value < 0 else ""
-    if abs_val >= 1e12:
-        return f"{sign}{abs_val / 1e12:.2f}万亿"
-    elif abs_val >= 1e8:
-        return f"{sign}{abs_val / 1e8:.2f}亿"
-    elif abs_val >= 1e4:
-        return f"{sign}{abs_val / 1e4:.2f}万"
-    else:
-        return f"{sign}{abs_val:.2f}"
-
-
-def _round(value, n=2):
-    if value is None:
-        return "N/A"
-    return round(value, n)
-
-
-def _format_pct(value):
-    if value is None:
-        return "N/A"
-    return f"{value * 100:.2f}%"
-
-
-# ============================================================
-# 系统提示词
-# ============================================================
-
-SYSTEM_PROMPT = """你是一位专业的财经研究分析师，擅长股票分析、财务数据解读和投资研究。
-
-**你的职责：**
-1. 分析股票的价格走势和基本面
-2. 研究公司财务报表和关键指标
-3. 搜索并整理相关财经新闻
-4. 对比分析多只股票的投资价值
-5. 提供基于数据的客观分析
-
-**分析框架：**
-- 首先获取股票基本信息和价格数据
-- 分析关键财务指标：市盈率、市值、营收、利润率等
-- 查看分析师评级和目标价
-- 关注最新新闻和市场动态
-- 综合以上信息给出分析结论
-
-**工具使用策略：**
-- 对于股票查询，先用 get_stock_info 获取概览
-- 需要历史数据时用 get_stock_history
-- 需要财务报表时用 get_financial_statement
-- 需要新闻时用 get_stock_news 或 search_financial_news
-- 对比股票时用 compare_stocks
-- 分析师评级用 get_recommendations
-- 复杂分析前先用 think 工具梳理思路
-
-**输出格式（非常重要，请严格遵守）：**
-
-你的回复会被前端渲染为富文本卡片，请使用以下 Markdown 格式以获得最佳展示效果：
-
-1. **开头**：用1-2句话概括回答方向（普通段落）
-
-2. **核心结论**：用引用块(>)包裹，首行加粗作为标题：
-> **核心结论**
-> **重要结论加粗显示。**补充说明文字。
-
-3. **关键数据**：用"## 📊 标题"加两列表格展示，会自动渲染为大字统计卡片：
-## 📊 关键数据
-| 数值 | 说明 |
-|------|------|
-| 78% | 某指标 |
-| 3.3% | 某指标 |
-
-4. **分析要点**：用多个连续"## emoji 标题"，会自动合并为分析卡片：
-## 📈 要点一标题
-分析内容...
-## 💰 要点二标题
-分析内容...
-## 🎯 要点三标题
-分析内容...
-
-5. **对比数据**：用多列表格，涨跌幅数据会自动着色：
-| 名称 | 市盈率 | 涨跌幅 |
-|------|--------|--------|
-| 某股 | 12.5 | -1.5% |
-
-6. **风险提示**：在文末用普通段落说明风险
-
-**格式注意事项：**
-- 每个分析要点的 ## 标题前请加一个 emoji（如 📈💰🎯📊🔍💡🏢📰）
-- 关键数字用 **加粗** 标记
-- 保持段落简洁，每段不超过3句话
-- 对比表格的涨跌幅请带正负号和百分号（如 +2.5% 或 -1.3%）
-
-**重要规则：**
-- 只回答与财经和股票市场相关的问题
-- 非财经类问题请礼貌拒绝："抱歉，我只能协助处理股票市场和财经分析相关的问题。请向我询问股票、公司或财务指标方面的内容。"
-- 所有分析必须基于数据，不做无依据的预测
-- 投资建议需附带风险提示
-- 用中文回答
-"""
-
 # ============================================================
 # 创建 Agent
 # ============================================================
@@ -441,6 +316,7 @@ SYSTEM_PROMPT = """你是一位专业的财经研究分析师，擅长股票分
 tools = [
     get_stock_info,
     get_stock_history,
+    get_technical_indicators,
     get_financial_statement,
     get_stock_news,
     get_recommendations,
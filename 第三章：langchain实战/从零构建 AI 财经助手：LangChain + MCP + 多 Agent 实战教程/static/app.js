@@ -147,6 +147,38 @@ class FinanceChatApp {
         this.scrollToBottom();
     }
 
+    addToolProgress(botMsg, progress) {
+        const steps = botMsg.querySelector('.thinking-steps');
+        if (!steps || !progress.row) return;
+
+        // 追加到当前进行中步骤的详情下
+        const current = steps.querySelector('.thinking-step.in-progress');
+        if (!current) return;
+        let detailDiv = current.nextElementSibling;
+        if (!detailDiv || !detailDiv.classList.contains('step-details')) {
+            detailDiv = document.createElement('div');
+            detailDiv.className = 'step-details';
+            current.after(detailDiv);
+        }
+
+        const count = progress.total ? `(${progress.progress}/${progress.total}) ` : '';
+        const item = document.createElement('div');
+        item.className = 'step-detail-item';
+        item.textContent = count + this.formatProgressRow(progress.row);
+        detailDiv.appendChild(item);
+        this.scrollToBottom();
+    }
+
+    formatProgressRow(row) {
+        if (row['错误']) return `${row['股票代码'] || ''} ${row['错误']}`.trim();
+        if (row['标题']) return row['标题'];
+        return Object.entries(row)
+            .filter(([, value]) => value !== 'N/A' && typeof value !== 'object')
+            .slice(0, 5)
+            .map(([key, value]) => `${key}: ${value}`)
+            .join(' · ');
+    }
+
     finishThinking(botMsg) {
         const section = botMsg.querySelector('.thinking-section');
         if (!section) return;
@@ -209,6 +241,22 @@ class FinanceChatApp {
                 }, 60000);
             };
 
+            // 排队事件：服务器繁忙时推送排队位置，0 表示开始处理
+            eventSource.addEventListener('queue', (e) => {
+                resetTimeout();
+                try {
+                    const data = JSON.parse(e.data);
+                    const text = botMsg.querySelector('.thinking-text');
+                    if (text) {
+                        text.textContent = data.position > 0
+                            ? `排队中，前面还有 ${data.position - 1} 个请求...`
+                            : '深度思考中...';
+                    }
+                } catch (err) {
+                    console.error('解析排队事件失败:', err);
+                }
+            });
+
             // 工具调用事件
             eventSource.addEventListener('tool_call', (e) => {
                 resetTimeout();
@@ -223,6 +271,17 @@ class FinanceChatApp {
                 }
             });
 
+            // 工具部分结果事件：每完成一只股票 / 一条搜索结果推送一次
+            eventSource.addEventListener('tool_progress', (e) => {
+                resetTimeout();
+                try {
+                    const data = JSON.parse(e.data);
+                    this.addToolProgress(botMsg, data);
+                } catch (err) {
+                    console.error('解析工具进度失败:', err);
+                }
+            });
+
             // 文本消息事件
             eventSource.addEventListener('message', (e) => {
                 resetTimeout();
@@ -271,7 +330,7 @@ class FinanceChatApp {
             eventSource.onerror = () => {
                 clearTimeout(timeoutTimer);
                 if (!hasContent) {
-                    this.addError(botMsg, '连接失败，请检查后端服务是否运行');
+                    this.addError(botMsg, '连接失败或服务器繁忙，请稍后重试');
                 }
                 eventSource.close();
                 resolve();
@@ -287,6 +346,7 @@ class FinanceChatApp {
         const labels = {
             'get_stock_info': '查询股票信息',
             'get_stock_history': '获取历史行情',
+            'get_technical_indicators': '计算技术指标',
             'get_financial_statement': '分析财务报表',
             'get_stock_news': '搜索相关新闻',
             'get_recommendations': '查看分析师评级',
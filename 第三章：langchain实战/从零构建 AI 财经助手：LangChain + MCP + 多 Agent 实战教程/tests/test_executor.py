@@ -0,0 +1,64 @@
+"""工具调度器：放弃的线程超过上限后，新调用不能在线程池内部排队"""
+
+import asyncio
+import threading
+import time
+
+from core.executor import ToolRejected, ToolScheduler, ToolTimeout
+
+
+def test_abandoned_beyond_limit_rejects_instead_of_queueing_in_pool() -> None:
+    scheduler = ToolScheduler(pool_size=2, max_queue=16, timeout=0.05, max_abandoned=1)
+    started: list[int] = []
+    lock = threading.Lock()
+
+    def stuck(index: int) -> None:
+        # 不检查取消令牌的阻塞调用，超时后线程仍被占用
+        with lock:
+            started.append(index)
+        time.sleep(0.5)
+
+    async def call(index: int) -> str:
+        try:
+            await scheduler.run("stuck", lambda: stuck(index))
+        except ToolTimeout:
+            return "timeout"
+        except ToolRejected:
+            return "rejected"
+        return "completed"
+
+    async def main() -> tuple[list[str], list[int]]:
+        # 超过 max_abandoned 个调用超时：前两个同时运行并被放弃，放弃数达到 2
+        outcomes = await asyncio.gather(*(call(i) for i in range(6)))
+        with lock:
+            return list(outcomes), list(started)
+
+    outcomes, started_at_return = asyncio.run(main())
+
+    assert outcomes.count("timeout") == 2
+    assert outcomes.count("rejected") == 4
+    # 每个超时的调用都真正开始运行过，没有在线程池内部排队耗尽超时
+    assert len(started_at_return) == outcomes.count("timeout")
+    stats = scheduler.stats()["tools"]["stuck"]
+    assert stats["timeouts"] == 2 and stats["rejected"] == 4 and stats["queued"] == 0
+
+
+def test_admits_again_after_abandoned_threads_finish() -> None:
+    scheduler = ToolScheduler(pool_size=1, max_queue=4, timeout=0.05, max_abandoned=1)
+
+    async def main() -> str:
+        try:
+            await scheduler.run("slow", lambda: time.sleep(0.2))
+        except ToolTimeout:
+            pass
+        try:
+            await scheduler.run("quick", lambda: None)
+        except ToolRejected:
+            pass
+        else:
+            raise AssertionError("放弃的线程未结束时应拒绝新调用")
+        await asyncio.sleep(0.3)
+        return await scheduler.run("quick", lambda: "ok")
+
+    assert asyncio.run(main()) == "ok"
+    assert scheduler.stats()["abandoned"] == 0
@@ -0,0 +1,91 @@
+"""语义回答缓存的实体校验：相似度很高但问的是另一家公司的问题不能命中"""
+
+import threading
+import time
+
+import pytest
+
+from api import semantic_cache
+from api.semantic_cache import HashingEmbedder, SemanticIndex, analyze, unknown_words
+
+PARTITION = "glm-4"
+
+
+def _hit(cached: str, question: str) -> tuple[str, float] | None:
+    index = SemanticIndex(16, threshold=0.9, embedder=HashingEmbedder())
+    index.add("cached", PARTITION, cached, expires_at=float("inf"))
+    return index.search(PARTITION, question, now=0.0)
+
+
+@pytest.mark.parametrize(
+    ("cached", "question"),
+    [
+        # 小写股票代码：不区分大小写按代码识别
+        ("tsla 最近走势、新闻和分析师评级怎么样，值得买入吗", "nvda 最近走势、新闻和分析师评级怎么样，值得买入吗"),
+        # 别名表以外的公司名：未识别的字词必须相同
+        (
+            "宁德时代最近的走势、新闻和分析师评级怎么样，现在值得买入吗",
+            "比亚迪最近的走势、新闻和分析师评级怎么样，现在值得买入吗",
+        ),
+        ("苹果股价多少", "微软股价多少"),
+        ("特斯拉过去 30 天的走势", "特斯拉过去 90 天的走势"),
+    ],
+)
+def test_different_company_or_number_does_not_hit(cached: str, question: str) -> None:
+    assert _hit(cached, question) is None
+
+
+@pytest.mark.parametrize(
+    ("cached", "question"),
+    [
+        ("苹果股价多少", "AAPL 现在多少钱"),
+        ("tsla 最近走势怎么样", "TSLA 最近走势怎么样"),
+        ("请问特斯拉过去30天的走势", "TSLA 过去 30 天的价格走势"),
+        ("宁德时代的股价", "请问宁德时代现在多少钱"),
+    ],
+)
+def test_same_question_rephrased_hits(cached: str, question: str) -> None:
+    assert _hit(cached, question) is not None
+
+
+def test_lowercase_ticker_is_entity() -> None:
+    assert analyze("tsla 新闻")[0] == analyze("TSLA 新闻")[0] == frozenset({"TSLA"})
+    assert analyze("0700.hk 股价")[0] == frozenset({"0700.HK"})
+
+
+def test_unknown_names_are_kept() -> None:
+    _, text = analyze("宁德时代最近走势怎么样")
+    assert unknown_words(text) == frozenset({"宁德时代"})
+    _, text = analyze("苹果最近走势怎么样")
+    assert unknown_words(text) == frozenset()
+
+
+def test_lookups_skip_while_model_loads_in_background(monkeypatch: pytest.MonkeyPatch) -> None:
+    loading = threading.Event()
+    release = threading.Event()
+
+    def slow_embedder() -> HashingEmbedder:
+        loading.set()
+        release.wait(5)
+        return HashingEmbedder()
+
+    monkeypatch.setattr(semantic_cache, "create_embedder", slow_embedder)
+    index = SemanticIndex(16, threshold=0.9)
+    warm = threading.Thread(target=index.warm_up)
+    warm.start()
+    assert loading.wait(5)
+
+    # 加载期间不等待模型：索引和检索直接跳过
+    index.add("k", "m", "苹果股价多少", time.time() + 60)
+    assert index.search("m", "苹果股价多少", time.time()) is None
+
+    release.set()
+    warm.join(5)
+    index.add("k", "m", "苹果股价多少", time.time() + 60)
+    assert index.search("m", "AAPL 现在多少钱", time.time()) is not None
+
+
+def test_default_embedder_falls_back_without_sentence_transformers(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(semantic_cache.importlib.util, "find_spec", lambda name: None)
+    assert isinstance(semantic_cache.create_embedder(""), HashingEmbedder)
+    assert isinstance(semantic_cache.create_embedder("hash"), HashingEmbedder)
@@ -0,0 +1,64 @@
+"""请求合并：执行方自己的取消或超时不能变成合并进来的其他调用方的结果"""
+
+import asyncio
+
+import pytest
+
+from agents import mcp_server
+from core import deadline
+
+
+@pytest.fixture
+def slow_tool(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    """把工具替换为可被取消的慢调用，返回实际执行次数"""
+    runs: list[int] = []
+
+    def build(name: str, arguments: dict) -> object:
+        def call() -> dict:
+            runs.append(1)
+            deadline.sleep(0.2)
+            return {"success": True, "data": arguments["ticker"]}
+
+        return call
+
+    monkeypatch.setattr(mcp_server, "_build_call", build)
+    # 参数规范化会延迟导入取数模块，先导入一次，免得短预算耗在导入上
+    mcp_server.normalize_arguments("get_stock_info", {"ticker": "AAPL"})
+    return runs
+
+
+async def _call(ticker: str, token: deadline.CancelToken) -> dict:
+    with deadline.use(token):
+        return await mcp_server.execute_tool("get_stock_info", {"ticker": ticker})
+
+
+def test_short_deadline_leader_does_not_time_out_waiters(slow_tool: list[int]) -> None:
+    async def main() -> tuple[dict, dict]:
+        leader = asyncio.create_task(_call("SFTA", deadline.CancelToken(0.05)))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(_call("SFTA", deadline.CancelToken(5)))
+        return await leader, await waiter
+
+    leader, waiter = asyncio.run(main())
+
+    assert not leader["success"] and "超时" in leader["error"]
+    assert waiter == {"success": True, "data": "SFTA"}
+    # 等待方合并到执行方之后重新执行了一次
+    assert len(slow_tool) == 2
+    assert mcp_server._single_flight.stats()["coalesced"] >= 1
+
+
+def test_cancelled_leader_does_not_cancel_waiters(slow_tool: list[int]) -> None:
+    async def main() -> tuple[dict, dict]:
+        token = deadline.CancelToken(5)
+        leader = asyncio.create_task(_call("SFTB", token))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(_call("SFTB", deadline.CancelToken(5)))
+        await asyncio.sleep(0.05)
+        token.cancel("客户端已断开")
+        return await leader, await waiter
+
+    leader, waiter = asyncio.run(main())
+
+    assert not leader["success"] and "已取消" in leader["error"]
+    assert waiter == {"success": True, "data": "SFTB"}
@@ -0,0 +1,72 @@
+"""静态文件：加载和修改检查不能阻塞事件循环"""
+
+import asyncio
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from api.static_assets import StaticAssets
+
+
+@pytest.fixture
+def static_dir(tmp_path: Path) -> Path:
+    (tmp_path / "index.html").write_text('<script src="/static/app.js"></script>')
+    (tmp_path / "app.js").write_text("console.log(1);" * 100)
+    return tmp_path
+
+
+def test_requests_during_startup_load_do_not_block_loop(
+    static_dir: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    loads: list[float] = []
+    original = StaticAssets.load
+
+    def slow_load(self: StaticAssets) -> None:
+        loads.append(time.monotonic())
+        time.sleep(0.3)
+        original(self)
+
+    monkeypatch.setattr(StaticAssets, "load", slow_load)
+    assets = StaticAssets(static_dir, reload=False)
+
+    async def main() -> int:
+        ticks = 0
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick = asyncio.create_task(ticker())
+        startup = asyncio.create_task(assets.refresh())
+        await asyncio.sleep(0.05)
+        # 启动时的加载还没完成，请求在线程中等待它
+        await asyncio.gather(*(assets.refresh() for _ in range(4)))
+        await startup
+        tick.cancel()
+        return ticks
+
+    ticks = asyncio.run(main())
+
+    assert ticks >= 10
+    assert len(loads) == 1
+    assert assets.exists("index.html")
+
+
+def test_reload_checks_at_most_once_per_interval(static_dir: Path) -> None:
+    assets = StaticAssets(static_dir, reload=True, reload_interval=60)
+    asyncio.run(assets.refresh())
+    version = assets._current()["app.js"].version
+
+    app_js = static_dir / "app.js"
+    app_js.write_text("console.log(2);" * 100)
+    os.utime(app_js, (time.time() + 5, time.time() + 5))
+    asyncio.run(assets.refresh())
+    assert assets._current()["app.js"].version == version
+
+    assets.reload_interval = 0
+    asyncio.run(assets.refresh())
+    assert assets._current()["app.js"].version != version